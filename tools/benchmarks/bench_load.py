@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark: loading calculate_pri's input files (GDDataset)
+
+Times reading the files calculate_pri.load_data needs (binary and preference votes, thought
+labels and tags, verbatim map, standardized aggregate, segment counts) one after another
+with pandas, as before, and concurrently on a thread pool with pandas and, if pyarrow is
+installed, with the Arrow CSV reader. Checks that every mode returns the same DataFrames.
+Uses a synthetic GD unless --data_dir/--gd_number point at real data. Runs fully offline.
+
+Usage:
+    python tools/benchmarks/bench_load.py [--participants N] [--repeat N] [--workers N]
+    python tools/benchmarks/bench_load.py --data_dir Data --gd_number 3
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent / "scripts"))
+from lib.dataset import GDDataset, arrow_csv_available  # noqa: E402
+from calculate_pri import PRI_INPUT_TABLES  # noqa: E402
+
+BENCH_GD_NUMBER = 99
+DEFAULT_PARTICIPANTS = 20_000
+DEFAULT_REPEAT = 3
+
+
+def prepare_synthetic_gd(workdir, participants):
+    """Writes a synthetic GD and the preprocessed files calculate_pri reads; returns the data dir."""
+    from generate_synthetic_gd import write_synthetic_gd
+    import preprocess_aggregate
+    import preprocess_tag_files
+
+    data_dir = workdir / "Data"
+    gd_dir = data_dir / f"GD{BENCH_GD_NUMBER}"
+    print(f"Generating synthetic GD with {participants:,} participants in {gd_dir}...")
+    write_synthetic_gd(data_dir, BENCH_GD_NUMBER, participants)
+    gd = f"GD{BENCH_GD_NUMBER}"
+    preprocess_aggregate.standardize_aggregate_csv(str(gd_dir / f"{gd}_aggregate.csv"),
+                                                   str(gd_dir / f"{gd}_aggregate_standardized.csv"),
+                                                   str(gd_dir / f"{gd}_segment_counts_by_question.csv"))
+    tags_dir = gd_dir / "tags"
+    tags_dir.mkdir(exist_ok=True)
+    preprocess_tag_files.process_raw_files([str(path) for path in (gd_dir / "tag_codes_raw").glob("*.csv")],
+                                           str(tags_dir))
+    preprocess_tag_files.rebuild_combined_files(str(tags_dir))
+    return data_dir
+
+
+def load(data_dir, gd_number, csv_reader, concurrent, workers):
+    """Loads every PRI input into a fresh dataset; returns (seconds, tables)."""
+    dataset = GDDataset(gd_number, data_dir=str(data_dir), csv_reader=csv_reader)
+    start = time.perf_counter()
+    if concurrent:
+        failures = dataset.preload(PRI_INPUT_TABLES, workers=workers)
+        if failures:
+            raise RuntimeError(f"Failed to load: {failures}")
+    else:
+        for name, columns in PRI_INPUT_TABLES.items():
+            dataset.table(name, columns)
+    elapsed = time.perf_counter() - start
+    return elapsed, {name: dataset.table(name, columns) for name, columns in PRI_INPUT_TABLES.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time loading calculate_pri's input files sequentially and concurrently.")
+    parser.add_argument("--participants", type=int, default=DEFAULT_PARTICIPANTS,
+                        help=f"Participants in the synthetic GD (default: {DEFAULT_PARTICIPANTS:,}).")
+    parser.add_argument("--data_dir", help="Benchmark real data in this base directory instead (needs --gd_number).")
+    parser.add_argument("--gd_number", type=int, help="GD number for --data_dir.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help=f"Runs per mode; the best is reported (default: {DEFAULT_REPEAT}).")
+    parser.add_argument("--workers", type=int, default=None, help="Threads for the concurrent modes (default: one per file).")
+    args = parser.parse_args()
+    if bool(args.data_dir) != (args.gd_number is not None):
+        parser.error("--data_dir and --gd_number go together")
+
+    with tempfile.TemporaryDirectory(prefix="bench_load_") as tmp:
+        if args.data_dir:
+            data_dir, gd_number = Path(args.data_dir), args.gd_number
+        else:
+            data_dir, gd_number = prepare_synthetic_gd(Path(tmp), args.participants), BENCH_GD_NUMBER
+
+        dataset = GDDataset(gd_number, data_dir=str(data_dir))
+        paths = {dataset.path(name) for name in PRI_INPUT_TABLES}
+        total_mb = sum(os.path.getsize(path) for path in paths if os.path.exists(path)) / 1e6
+        print(f"\n{len(paths)} files, {total_mb:.1f} MB; {os.cpu_count()} CPUs; best of {args.repeat}\n")
+
+        modes = [('sequential', 'pandas', False), ('concurrent', 'pandas', True)]
+        if arrow_csv_available():
+            modes += [('sequential', 'arrow', False), ('concurrent', 'arrow', True)]
+        else:
+            print("pyarrow is not installed: skipping the Arrow reader (pip install pyarrow)\n")
+
+        print(f"{'mode':<12} {'reader':<8} {'time':>8} {'speedup':>8}")
+        reference_time, reference_tables = None, None
+        mismatches = []
+        for label, csv_reader, concurrent in modes:
+            best = None
+            for _ in range(args.repeat):
+                elapsed, tables = load(data_dir, gd_number, csv_reader, concurrent, args.workers)
+                best = elapsed if best is None else min(best, elapsed)
+            if reference_tables is None:
+                reference_time, reference_tables = best, tables
+            else:
+                for name, df in tables.items():
+                    try:
+                        pd.testing.assert_frame_equal(df, reference_tables[name])
+                    except AssertionError as e:
+                        mismatches.append(f"{label}/{csv_reader} {name}: {e}")
+            print(f"{label:<12} {csv_reader:<8} {best:>7.2f}s {reference_time / best:>7.2f}x")
+
+    if mismatches:
+        print("\nLoaded tables differ from the sequential pandas load:")
+        for mismatch in mismatches:
+            print(f"  {mismatch}")
+        sys.exit(1)
+    print("\nAll modes loaded identical tables.")
+
+
+if __name__ == "__main__":
+    main()
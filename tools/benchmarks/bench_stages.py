@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Benchmark: every analysis stage on synthetic GDs of increasing size
+
+Generates a synthetic GD per participant count (tools/scripts/generate_synthetic_gd.py), then runs each
+stage in a fresh Python process so its peak RSS is its own. Records wall time, peak RSS
+and rows/sec to JSON and, given a baseline JSON from an earlier run, exits non-zero if a
+stage got slower or bigger than the threshold allows. Runs fully offline.
+
+Usage:
+    python tools/benchmarks/bench_stages.py [--sizes N ...] [--stages NAME ...] [--repeat N]
+                                            [--output PATH] [--baseline PATH] [--save-baseline]
+                                            [--threshold FRACTION] [--workdir DIR]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+SCRIPTS_DIR = BENCH_DIR.parent / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+BENCH_GD_NUMBER = 99 # Synthetic data lives in <workdir>/p<participants>/Data/GD99
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+DEFAULT_OUTPUT = BENCH_DIR / "results" / "stages_latest.json"
+DEFAULT_BASELINE = BENCH_DIR / "results" / "stages_baseline.json"
+DEFAULT_THRESHOLD = 0.20
+# Differences below these are noise, whatever the ratio
+MIN_TIME_DELTA_S = 0.05
+MIN_RSS_DELTA_MB = 10.0
+RESULTS_VERSION = 1
+
+# Stages in dependency order, with the generated row count each one's rows/sec is based on
+STAGES = {
+    'preprocess_aggregate': 'aggregate_rows',
+    'preprocess_tag_files': 'thoughts',
+    'calculate_consensus': 'aggregate_rows',
+    'calculate_divergence': 'aggregate_rows',
+    'calculate_tags': 'tag_instances',
+    'calculate_pri': 'binary_votes',
+}
+PREPROCESS_STAGES = ['preprocess_aggregate', 'preprocess_tag_files']
+
+
+# --- Worker side: runs inside the stage's own process, with cwd = the size's workdir ---
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024 # bytes on macOS, KiB elsewhere
+
+def stage_runner(stage, gd_number):
+    """Imports the stage's module and returns a no-argument callable that runs the stage."""
+    import pandas as pd
+
+    gd = f"GD{gd_number}"
+    data_dir = Path("Data") / gd
+    output_dir = Path("analysis_output") / gd
+    raw_path = data_dir / f"{gd}_aggregate.csv"
+    standardized_path = data_dir / f"{gd}_aggregate_standardized.csv"
+    segment_counts_path = data_dir / f"{gd}_segment_counts_by_question.csv"
+
+    if stage == 'preprocess_aggregate':
+        import preprocess_aggregate
+        return lambda: preprocess_aggregate.standardize_aggregate_csv(str(raw_path), str(standardized_path),
+                                                                      str(segment_counts_path))
+    if stage == 'preprocess_tag_files':
+        import preprocess_tag_files
+        def run():
+            tags_dir = data_dir / "tags"
+            tags_dir.mkdir(exist_ok=True)
+            preprocess_tag_files.process_raw_files([str(path) for path in (data_dir / "tag_codes_raw").glob("*.csv")],
+                                                   str(tags_dir))
+            preprocess_tag_files.rebuild_combined_files(str(tags_dir))
+        return run
+    if stage == 'calculate_consensus':
+        import calculate_consensus
+        return lambda: calculate_consensus.run_consensus_analysis(
+            pd.read_csv(standardized_path, low_memory=False), pd.read_csv(segment_counts_path),
+            str(output_dir / "consensus"))
+    if stage == 'calculate_divergence':
+        import calculate_divergence
+        return lambda: calculate_divergence.run_divergence_analysis(
+            pd.read_csv(standardized_path, low_memory=False), pd.read_csv(segment_counts_path),
+            str(output_dir / "divergence"))
+    if stage == 'calculate_tags':
+        import calculate_tags
+        def run():
+            if calculate_tags.run_tag_analysis(gd_number, Path("Data"), Path("analysis_output")) is None:
+                raise RuntimeError("Tag analysis failed")
+        return run
+    if stage == 'calculate_pri':
+        import calculate_pri
+        def run():
+            sys.argv = ["calculate_pri.py", "--gd_number", str(gd_number), "--redraw-charts"]
+            calculate_pri.main()
+        return run
+    raise ValueError(f"Unknown stage: {stage}")
+
+def run_worker(stage, gd_number, result_file):
+    """Times one stage (imports excluded) and writes wall time and peak RSS to result_file."""
+    import matplotlib
+    matplotlib.use('Agg')
+    run = stage_runner(stage, gd_number)
+    import_rss_mb = _peak_rss_mb()
+    start = time.perf_counter()
+    run()
+    wall_s = time.perf_counter() - start
+    with open(result_file, 'w', encoding='utf-8') as f:
+        json.dump({'wall_s': wall_s, 'peak_rss_mb': _peak_rss_mb(), 'import_rss_mb': import_rss_mb}, f)
+
+
+# --- Driver side ---
+
+def measure_stage(stage, size_dir, repeat):
+    """
+    Runs a stage `repeat` times in fresh processes (output goes to <size_dir>/<stage>.log).
+
+    Returns:
+        dict: Best wall time and lowest peak RSS over the runs, or None if a run failed.
+    """
+    runs = []
+    result_file = size_dir / f"{stage}.result.json"
+    log_path = size_dir / f"{stage}.log"
+    for _ in range(repeat):
+        with open(log_path, 'w', encoding='utf-8') as log:
+            proc = subprocess.run(
+                [sys.executable, str(Path(__file__).resolve()), "--worker", stage,
+                 "--gd_number", str(BENCH_GD_NUMBER), "--result-file", str(result_file)],
+                cwd=size_dir, stdout=log, stderr=subprocess.STDOUT)
+        if proc.returncode != 0:
+            print(f"  {stage} failed (exit {proc.returncode}); last lines of {log_path}:")
+            print("    " + "\n    ".join(log_path.read_text(encoding='utf-8', errors='replace').splitlines()[-10:]))
+            return None
+        runs.append(json.loads(result_file.read_text(encoding='utf-8')))
+    return {
+        'wall_s': min(run['wall_s'] for run in runs),
+        'peak_rss_mb': min(run['peak_rss_mb'] for run in runs),
+        'import_rss_mb': min(run['import_rss_mb'] for run in runs),
+    }
+
+def run_benchmarks(sizes, stages, repeat, workdir):
+    """Generates each size's data, runs the stages on it and returns the result records."""
+    from generate_synthetic_gd import write_synthetic_gd
+
+    results = []
+    failed = []
+    for participants in sizes:
+        size_dir = workdir / f"p{participants}"
+        print(f"\nGenerating synthetic GD with {participants:,} participants in {size_dir}...")
+        start = time.perf_counter()
+        # Generated in a separate process: a child inherits its parent's peak RSS (ru_maxrss
+        # survives fork and exec), so the driver must stay small for the stage measurements
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            counts = executor.submit(write_synthetic_gd, size_dir / "Data", BENCH_GD_NUMBER, participants).result()
+        print(f"  generated in {time.perf_counter() - start:.1f}s: "
+              + ", ".join(f"{name}={value:,}" for name, value in counts.items()))
+
+        # Later stages read the preprocessing output, so preprocessing runs even when not benchmarked
+        prerequisites = [stage for stage in PREPROCESS_STAGES if stage not in stages]
+        if any(measure_stage(stage, size_dir, 1) is None for stage in prerequisites):
+            failed += [(stage, participants) for stage in stages]
+            continue
+
+        for stage in stages:
+            measured = measure_stage(stage, size_dir, repeat)
+            if measured is None:
+                failed.append((stage, participants))
+                continue
+            rows = counts[STAGES[stage]]
+            record = {'stage': stage, 'participants': participants, 'rows': rows, **measured,
+                      'rows_per_s': rows / measured['wall_s'] if measured['wall_s'] > 0 else None}
+            results.append(record)
+            print(f"  {stage:<22} {measured['wall_s']:8.2f}s  {record['rows_per_s']:>12,.0f} rows/s  "
+                  f"peak RSS {measured['peak_rss_mb']:7.0f} MB")
+    return results, failed
+
+def compare_to_baseline(results, baseline, threshold):
+    """
+    Compares results with a baseline run of the same stages and sizes.
+
+    Returns:
+        list: (stage, participants, metric, baseline value, new value) for every regression.
+    """
+    previous = {(r['stage'], r['participants']): r for r in baseline.get('results', [])}
+    regressions = []
+    print(f"\nComparison with baseline from {baseline.get('created', 'unknown date')} (threshold {threshold:.0%}):")
+    print(f"  {'stage':<22} {'participants':>12} {'wall':>18} {'peak RSS':>20}")
+    for record in results:
+        old = previous.get((record['stage'], record['participants']))
+        if old is None:
+            print(f"  {record['stage']:<22} {record['participants']:>12,} {'(not in baseline)':>18}")
+            continue
+        changes = []
+        for metric, floor in (('wall_s', MIN_TIME_DELTA_S), ('peak_rss_mb', MIN_RSS_DELTA_MB)):
+            before, after = old[metric], record[metric]
+            change = (after - before) / before if before else 0.0
+            if change > threshold and after - before > floor:
+                regressions.append((record['stage'], record['participants'], metric, before, after))
+            changes.append(f"{after:8.2f} ({change:+6.1%})")
+        print(f"  {record['stage']:<22} {record['participants']:>12,} {changes[0]:>18} {changes[1]:>20}")
+    return regressions
+
+def save_results(path, results, sizes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        'version': RESULTS_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'sizes': sizes,
+        'results': results,
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2)
+    print(f"Saved results to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark each analysis stage on synthetic GDs of increasing size.")
+    parser.add_argument("--sizes", type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="Participant counts to benchmark (default: 1000 10000 100000).")
+    parser.add_argument("--stages", nargs='+', choices=list(STAGES), default=list(STAGES),
+                        help="Stages to benchmark (default: all).")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per stage; the best is reported (default: 1).")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT, help=f"Results JSON (default: {DEFAULT_OUTPUT}).")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE,
+                        help=f"Baseline JSON to compare against, if it exists (default: {DEFAULT_BASELINE}).")
+    parser.add_argument("--save-baseline", action="store_true", help="Also save the results as the new baseline.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown / memory growth over the baseline as a fraction (default: 0.20).")
+    parser.add_argument("--workdir", type=Path, default=None,
+                        help="Directory for generated data and stage outputs (default: a temporary directory, removed afterwards).")
+    # Internal: run a single stage in this process
+    parser.add_argument("--worker", choices=list(STAGES), help=argparse.SUPPRESS)
+    parser.add_argument("--gd_number", type=int, default=BENCH_GD_NUMBER, help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.gd_number, args.result_file)
+        return
+
+    stages = [stage for stage in STAGES if stage in args.stages]
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="gd_bench_"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    try:
+        results, failed = run_benchmarks(args.sizes, stages, args.repeat, workdir.resolve())
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    save_results(args.output, results, args.sizes)
+    if args.save_baseline:
+        save_results(args.baseline, results, args.sizes)
+
+    regressions = []
+    if not args.save_baseline and args.baseline.exists():
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare_to_baseline(results, json.load(f), args.threshold)
+    elif not args.save_baseline:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one.")
+
+    for stage, participants in failed:
+        print(f"FAILED: {stage} at {participants:,} participants")
+    for stage, participants, metric, before, after in regressions:
+        print(f"REGRESSION: {stage} at {participants:,} participants: {metric} {before:.2f} -> {after:.2f}")
+    if failed or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
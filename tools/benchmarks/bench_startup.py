@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark: CLI startup time of every script in tools/scripts
+
+Runs `<script> --help` in a fresh interpreter several times and reports the best wall time,
+then checks which heavy libraries each script imported on the way. The orchestrator spawns
+one interpreter per stage, so anything a script imports at module load is paid on every run.
+Exits non-zero if a script is slower than the budget or imports a heavy library just to
+print its help. Runs fully offline.
+
+Usage:
+    python tools/benchmarks/bench_startup.py [--scripts NAME ...] [--repeat N] [--budget-ms MS]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+SCRIPTS_DIR = BENCH_DIR.parent / "scripts"
+
+DEFAULT_REPEAT = 5
+DEFAULT_BUDGET_MS = 200.0
+# Libraries that must only be imported once a script actually needs them
+HEAVY_MODULES = ['pandas', 'numpy', 'matplotlib', 'seaborn', 'scipy', 'sklearn',
+                 'aiohttp', 'pydantic', 'openai', 'dotenv', 'requests']
+
+# Runs a script's --help in-process and prints the heavy modules it imported as JSON
+_IMPORT_PROBE = """
+import contextlib, io, json, runpy, sys
+sys.argv = [{script!r}, '--help']
+with contextlib.redirect_stdout(io.StringIO()):
+    try:
+        runpy.run_path({script!r}, run_name='__main__')
+    except SystemExit:
+        pass
+print(json.dumps(sorted({{name.split('.')[0] for name in sys.modules}} & set({heavy!r}))))
+"""
+
+
+def list_scripts():
+    return sorted(path.stem for path in SCRIPTS_DIR.glob("*.py"))
+
+
+def time_bare_interpreter(repeat):
+    """Best wall time in ms of a bare `python -c pass`, for reference."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def time_help(script, repeat):
+    """Best wall time in ms of `python <script> --help` over `repeat` fresh interpreters."""
+    path = SCRIPTS_DIR / f"{script}.py"
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, str(path), "--help"], cwd=SCRIPTS_DIR,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        timings.append((time.perf_counter() - start) * 1000)
+        if proc.returncode != 0:
+            raise RuntimeError(f"{script} --help exited with {proc.returncode}:\n{proc.stderr}")
+    return min(timings)
+
+
+def heavy_imports(script):
+    """Heavy modules present in sys.modules after `<script> --help`."""
+    probe = _IMPORT_PROBE.format(script=str(SCRIPTS_DIR / f"{script}.py"), heavy=HEAVY_MODULES)
+    proc = subprocess.run([sys.executable, "-c", probe], cwd=SCRIPTS_DIR,
+                          capture_output=True, text=True, check=True)
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time `--help` of every analysis script in a fresh interpreter.")
+    parser.add_argument("--scripts", nargs='+', choices=list_scripts(), default=list_scripts(),
+                        help="Scripts to time (default: all of tools/scripts).")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help=f"Runs per script; the best is reported (default: {DEFAULT_REPEAT}).")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help=f"Startup budget per script in ms (default: {DEFAULT_BUDGET_MS:.0f}).")
+    args = parser.parse_args()
+
+    baseline_ms = time_bare_interpreter(args.repeat)
+    print(f"Bare interpreter startup: {baseline_ms:.0f}ms (budget: {args.budget_ms:.0f}ms per script)\n")
+    print(f"{'script':<32} {'--help':>8}  heavy imports")
+
+    failures = []
+    for script in args.scripts:
+        elapsed_ms = time_help(script, args.repeat)
+        imported = heavy_imports(script)
+        over_budget = elapsed_ms > args.budget_ms
+        flag = "  OVER BUDGET" if over_budget else ""
+        print(f"{script:<32} {elapsed_ms:>6.0f}ms  {', '.join(imported) or '-'}{flag}")
+        if over_budget:
+            failures.append(f"{script}: {elapsed_ms:.0f}ms > {args.budget_ms:.0f}ms")
+        if imported:
+            failures.append(f"{script}: imports {', '.join(imported)} at startup")
+
+    if failures:
+        print("\nStartup regressions:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nAll scripts within the startup budget.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark: tag report base metrics (calculate_tags.calculate_base_metrics)
+
+Compares the native-reduction metrics against the previous lambda-based
+aggregation on a synthetic dataset of tag instances, checks that both produce
+the same values, and prints the timings, followed by the time spent computing
+the group keys and in each reduction.
+
+Usage:
+    python tools/benchmarks/bench_tag_metrics.py [--rows N] [--questions N] [--tags N] [--participants N] [--repeat N]
+"""
+
+import argparse
+import sys
+import time
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
+from calculate_tags import calculate_base_metrics, REPORT_GROUP_COLS  # noqa: E402
+
+
+def make_tag_instances(rows, questions, tags_per_question, participants, seed=0):
+    """Builds a synthetic analysis DataFrame shaped like calculate_tags' prepared data."""
+    rng = np.random.default_rng(seed)
+    question_codes = rng.integers(0, questions, rows)
+    tag_codes = question_codes * tags_per_question + rng.integers(0, tags_per_question, rows)
+
+    # Same dtypes as calculate_tags.load_and_prep_data: IDs, tag text and sentiment are categoricals
+    df = pd.DataFrame({
+        'Question ID': pd.Categorical.from_codes(question_codes, [f"Q{i:04d}" for i in range(questions)]),
+        'Question Text': pd.Categorical.from_codes(question_codes, [f"Question text {i}?" for i in range(questions)]),
+        'Category': pd.Categorical.from_codes(tag_codes % 7, [f"Category {i}" for i in range(7)]),
+        'Tag': pd.Categorical.from_codes(tag_codes, [f"Tag {i}" for i in range(questions * tags_per_question)]),
+        'Participant Id': pd.Categorical.from_codes(rng.integers(0, participants, rows),
+                                                     [f"P{i:07d}" for i in range(participants)]),
+        'Sentiment': pd.Categorical.from_codes(rng.integers(-1, 3, rows), ['Positive', 'Negative', 'Neutral']),
+        'Agreement Score': np.where(rng.random(rows) < 0.05, np.nan, rng.random(rows)),
+    })
+    return df
+
+
+def legacy_base_metrics(df):
+    """The previous lambda-based aggregation, kept here as the benchmark reference."""
+    agg_funcs = {
+        'Participant Id': lambda x: x.nunique(),
+        'Agreement Score': ['mean', 'median'],
+        'Sentiment': [
+            lambda x: (x == 'Positive').sum() / x.count() if x.count() > 0 else 0,
+            lambda x: (x == 'Negative').sum() / x.count() if x.count() > 0 else 0
+        ]
+    }
+    grouped = df.groupby(REPORT_GROUP_COLS, observed=True, dropna=False)
+    metrics_df = grouped.agg(agg_funcs)
+    metrics_df.columns = ['N Responses', 'Avg Agreement (All)', 'Median Agreement (All)',
+                          'Proportion Positive Sentiment', 'Proportion Negative Sentiment']
+    return metrics_df
+
+
+def time_call(func, df, repeat):
+    """Returns (best wall time in seconds, result of the last call)."""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(df)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def time_breakdown(df, repeat):
+    """
+    Times the parts of the native aggregation separately: computing the group keys
+    once, then each reduction on the already-grouped data.
+
+    Returns:
+        list: (label, best wall time in seconds) pairs.
+    """
+    has_sentiment = df['Sentiment'].notna()
+    metrics_input = df[REPORT_GROUP_COLS + ['Participant Id', 'Agreement Score']].assign(
+        **{'Is Positive': (df['Sentiment'] == 'Positive').astype(float).where(has_sentiment)})
+
+    def group_keys(data):
+        grouped = data.groupby(REPORT_GROUP_COLS, observed=True, dropna=False)
+        grouped.size() # Forces the group keys to be computed
+        return grouped
+
+    keys_time, grouped = time_call(group_keys, metrics_input, repeat)
+    timings = [('group keys', keys_time)]
+    for label, column, reduction in [('nunique(Participant Id)', 'Participant Id', 'nunique'),
+                                     ('mean(Agreement Score)', 'Agreement Score', 'mean'),
+                                     ('median(Agreement Score)', 'Agreement Score', 'median'),
+                                     ('mean(Is Positive)', 'Is Positive', 'mean')]:
+        timings.append((label, time_call(lambda g: g[column].agg(reduction), grouped, repeat)[0]))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tag report base metrics (native reductions vs lambdas).")
+    parser.add_argument("--rows", type=int, default=10_000_000, help="Number of tag instances (default: 10M).")
+    parser.add_argument("--questions", type=int, default=12, help="Number of questions (default: 12).")
+    parser.add_argument("--tags", type=int, default=30, help="Tags per question (default: 30).")
+    parser.add_argument("--participants", type=int, default=100_000, help="Number of participants (default: 100k).")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing repetitions; the best run is reported (default: 3).")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    print(f"Generating {args.rows:,} tag instances ({args.questions} questions x {args.tags} tags, "
+          f"{args.participants:,} participants)...")
+    df = make_tag_instances(args.rows, args.questions, args.tags, args.participants)
+
+    legacy_time, legacy_df = time_call(legacy_base_metrics, df, args.repeat)
+    native_time, native_df = time_call(calculate_base_metrics, df, args.repeat)
+
+    pd.testing.assert_frame_equal(native_df, legacy_df[native_df.columns], check_dtype=False)
+
+    print(f"\nGroups: {len(native_df):,}")
+    print(f"  lambda aggregation: {legacy_time:8.3f} s")
+    print(f"  native reductions:  {native_time:8.3f} s")
+    print(f"  speedup:            {legacy_time / native_time:8.2f}x")
+
+    print("\nNative aggregation breakdown (group keys once, then each reduction):")
+    for label, seconds in time_breakdown(df, args.repeat):
+        print(f"  {label:<24} {seconds:8.3f} s")
+
+
+if __name__ == "__main__":
+    main()
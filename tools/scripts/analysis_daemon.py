@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+Warm-data analysis daemon
+
+Loads one GD's standardized aggregate, segment counts, votes, verbatim map and thought tags
+once, keeps them in memory and answers analysis queries over a local HTTP API, on localhost
+or a Unix socket. Each analysis runs on its first query (or at startup with --precompute)
+and is memoized, so repeated and interactive queries only filter an in-memory result.
+
+Usage:
+    python tools/scripts/analysis_daemon.py --gd_number <N> [--port 8765 | --socket PATH] [--precompute]
+
+Endpoints (GET, JSON responses):
+    /health                                  Loaded tables, cached analyses and uptime
+    /consensus?question_id=Q&top_n=N         Consensus profiles and major segment consensus
+    /divergence?question_id=Q&top_n=N        Most divergent responses (overall or for one question)
+    /pri?participant_id=A,B&top_n=N&order=asc|desc
+                                             Heuristic PRI scores (no LLM judge)
+    /reload                                  Reload the data and drop the cached analyses
+
+    consensus and divergence also take min_segment_size (default: 15). The data is reloaded
+    automatically when one of its input files changes on disk.
+"""
+
+import argparse
+import json
+import logging
+import os
+import signal
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from lib.dataset import GDDataset
+from lib.pipeline import SharedInputs
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DEFAULT_PORT = 8765
+DEFAULT_MIN_SEGMENT_SIZE = 15
+DEFAULT_TOP_N = 50
+MAX_MIN_SEGMENT_SIZE = 1000 # Each distinct min_segment_size is computed and memoized separately
+
+
+class QueryError(ValueError):
+    """A malformed query parameter; answered with HTTP 400."""
+
+
+class WarmGD:
+    """
+    One GD's analysis inputs, loaded once, plus the analyses computed from them.
+
+    Results are memoized per parameter set; each computation writes the analyses'
+    report files to its own temporary directory, removed when it finishes, so queries
+    never overwrite analysis_output/.
+    """
+    def __init__(self, gd_number):
+        import calculate_pri
+
+        self.gd_number = gd_number
+        gd_identifier = f"GD{gd_number}"
+        self.dataset = GDDataset(gd_number)
+        for name in ('aggregate', 'segment_counts'):
+            if not self.dataset.exists(name):
+                raise FileNotFoundError(f"{self.dataset.path(name)} not found; run preprocess_aggregate.py for {gd_identifier} first")
+
+        start = time.perf_counter()
+        self.standardized = self.dataset.aggregate
+        self.segment_counts = self.dataset.segment_counts
+        # PRI adds agreement columns and encodes IDs on its own shallow copies of the shared tables
+        self.pri_config = calculate_pri.get_config(gd_number)
+        self.pri_data = calculate_pri.load_data(self.pri_config, dataset=self.dataset)
+        self.load_seconds = time.perf_counter() - start
+        self.loaded_at = time.time()
+
+        self._results = SharedInputs()
+        self._computed = {}
+        logging.info(f"Loaded {gd_identifier} in {self.load_seconds:.1f}s")
+
+    def is_stale(self):
+        """True if an input file changed on disk since it was loaded."""
+        return bool(self.dataset.stale_tables())
+
+    def _memoized(self, key, compute):
+        def timed():
+            start = time.perf_counter()
+            result = compute()
+            self._computed[key] = round(time.perf_counter() - start, 3)
+            logging.info(f"Computed {key} in {self._computed[key]:.2f}s")
+            return result
+        return self._results.get(key, timed)
+
+    def consensus(self, min_segment_size=DEFAULT_MIN_SEGMENT_SIZE):
+        """(consensus profiles, major segment consensus), profiles sorted by their 100th percentile minimum."""
+        import calculate_consensus
+
+        def compute():
+            with tempfile.TemporaryDirectory(prefix=f"GD{self.gd_number}_consensus_") as scratch_dir:
+                profiles, major = calculate_consensus.run_consensus_analysis(
+                    self.standardized, self.segment_counts, scratch_dir, min_segment_size=min_segment_size)
+            if profiles is not None and 'MinAgree_100pct' in profiles.columns:
+                profiles = profiles.sort_values('MinAgree_100pct', ascending=False)
+            return profiles, major
+        return self._memoized(f"consensus(min_segment_size={min_segment_size})", compute)
+
+    def divergence(self, min_segment_size=DEFAULT_MIN_SEGMENT_SIZE):
+        """Divergence results for every response, sorted by score."""
+        import calculate_divergence
+
+        def compute():
+            with tempfile.TemporaryDirectory(prefix=f"GD{self.gd_number}_divergence_") as scratch_dir:
+                return calculate_divergence.run_divergence_analysis(
+                    self.standardized, self.segment_counts, scratch_dir,
+                    min_segment_size=min_segment_size, top_n_per_question=0, top_n_overall=0)
+        return self._memoized(f"divergence(min_segment_size={min_segment_size})", compute)
+
+    def pri(self):
+        """Heuristic PRI signals and scores for every participant, indexed by Participant ID."""
+        import calculate_pri
+
+        def compute():
+            signals = calculate_pri.calculate_all_pri_signals(self.pri_data, self.pri_config)
+            scores = calculate_pri.normalize_and_calculate_pri(signals, self.pri_config)
+            scores['Participant ID'] = scores['Participant ID'].astype(str)
+            return scores.set_index('Participant ID', drop=False)
+        return self._memoized("pri", compute)
+
+    def status(self):
+        return {
+            'gd_number': self.gd_number,
+            'loaded_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.loaded_at)),
+            'load_seconds': round(self.load_seconds, 3),
+            'tables': {
+                'aggregate_standardized': len(self.standardized),
+                'segment_counts': len(self.segment_counts),
+                'binary': len(self.pri_data[0]),
+                'preference': len(self.pri_data[1]),
+                'thought_labels': len(self.pri_data[2]),
+                'verbatim_map': len(self.pri_data[3]),
+                'participants': len(self.pri_data[5]),
+            },
+            'cached_tables': {name: list(shape) for name, shape in self.dataset.cached().items()},
+            'computed_seconds': dict(self._computed),
+        }
+
+    def precompute(self):
+        self.consensus()
+        self.divergence()
+        self.pri()
+
+
+# --- Query handling ---
+
+def _check_params(params, allowed):
+    unknown = sorted(set(params) - set(allowed))
+    if unknown:
+        raise QueryError(f"Unknown parameter(s) {', '.join(unknown)}; expected {', '.join(sorted(allowed)) or 'none'}")
+
+def _int_param(params, name, default, minimum=0, maximum=None):
+    value = params.get(name, [None])[0]
+    if value is None or value == '':
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise QueryError(f"{name} must be an integer, got {value!r}")
+    if number < minimum or (maximum is not None and number > maximum):
+        raise QueryError(f"{name} must be between {minimum} and {maximum}, got {number}" if maximum is not None
+                         else f"{name} must be at least {minimum}, got {number}")
+    return number
+
+def _min_segment_size(params):
+    return _int_param(params, 'min_segment_size', DEFAULT_MIN_SEGMENT_SIZE, minimum=1, maximum=MAX_MIN_SEGMENT_SIZE)
+
+def _list_param(params, name):
+    """Values of a parameter given repeatedly and/or comma-separated."""
+    return [item.strip() for value in params.get(name, []) for item in value.split(',') if item.strip()]
+
+def _records(df, top_n=None):
+    if df is None:
+        return []
+    if top_n is not None:
+        df = df.head(top_n)
+    return json.loads(df.to_json(orient='records', double_precision=6))
+
+def _filter_question(df, params):
+    question_id = params.get('question_id', [None])[0]
+    if df is None or not question_id:
+        return df
+    return df[df['Question ID'].astype(str) == question_id]
+
+def query_consensus(gd, params):
+    top_n = _int_param(params, 'top_n', DEFAULT_TOP_N)
+    profiles, major = gd.consensus(_min_segment_size(params))
+    profiles, major = _filter_question(profiles, params), _filter_question(major, params)
+    return {'count': 0 if profiles is None else len(profiles),
+            'profiles': _records(profiles, top_n), 'major_segment_consensus': _records(major, top_n)}
+
+def query_divergence(gd, params):
+    top_n = _int_param(params, 'top_n', DEFAULT_TOP_N)
+    results = _filter_question(gd.divergence(_min_segment_size(params)), params)
+    return {'count': 0 if results is None else len(results), 'rows': _records(results, top_n)}
+
+def query_pri(gd, params):
+    participant_ids = _list_param(params, 'participant_id')
+    order = params.get('order', ['desc'])[0]
+    if order not in ('asc', 'desc'):
+        raise QueryError(f"order must be 'asc' or 'desc', got {order!r}")
+    top_n = _int_param(params, 'top_n', None if participant_ids else DEFAULT_TOP_N)
+    scores = gd.pri()
+    missing = []
+    if participant_ids:
+        found = scores.index.intersection(participant_ids)
+        missing = [pid for pid in participant_ids if pid not in found]
+        scores = scores.loc[found]
+    scores = scores.sort_values('PRI_Score', ascending=(order == 'asc'))
+    return {'count': len(scores), 'missing': missing, 'rows': _records(scores, top_n)}
+
+QUERIES = {
+    '/consensus': query_consensus,
+    '/divergence': query_divergence,
+    '/pri': query_pri,
+}
+
+# Parameters each endpoint accepts; anything else is rejected rather than silently ignored
+QUERY_PARAMS = {
+    '/health': (),
+    '/reload': (),
+    '/consensus': ('question_id', 'top_n', 'min_segment_size'),
+    '/divergence': ('question_id', 'top_n', 'min_segment_size'),
+    '/pri': ('participant_id', 'top_n', 'order'),
+}
+
+
+class AnalysisServer:
+    """Holds the current WarmGD; reloads swap in a new one so in-flight queries finish on the old data."""
+    def __init__(self, gd_number, precompute=False):
+        self.gd_number = gd_number
+        self.precompute = precompute
+        self.started_at = time.time()
+        self._reload_lock = threading.Lock()
+        self.gd = self._load()
+
+    def _load(self):
+        gd = WarmGD(self.gd_number)
+        if self.precompute:
+            gd.precompute()
+        return gd
+
+    def reload(self, stale_gd=None):
+        """Loads the data again; with ``stale_gd``, only if no other request reloaded it already."""
+        with self._reload_lock:
+            if stale_gd is not None and self.gd is not stale_gd:
+                return self.gd
+            self.gd = self._load()
+        return self.gd
+
+    def current(self):
+        gd = self.gd
+        if gd.is_stale():
+            logging.info(f"Input files of GD{self.gd_number} changed on disk, reloading")
+            gd = self.reload(stale_gd=gd)
+        return gd
+
+    def handle(self, path, params):
+        if path in QUERY_PARAMS:
+            _check_params(params, QUERY_PARAMS[path])
+        if path == '/health':
+            return {'status': 'ok', 'uptime_seconds': round(time.time() - self.started_at, 1), **self.gd.status()}
+        if path == '/reload':
+            return {'status': 'reloaded', **self.reload().status()}
+        if path in QUERIES:
+            return QUERIES[path](self.current(), params)
+        return None
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    server_version = "GDAnalysisDaemon/1.0"
+
+    def do_GET(self):
+        start = time.perf_counter()
+        url = urlparse(self.path)
+        try:
+            payload = self.server.analysis.handle(url.path.rstrip('/') or '/', parse_qs(url.query))
+            status = 200 if payload is not None else 404
+            if payload is None:
+                payload = {'error': f"Unknown endpoint {url.path}", 'endpoints': ['/health', '/reload', *QUERIES]}
+        except QueryError as e:
+            status, payload = 400, {'error': str(e)}
+        except Exception as e:
+            logging.error(f"Error answering {self.path}: {e}", exc_info=True)
+            status, payload = 500, {'error': f"{type(e).__name__}: {e}"}
+        except SystemExit:
+            # calculate_pri.load_data exits on unreadable input files
+            status, payload = 500, {'error': "Could not load the GD data; see the daemon log"}
+        payload['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix-socket'
+
+    def log_message(self, format, *args):
+        logging.info(f"{self.address_string()} {format % args}")
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        # Same attributes HTTPServer sets, which BaseHTTPRequestHandler reads
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name, self.server_port = 'localhost', 0
+
+
+def make_server(analysis, port=DEFAULT_PORT, socket_path=None):
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path) # Left over from a daemon that did not shut down cleanly
+        server = UnixHTTPServer(socket_path, RequestHandler)
+    else:
+        # Localhost only: the API has no authentication
+        server = ThreadingHTTPServer(('127.0.0.1', port), RequestHandler)
+        server.daemon_threads = True
+    server.analysis = analysis
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve consensus, divergence and PRI queries for one GD from memory.")
+    parser.add_argument("--gd_number", type=int, required=True, help="Global Dialogue cadence number to load.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help=f"Port to listen on at 127.0.0.1 (default: {DEFAULT_PORT}).")
+    parser.add_argument("--socket", help="Listen on this Unix socket path instead of a TCP port.")
+    parser.add_argument("--precompute", action="store_true",
+                        help="Run every analysis at startup instead of on its first query.")
+    args = parser.parse_args()
+
+    try:
+        analysis = AnalysisServer(args.gd_number, precompute=args.precompute)
+    except FileNotFoundError as e:
+        logging.error(str(e))
+        sys.exit(1)
+
+    server = make_server(analysis, port=args.port, socket_path=args.socket)
+    address = args.socket or f"http://127.0.0.1:{args.port}"
+    logging.info(f"Serving GD{args.gd_number} on {address} (Ctrl+C to stop)")
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0)) # Clean up on `kill` too
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("Shutting down")
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
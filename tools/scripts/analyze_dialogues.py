@@ -1,5 +1,3 @@
-import pandas as pd
-import numpy as np
 import csv
 import os
 import pickle # Using pickle for simplicity for saving list of DFs
@@ -7,12 +5,22 @@ import argparse
 import math
 import re # For parsing segment columns
 import warnings
-import matplotlib.pyplot as plt
-import seaborn as sns # Optional: for nicer plots
 import textwrap # Import textwrap
-import subprocess
 import logging
 import sys
+import time
+import multiprocessing
+from multiprocessing.connection import wait
+from pathlib import Path
+from lib.analysis_utils import chart_hash, chart_is_current, record_chart, start_trace, stop_trace, peak_rss_mb, TRACE_DIRNAME, lazy_import
+from lib.dataset import GDDataset
+from lib.pipeline import Stage, run_pipeline, explain_pipeline, PIPELINE_MANIFEST_FILENAME
+
+# Imported on first use, so --help and --dry-run start fast
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+plt = lazy_import('matplotlib.pyplot')
+sns = lazy_import('seaborn') # Optional: for nicer plots
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -21,11 +29,17 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 # Default values, can be overridden by command-line args
 DEFAULT_MIN_SEGMENT_SIZE = 15
 CACHE_FILENAME = "processed_data.pkl"
-# Set pandas display options for potentially wide DataFrames
-pd.set_option('display.max_rows', 100)
-pd.set_option('display.max_columns', 50)
-pd.set_option('display.width', 1000)
-pd.set_option('display.max_colwidth', 150) # Adjust display width for reports
+# Multi-GD runs: memory estimate per GD and share of RAM the concurrent GDs may use
+BASE_PROCESS_MEMORY_MB = 400
+MEMORY_PER_INPUT_BYTE = 8
+DEFAULT_MEMORY_BUDGET_FRACTION = 0.75
+
+def set_display_options():
+    """Sets pandas display options for potentially wide DataFrames."""
+    pd.set_option('display.max_rows', 100)
+    pd.set_option('display.max_columns', 50)
+    pd.set_option('display.width', 1000)
+    pd.set_option('display.max_colwidth', 150) # Adjust display width for reports
 
 # --- Helper Functions ---
 
@@ -685,31 +699,39 @@ def generate_indicator_heatmaps(indicator_codesheet_path, questions_data, indica
         n_rows, n_cols = heatmap_pivot.shape
         fig_width = max(8, n_cols * 0.9 + max(0, max_lines_in_ylabel -1) * 1.5 )
         fig_height = max(5, n_rows * 0.7 + 2.5) # Increase base height slightly more for title
-        plt.figure(figsize=(fig_width, fig_height))
 
         # Wrap the second title line if it's long (e.g., full question text)
         wrapped_title_line2 = textwrap.fill(title_line2, width=80) # Adjust width as needed
         final_title = f"{title_line1}\n{wrapped_title_line2}".strip() # Combine lines
+        ordered_wrapped_labels = [label for text, label in ordered_labels_info]
+        y_axis_label = "Question Detail" if y_label_type == 'varying_part' else "Question Code"
+
+        # Skip redrawing if the pivot data and plot settings match the last saved heatmap
+        safe_category_name = re.sub(r'[^\w\-\. ]', '', category).strip().replace(' ', '_')
+        heatmap_filename = f"indicator_heatmap_{safe_category_name}.png"
+        heatmap_path = os.path.join(indicators_output_dir, heatmap_filename)
+        digest = chart_hash(heatmap_pivot, {'y_labels': ordered_wrapped_labels, 'title': final_title,
+                                            'y_axis_label': y_axis_label, 'figsize': (fig_width, fig_height), 'dpi': 150})
+        if chart_is_current(heatmap_path, digest):
+            print(f"    Unchanged, skipping: {heatmap_path}"); continue
 
+        plt.figure(figsize=(fig_width, fig_height))
         ax = sns.heatmap(heatmap_pivot, annot=True, fmt=".0%", cmap="Blues", linewidths=.5, cbar=False, annot_kws={"size": 9})
         
-        ordered_wrapped_labels = [label for text, label in ordered_labels_info]
         ax.set_yticklabels(ordered_wrapped_labels, rotation=0, fontsize=9, va='center') 
         
         plt.xticks(rotation=30, ha='right', fontsize=9)
         # Use final combined title, adjust padding
         plt.title(final_title, fontsize=11, pad=25) # Slightly smaller title font, more padding
         plt.xlabel("Response Options", fontsize=10)
-        plt.ylabel("Question Detail" if y_label_type == 'varying_part' else "Question Code", fontsize=10) # Adjust y-axis title based on label type
+        plt.ylabel(y_axis_label, fontsize=10) # Adjust y-axis title based on label type
         
         plt.tight_layout(rect=[0, 0.03, 1, 0.93]) # Adjust top boundary slightly for title
         
         # --- Save heatmap ---
-        safe_category_name = re.sub(r'[^\w\-\. ]', '', category).strip().replace(' ', '_')
-        heatmap_filename = f"indicator_heatmap_{safe_category_name}.png"
-        heatmap_path = os.path.join(indicators_output_dir, heatmap_filename)
         try:
             plt.savefig(heatmap_path, dpi=150, bbox_inches='tight')
+            record_chart(heatmap_path, digest)
             print(f"    Saved heatmap to: {heatmap_path}")
         except Exception as e:
             print(f"    Error saving heatmap for category '{category}': {e}")
@@ -906,90 +928,341 @@ def generate_segment_report(segment_details_first_q, segments_output_dir):
 
     print("--- Segment Summary Report Generation Complete ---")
 
-def run_script(script_name, gd_number, extra_args=None):
-    """Runs a given analysis script using subprocess, passing the GD number."""
-    python_executable = sys.executable # Use the same python executable that runs this script
-    script_path = os.path.join("tools", "scripts", script_name)
-    if not os.path.exists(script_path):
-        logging.error(f"Script not found: {script_path}")
-        return False
-
-    cmd = [python_executable, script_path, "--gd_number", str(gd_number)]
-    if extra_args:
-        cmd.extend(extra_args)
-       
-    logging.info(f"--- Running {script_name} for GD{gd_number} --- ") # Adjusted log message
-    logging.info(f"Executing: {' '.join(cmd)}")
-   
+def build_pipeline(gd_number, redraw_charts=False, preprocess_only=False):
+    """
+    Declares the analysis pipeline for a GD as a DAG of in-process stages.
+
+    The aggregate is standardized first; the tags, consensus, divergence and indicator
+    stages then run concurrently, sharing one GDDataset, so the standardized data, segment
+    counts and other inputs are parsed once (on first use, so stages skipped as up to date
+    never load them). Each stage declares the files, parameters and scripts it depends on, which
+    run_pipeline fingerprints to skip stages whose results would not change.
+
+    With ``preprocess_only``, the pipeline is the preprocessing done by `make preprocess`
+    instead: metadata cleanup of the raw files and standardizing the aggregate.
+
+    Returns:
+        tuple: (list of Stage, dict of initial artifacts)
+    """
+    import preprocess_aggregate
+    import preprocess_cleanup_metadata
+    import calculate_tags
+    import calculate_consensus
+    import calculate_divergence
+    import calculate_indicators
+    import lib.analysis_utils as analysis_utils
+    import lib.dataset as lib_dataset
+
+    gd_identifier = f"GD{gd_number}"
+    data_dir = os.path.join("Data", gd_identifier)
+    tags_dir = os.path.join(data_dir, "tags")
+    output_base_dir = os.path.join("analysis_output", gd_identifier)
+    standardized_path = os.path.join(data_dir, f"{gd_identifier}_aggregate_standardized.csv")
+    segment_counts_path = os.path.join(data_dir, f"{gd_identifier}_segment_counts_by_question.csv")
+    consensus_dir = os.path.join(output_base_dir, "consensus")
+    divergence_dir = os.path.join(output_base_dir, "divergence")
+    indicators_dir = os.path.join(output_base_dir, "indicators")
+
+    consensus_params = {'min_segment_size': DEFAULT_MIN_SEGMENT_SIZE, 'top_n_major_consensus': 10}
+    divergence_params = {'min_segment_size': DEFAULT_MIN_SEGMENT_SIZE, 'top_n_per_question': 20, 'top_n_overall': 50}
+    dataset = GDDataset(gd_number, paths={'aggregate': standardized_path, 'segment_counts': segment_counts_path})
+
+    def sources(module):
+        return [module.__file__, analysis_utils.__file__, lib_dataset.__file__]
+
+    def standardize(aggregate_csv):
+        if not os.path.exists(aggregate_csv):
+            raise FileNotFoundError(f"Input file not found for {gd_identifier}. Expected at: {aggregate_csv}")
+        preprocess_aggregate.standardize_aggregate_csv(aggregate_csv, standardized_path, segment_counts_path)
+        for path in (standardized_path, segment_counts_path):
+            if not os.path.exists(path):
+                raise RuntimeError(f"Standardization did not produce {path}")
+        return {'standardized_csv': standardized_path, 'segment_counts_csv': segment_counts_path}
+
+    def cleanup_metadata():
+        # Rewrites the raw files in place (and is a no-op once they are clean), so it always runs
+        preprocess_cleanup_metadata.main(argparse.Namespace(gd_number=gd_number))
+
+    def tags(standardized_csv, tag_files):
+        report_path = calculate_tags.run_tag_analysis(gd_number, Path("Data"), Path("analysis_output"), dataset=dataset)
+        if report_path is None:
+            raise RuntimeError("Tag analysis failed")
+        return {'tag_report': str(report_path)}
+
+    def consensus(standardized_csv, segment_counts_csv):
+        results = calculate_consensus.run_consensus_analysis(
+            dataset.aggregate, dataset.segment_counts, consensus_dir, **consensus_params)
+        return {'consensus_results': results}
+
+    def divergence(standardized_csv, segment_counts_csv):
+        results = calculate_divergence.run_divergence_analysis(
+            dataset.aggregate, dataset.segment_counts, divergence_dir, **divergence_params)
+        return {'divergence_results': results}
+
+    def indicators(standardized_csv, indicator_codesheet):
+        # Render serially: this stage already runs alongside the others, and forking
+        # a render pool from a multi-threaded process is unsafe
+        calculate_indicators.generate_indicator_heatmaps(
+            dataset.aggregate, indicator_codesheet, indicators_dir,
+            workers=1, redraw=redraw_charts)
+
+    preprocess_stage = Stage("preprocess_aggregate", standardize, inputs=['aggregate_csv'],
+                             outputs=['standardized_csv', 'segment_counts_csv'],
+                             input_files=['aggregate_csv'], output_files=[standardized_path, segment_counts_path],
+                             sources=sources(preprocess_aggregate))
+    if preprocess_only:
+        stages = [Stage("preprocess_cleanup_metadata", cleanup_metadata), preprocess_stage]
+        return stages, {'aggregate_csv': os.path.join(data_dir, f"{gd_identifier}_aggregate.csv")}
+
+    stages = [
+        preprocess_stage,
+        Stage("calculate_tags", tags, inputs=['standardized_csv', 'tag_files'], outputs=['tag_report'],
+              input_files=['standardized_csv', 'tag_files'],
+              output_files=[os.path.join(output_base_dir, "tags", "tag_analysis_report.csv")],
+              sources=sources(calculate_tags)),
+        Stage("calculate_consensus", consensus, inputs=['standardized_csv', 'segment_counts_csv'],
+              outputs=['consensus_results'], input_files=['standardized_csv', 'segment_counts_csv'],
+              output_files=[os.path.join(consensus_dir, "consensus_profiles.csv"),
+                            os.path.join(consensus_dir, f"major_segment_min_agreement_top{consensus_params['top_n_major_consensus']}.csv")],
+              params=consensus_params, sources=sources(calculate_consensus)),
+        Stage("calculate_divergence", divergence, inputs=['standardized_csv', 'segment_counts_csv'],
+              outputs=['divergence_results'], input_files=['standardized_csv', 'segment_counts_csv'],
+              output_files=[os.path.join(divergence_dir, "divergence_by_question.csv"),
+                            os.path.join(divergence_dir, "divergence_overall.csv")],
+              params=divergence_params, sources=sources(calculate_divergence)),
+        # Heatmaps also have their own per-PNG cache, so a forced rerun only redraws changed charts
+        Stage("calculate_indicators", indicators, inputs=['standardized_csv', 'indicator_codesheet'],
+              input_files=['standardized_csv', 'indicator_codesheet'], output_files=[indicators_dir],
+              params={'redraw_charts': redraw_charts}, sources=sources(calculate_indicators)),
+    ]
+    artifacts = {
+        'aggregate_csv': os.path.join(data_dir, f"{gd_identifier}_aggregate.csv"),
+        'indicator_codesheet': os.path.join("Data", "Documentation", "INDICATOR_CODESHEET.csv"),
+        'tag_files': [
+            os.path.join(tags_dir, "all_thought_labels.csv"),
+            os.path.join(tags_dir, "all_tag_categories.csv"),
+            os.path.join(tags_dir, analysis_utils.THOUGHT_TAGS_FILENAME),
+            os.path.join(tags_dir, analysis_utils.TAG_DICTIONARY_FILENAME),
+            os.path.join(data_dir, f"{gd_identifier}_participants.csv"),
+            os.path.join(data_dir, f"{gd_identifier}_discussion_guide.csv"),
+        ],
+    }
+    return stages, artifacts
+
+def run_gd(gd_number, stage_workers=None, force=False, redraw_charts=False, preprocess_only=False, trace=False,
+           profile_memory=False):
+    """
+    Runs the pipeline for one GD in this process. With ``trace``, stage and step
+    timings are written to analysis_output/GD<N>/traces/ (see lib.analysis_utils.stop_trace);
+    ``profile_memory`` adds per-stage RSS / tracemalloc peaks and DataFrame checkpoints.
+
+    Returns:
+        dict: Summary with 'gd', 'status' ('ok'/'failed'), 'failed' stage names,
+              'elapsed' seconds and 'peak_rss_mb' of this process.
+    """
+    start = time.perf_counter()
+    manifest_path = os.path.join("analysis_output", f"GD{gd_number}", PIPELINE_MANIFEST_FILENAME)
+    logging.info(f"Starting {'preprocessing' if preprocess_only else 'analysis pipeline'} for GD{gd_number}")
+    trace = trace or profile_memory
+    if trace:
+        start_trace(f"GD{gd_number}_{'preprocess' if preprocess_only else 'pipeline'}", memory=profile_memory)
     try:
-        # Use check=True to raise CalledProcessError if the script fails (returns non-zero exit code)
-        # Capture output to potentially log it or check for errors
-        result = subprocess.run(cmd, check=True, capture_output=True, text=True, encoding='utf-8')
-        logging.info(f"{script_name} output:\n{result.stdout}")
-        if result.stderr:
-             logging.warning(f"{script_name} stderr:\n{result.stderr}")
-        logging.info(f"--- {script_name} completed successfully ---")
-        return True
-    except FileNotFoundError:
-        logging.error(f"Error: Python executable not found at {python_executable}")
-        return False
-    except subprocess.CalledProcessError as e:
-        logging.error(f"--- {script_name} failed (exit code {e.returncode}) ---")
-        logging.error(f"Command: {' '.join(e.cmd)}")
-        logging.error(f"Stderr:\n{e.stderr}")
-        logging.error(f"Stdout:\n{e.stdout}")
-        return False
+        stages, artifacts = build_pipeline(gd_number, redraw_charts=redraw_charts, preprocess_only=preprocess_only)
+        stage_workers = stage_workers or min(4, os.cpu_count() or 1)
+        _, failed = run_pipeline(stages, artifacts, max_workers=stage_workers,
+                                 manifest_path=manifest_path, force=force)
     except Exception as e:
-        logging.error(f"An unexpected error occurred while running {script_name}: {e}")
-        return False
+        logging.error(f"GD{gd_number}: pipeline could not run: {e}", exc_info=True)
+        failed = ['<pipeline>']
+    if trace:
+        stop_trace(os.path.join("analysis_output", f"GD{gd_number}", TRACE_DIRNAME))
+    return {
+        'gd': gd_number,
+        'status': 'failed' if failed else 'ok',
+        'failed': failed,
+        'elapsed': time.perf_counter() - start,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+def estimate_gd_memory_mb(gd_number):
+    """
+    Rough peak memory of one GD run: interpreter + libraries, plus a multiple of the
+    size of its input CSVs (pandas holds text columns as Python objects).
+    """
+    data_dir = os.path.join("Data", f"GD{gd_number}")
+    input_bytes = 0
+    for root, _, files in os.walk(data_dir):
+        input_bytes += sum(os.path.getsize(os.path.join(root, name)) for name in files if name.endswith('.csv'))
+    return BASE_PROCESS_MEMORY_MB + input_bytes * MEMORY_PER_INPUT_BYTE / (1024 * 1024)
+
+def total_memory_mb():
+    """Physical memory of the machine in MiB (None if unknown)."""
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') / (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+def _run_gd_worker(connection, gd_number, run_options):
+    """Worker process entry point: runs one GD and sends its summary back."""
+    try:
+        summary = run_gd(gd_number, **run_options)
+    except BaseException as e:
+        summary = {'gd': gd_number, 'status': 'crashed', 'failed': [repr(e)], 'elapsed': float('nan'), 'peak_rss_mb': peak_rss_mb()}
+    connection.send(summary)
+    connection.close()
+
+def _collect_gd_summary(gd_number, process, connection):
+    """Reads the summary of a finished GD worker, or records it as crashed if it died without one."""
+    try:
+        summary = connection.recv() if connection.poll() else None
+    except (EOFError, OSError):
+        summary = None
+    connection.close()
+    process.join()
+    if summary is None:
+        logging.error(f"GD{gd_number} worker died with exit code {process.exitcode}")
+        summary = {'gd': gd_number, 'status': 'crashed', 'failed': [f"worker exit code {process.exitcode}"],
+                   'elapsed': float('nan'), 'peak_rss_mb': float('nan')}
+    return summary
+
+def run_many_gds(gd_numbers, jobs=None, memory_budget_mb=None, stage_workers=None, **run_options):
+    """
+    Runs several GDs concurrently, each in its own worker process.
+
+    A GD is only started while the estimated memory of the running GDs
+    (estimate_gd_memory_mb) fits in ``memory_budget_mb``; a GD that alone exceeds the
+    budget runs by itself. CPUs are split between the concurrent GDs, each running up
+    to ``stage_workers`` stages at once.
+
+    Returns:
+        list: run_gd summaries, in the order of ``gd_numbers`` (each GD once).
+    """
+    # Two runs of one GD would write the same analysis_output/GD<N>/ and manifest at once
+    unique_gd_numbers = list(dict.fromkeys(gd_numbers))
+    if len(unique_gd_numbers) < len(gd_numbers):
+        logging.warning(f"Duplicate GD numbers in {gd_numbers}; running each GD once.")
+    gd_numbers = unique_gd_numbers
+    cpus = os.cpu_count() or 1
+    jobs = max(1, min(jobs or cpus, len(gd_numbers)))
+    stage_workers = stage_workers or max(1, min(4, cpus // jobs))
+    estimates = {gd: estimate_gd_memory_mb(gd) for gd in gd_numbers}
+    if memory_budget_mb is None:
+        total = total_memory_mb()
+        memory_budget_mb = total * DEFAULT_MEMORY_BUDGET_FRACTION if total else float('inf')
+    logging.info(f"Running GDs {gd_numbers} with {jobs} jobs x {stage_workers} stage workers, "
+                 f"memory budget {memory_budget_mb:,.0f} MiB "
+                 f"(estimates: {', '.join(f'GD{gd} {mb:,.0f} MiB' for gd, mb in estimates.items())})")
+
+    # One spawned process per GD: no threads or matplotlib state are inherited, each
+    # GD's peak RSS is its own, and a worker that dies (e.g. killed for memory) only
+    # takes its own GD down
+    context = multiprocessing.get_context('spawn')
+    queue = list(gd_numbers)
+    running = {}
+    summaries = {}
+    while queue or running:
+        in_use = sum(estimates[gd] for gd, _, _ in running.values())
+        while queue and len(running) < jobs and (not running or in_use + estimates[queue[0]] <= memory_budget_mb):
+            gd = queue.pop(0)
+            if estimates[gd] > memory_budget_mb:
+                logging.warning(f"GD{gd} is estimated at {estimates[gd]:,.0f} MiB, over the memory budget; running it alone.")
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=_run_gd_worker, args=(sender, gd, dict(run_options, stage_workers=stage_workers)),
+                                      name=f"GD{gd}")
+            process.start()
+            sender.close()
+            running[process.sentinel] = (gd, process, receiver)
+            in_use += estimates[gd]
+        for sentinel in wait(list(running)):
+            gd, process, receiver = running.pop(sentinel)
+            summaries[gd] = _collect_gd_summary(gd, process, receiver)
+            logging.info(f"GD{gd} finished: {summaries[gd]['status']} in {summaries[gd]['elapsed']:.1f}s")
+    return [summaries[gd] for gd in gd_numbers]
+
+def print_run_summary(summaries):
+    """Prints the per-GD status and timing table for a multi-GD run."""
+    print("\n--- Pipeline Summary ---")
+    print(f"{'GD':<6}{'Status':<10}{'Time (s)':>10}{'Peak RSS (MiB)':>16}  Failed stages")
+    for summary in summaries:
+        print(f"{'GD' + str(summary['gd']):<6}{summary['status']:<10}{summary['elapsed']:>10.1f}"
+              f"{summary['peak_rss_mb']:>16,.0f}  {', '.join(summary['failed']) or '-'}")
 
 def main():
     parser = argparse.ArgumentParser(
-        description="Run the full Global Dialogues analysis pipeline for a specific cadence.",
+        description="Run the full Global Dialogues analysis pipeline for one or more cadences.",
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
-This script acts as a master controller, executing the following steps in order:
-  1. preprocess_aggregate.py: Standardizes the raw aggregate data.
-  2. calculate_tags.py: Analyzes tag data for frequency, agreement, and sentiment.
-  3. calculate_consensus.py: Calculates consensus profiles and major segment consensus.
-  4. calculate_divergence.py: Calculates divergence scores.
-  5. calculate_indicators.py: Generates indicator heatmaps.
-
-Each step uses the specified --gd_number to find input files and determine default output locations within Data/GD<N>/ and analysis_output/GD<N>/ respectively.
+This script acts as a master controller, running the following stages in one process:
+  1. preprocess_aggregate: Standardizes the raw aggregate data.
+  2. Then, concurrently, sharing the loaded standardized data and segment counts:
+     - calculate_tags: Analyzes tag data for frequency, agreement, and sentiment.
+     - calculate_consensus: Calculates consensus profiles and major segment consensus.
+     - calculate_divergence: Calculates divergence scores.
+     - calculate_indicators: Generates indicator heatmaps.
+
+Each stage uses the specified --gd_number to find input files and determine default output locations within Data/GD<N>/ and analysis_output/GD<N>/ respectively.
+
+Stages whose input files, parameters and scripts are unchanged since their last
+successful run (recorded in analysis_output/GD<N>/pipeline_manifest.json) are skipped.
+
+With --gd_numbers, several cadences run concurrently in worker processes (--jobs),
+within a memory budget, followed by a per-GD status and timing summary.
 """)
-    parser.add_argument("--gd_number", type=int, required=True, help="Global Dialogue cadence number (e.g., 1, 2, 3).")
-    # Add optional arguments if we want to pass overrides down, e.g., output dir, min_segment_size
-    # For now, keep it simple and rely on defaults or running scripts individually for customization.
-    # parser.add_argument("-o", "--output_dir_base", help="Override the base output directory (default: analysis_output)")
+    gd_group = parser.add_mutually_exclusive_group(required=True)
+    gd_group.add_argument("--gd_number", type=int, help="Global Dialogue cadence number (e.g., 1, 2, 3).")
+    gd_group.add_argument("--gd_numbers", type=int, nargs='+', help="Several cadence numbers to run concurrently (e.g., 1 2 3 4).")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="With --gd_numbers: number of cadences run at once (default: CPU count).")
+    parser.add_argument("--memory_budget_gb", type=float, default=None,
+                        help=f"With --gd_numbers: total estimated memory the concurrent cadences may use (default: {DEFAULT_MEMORY_BUDGET_FRACTION * 100:.0f}%% of RAM).")
+    parser.add_argument("--stage_workers", type=int, default=None,
+                        help="Maximum number of independent stages run concurrently per cadence (default: CPU count, up to 4, divided between jobs; 1 runs them one at a time).")
+    parser.add_argument("--preprocess_only", action="store_true",
+                        help="Only run preprocessing (metadata cleanup and aggregate standardization).")
+    parser.add_argument("--redraw-charts", action="store_true",
+                        help="Redraw indicator heatmaps even if their data is unchanged since the last run.")
+    parser.add_argument("--force", action="store_true",
+                        help="Rerun every stage, even those whose fingerprint is unchanged.")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Only report which stages would rerun and why.")
+    parser.add_argument("--trace", action="store_true",
+                        help="Record stage and step timings to analysis_output/GD<N>/traces/ (Chrome/Perfetto trace JSON and a summary CSV).")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="Like --trace, also recording RSS and tracemalloc peaks per step and the largest DataFrames after each stage (slower; use --stage_workers 1 for exact attribution).")
     
     args = parser.parse_args()
-    gd_num = args.gd_number
-
-    logging.info(f"Starting analysis pipeline for GD{gd_num}")
-
-    # List of scripts to run in order
-    # Optional: Add specific args per script if needed, e.g., [('script.py', ['--extra_arg', 'value'])]
-    scripts_to_run = [
-        ("preprocess_aggregate.py", None),
-        ("calculate_tags.py", None),         # <<< ADDED TAGS SCRIPT
-        ("calculate_consensus.py", None),
-        ("calculate_divergence.py", None),
-        ("calculate_indicators.py", None)
-    ]
-
-    all_success = True
-    for script_name, extra_args in scripts_to_run:
-        success = run_script(script_name, gd_num, extra_args)
-        if not success:
-            all_success = False
-            logging.error(f"Pipeline stopped due to failure in {script_name}.")
-            break # Stop pipeline on first failure
+    set_display_options()
+    gd_numbers = list(dict.fromkeys(args.gd_numbers or [args.gd_number])) # Each GD once, in the given order
+    run_options = dict(force=args.force, redraw_charts=args.redraw_charts, preprocess_only=args.preprocess_only,
+                       trace=args.trace, profile_memory=args.profile_memory)
+
+    if args.dry_run:
+        for gd_num in gd_numbers:
+            manifest_path = os.path.join("analysis_output", f"GD{gd_num}", PIPELINE_MANIFEST_FILENAME)
+            stages, artifacts = build_pipeline(gd_num, redraw_charts=args.redraw_charts, preprocess_only=args.preprocess_only)
+            print(f"Dry run for GD{gd_num} (manifest: {manifest_path}):")
+            for name, will_run, reasons in explain_pipeline(stages, artifacts, manifest_path, force=args.force):
+                status = {True: "RUN", False: "SKIP", None: "MAYBE"}[will_run]
+                print(f"  [{status:5}] {name}")
+                for reason in reasons:
+                    print(f"          - {reason}")
+        return
 
-    if all_success:
-        logging.info(f"Analysis pipeline for GD{gd_num} completed successfully.")
+    if args.gd_numbers:
+        memory_budget_mb = args.memory_budget_gb * 1024 if args.memory_budget_gb else None
+        summaries = run_many_gds(gd_numbers, jobs=args.jobs, memory_budget_mb=memory_budget_mb,
+                                 stage_workers=args.stage_workers, **run_options)
+        print_run_summary(summaries)
     else:
-        logging.warning(f"Analysis pipeline for GD{gd_num} completed with errors.")
+        summaries = [run_gd(args.gd_number, stage_workers=args.stage_workers, **run_options)]
+
+    for summary in summaries:
+        if summary['status'] == 'ok':
+            logging.info(f"Pipeline for GD{summary['gd']} completed successfully.")
+        else:
+            logging.warning(f"Pipeline for GD{summary['gd']} completed with errors (failed stages: {', '.join(summary['failed'])}).")
+    if any(summary['status'] != 'ok' for summary in summaries):
         sys.exit(1) # Exit with non-zero code to indicate failure
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -1,19 +1,14 @@
 import argparse
 import logging
 import os
-import pandas as pd
-import numpy as np
 import math
 import re
 # Assuming analysis_utils has the refined get_segment_columns
-from lib.analysis_utils import parse_percentage, get_segment_columns
+from lib.dataset import GDDataset
+from lib.analysis_utils import parse_percentage, get_segment_columns, trace_span, lazy_import, ignore_performance_warnings
 
-# --- Suppress PerformanceWarning ---
-import warnings
-from pandas.errors import PerformanceWarning
-# Suppress the specific PerformanceWarning related to fragmentation
-warnings.filterwarnings('ignore', category=PerformanceWarning)
-# --------------------------------
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -319,6 +314,84 @@ def calculate_major_segment_consensus(standardized_df, segment_counts_df, segmen
     return top_n_df
 
 
+def run_consensus_analysis(standardized_data, segment_counts_data, output_path, min_segment_size=15,
+                           percentiles=(100, 95, 90, 80, 70, 60, 50, 40, 30, 20, 10),
+                           top_n_percentiles=(100, 95, 90), top_n_count=5, top_n_major_consensus=10):
+    """
+    Runs the consensus profile and major segment consensus reports on already loaded data.
+    The input DataFrames are not modified (each report works on its own copy).
+
+    Returns:
+        tuple: (consensus profile results, major segment results) DataFrames (either may be None).
+    """
+    ignore_performance_warnings() # Fragmentation warnings from adding segment columns one by one
+    os.makedirs(output_path, exist_ok=True)
+    percentiles = list(percentiles)
+    top_n_percentiles = list(top_n_percentiles)
+
+    # --- Prepare Segment Details Map (for major segment O-code lookup) ---
+    # Extract O-code directly from the core segment names in the standardized header
+    all_std_columns = standardized_data.columns.tolist()
+    base_cols = [
+        "Question ID", "Question Type", "Question", "Response", "OriginalResponse",
+        "Star", "Categories", "Sentiment", "Submitted By", "Language", "Sample ID", "Participant ID"
+    ]
+    all_segment_columns_std = [col for col in all_std_columns if col not in base_cols]
+    
+    segment_details_map = {}
+    o_code_pattern = re.compile(r'^O(\d+):') # Pattern to find O-code at the start
+    for core_name in all_segment_columns_std:
+        o_code = None
+        match = o_code_pattern.match(core_name)
+        if match:
+            o_code = f"O{match.group(1)}" # Construct O-code like O1, O2
+        # Store minimal details needed (just o_code) keyed by core name
+        segment_details_map[core_name] = {'o_code': o_code}
+        
+    logging.info(f"Built segment details map for {len(segment_details_map)} segments based on standardized header.")
+
+
+    # --- Run Analysis Functions ---
+    with trace_span("consensus profiles", category="consensus", rows=len(standardized_data)):
+        consensus_results = calculate_consensus_profiles(
+            standardized_data.copy(), # Pass copy to avoid modifying original
+            segment_counts_data.copy(),
+            output_path,
+            min_segment_size=min_segment_size,
+            percentiles_to_calc=percentiles,
+            top_n_percentiles=top_n_percentiles,
+            top_n_count=top_n_count
+        )
+
+    with trace_span("major segment consensus", category="consensus", rows=len(standardized_data)):
+        major_segment_results = calculate_major_segment_consensus(
+            standardized_data.copy(),
+            segment_counts_data.copy(),
+            segment_details_map, # Pass the map for O-code lookup
+            output_path,
+            min_segment_size=min_segment_size, # Pass base min size
+            top_n=top_n_major_consensus
+        )
+
+    # --- Optional: Summary ---
+    if consensus_results is not None and not consensus_results.empty and f'MinAgree_{top_n_percentiles[0]}pct' in consensus_results.columns:
+         highest_consensus = consensus_results.loc[consensus_results[f'MinAgree_{top_n_percentiles[0]}pct'].idxmax()]
+         print("\n--- Overall Consensus Summary ---")
+         print(f"Highest Consensus Response ({top_n_percentiles[0]}th Percentile Minimum: {highest_consensus[f'MinAgree_{top_n_percentiles[0]}pct']:.4f}):")
+         print(f"  Question : {highest_consensus['Question Text'][:100]}...")
+         print(f"  Response : {highest_consensus['Response Text'][:100]}...")
+         print(f"  (Based on {highest_consensus['Num Valid Segments']} segments meeting size criteria for its question)")
+
+    if major_segment_results is not None and not major_segment_results.empty:
+         highest_min_overall = major_segment_results.loc[major_segment_results['Min Agreement Rate'].idxmax()]
+         print("\n--- Major Segment Highest Minimum Summary ---")
+         print(f"Highest Minimum Agreement Rate Across Major Segments Overall: {highest_min_overall['Min Agreement Rate']:.4f}")
+         print(f"  Question : {highest_min_overall['Question Text'][:100]}...")
+         print(f"  Response : {highest_min_overall['Response Text'][:100]}...")
+
+    return consensus_results, major_segment_results
+
+
 def main():
     parser = argparse.ArgumentParser(description='Calculate consensus analysis from standardized data.')
 
@@ -393,9 +466,10 @@ def main():
     os.makedirs(output_path, exist_ok=True)
 
     # --- Load Data ---
+    dataset = GDDataset(args.gd_number, paths={'aggregate': std_csv_path, 'segment_counts': counts_csv_path})
     logging.info(f"Loading standardized data from: {std_csv_path}")
     try:
-        standardized_data = pd.read_csv(std_csv_path, low_memory=False)
+        standardized_data = dataset.aggregate
         logging.info(f"Loaded standardized data with shape: {standardized_data.shape}")
     except FileNotFoundError:
         logging.error(f"Standardized data file not found: {std_csv_path}")
@@ -406,7 +480,7 @@ def main():
 
     logging.info(f"Loading segment counts data from: {counts_csv_path}")
     try:
-        segment_counts_data = pd.read_csv(counts_csv_path)
+        segment_counts_data = dataset.segment_counts
         logging.info(f"Loaded segment counts data with shape: {segment_counts_data.shape}")
     except FileNotFoundError:
         logging.error(f"Segment counts data file not found: {counts_csv_path}")
@@ -415,64 +489,17 @@ def main():
         logging.error(f"Error loading segment counts data: {e}")
         exit(1)
 
-    # --- Prepare Segment Details Map (for major segment O-code lookup) ---
-    # Extract O-code directly from the core segment names in the standardized header
-    all_std_columns = standardized_data.columns.tolist()
-    base_cols = [
-        "Question ID", "Question Type", "Question", "Response", "OriginalResponse",
-        "Star", "Categories", "Sentiment", "Submitted By", "Language", "Sample ID", "Participant ID"
-    ]
-    all_segment_columns_std = [col for col in all_std_columns if col not in base_cols]
-    
-    segment_details_map = {}
-    o_code_pattern = re.compile(r'^O(\d+):') # Pattern to find O-code at the start
-    for core_name in all_segment_columns_std:
-        o_code = None
-        match = o_code_pattern.match(core_name)
-        if match:
-            o_code = f"O{match.group(1)}" # Construct O-code like O1, O2
-        # Store minimal details needed (just o_code) keyed by core name
-        segment_details_map[core_name] = {'o_code': o_code}
-        
-    logging.info(f"Built segment details map for {len(segment_details_map)} segments based on standardized header.")
-
-
-    # --- Run Analysis Functions ---
-    consensus_results = calculate_consensus_profiles(
-        standardized_data.copy(), # Pass copy to avoid modifying original
-        segment_counts_data.copy(),
+    run_consensus_analysis(
+        standardized_data,
+        segment_counts_data,
         output_path,
         min_segment_size=args.min_segment_size,
-        percentiles_to_calc=args.percentiles,
+        percentiles=args.percentiles,
         top_n_percentiles=args.top_n_percentiles,
-        top_n_count=args.top_n_count
+        top_n_count=args.top_n_count,
+        top_n_major_consensus=args.top_n_major_consensus
     )
 
-    major_segment_results = calculate_major_segment_consensus(
-        standardized_data.copy(),
-        segment_counts_data.copy(),
-        segment_details_map, # Pass the map for O-code lookup
-        output_path,
-        min_segment_size=args.min_segment_size, # Pass base min size
-        top_n=args.top_n_major_consensus
-    )
-
-    # --- Optional: Summary ---
-    if consensus_results is not None and not consensus_results.empty and f'MinAgree_{args.top_n_percentiles[0]}pct' in consensus_results.columns:
-         highest_consensus = consensus_results.loc[consensus_results[f'MinAgree_{args.top_n_percentiles[0]}pct'].idxmax()]
-         print("\n--- Overall Consensus Summary ---")
-         print(f"Highest Consensus Response ({args.top_n_percentiles[0]}th Percentile Minimum: {highest_consensus[f'MinAgree_{args.top_n_percentiles[0]}pct']:.4f}):")
-         print(f"  Question : {highest_consensus['Question Text'][:100]}...")
-         print(f"  Response : {highest_consensus['Response Text'][:100]}...")
-         print(f"  (Based on {highest_consensus['Num Valid Segments']} segments meeting size criteria for its question)")
-
-    if major_segment_results is not None and not major_segment_results.empty:
-         highest_min_overall = major_segment_results.loc[major_segment_results['Min Agreement Rate'].idxmax()]
-         print("\n--- Major Segment Highest Minimum Summary ---")
-         print(f"Highest Minimum Agreement Rate Across Major Segments Overall: {highest_min_overall['Min Agreement Rate']:.4f}")
-         print(f"  Question : {highest_min_overall['Question Text'][:100]}...")
-         print(f"  Response : {highest_min_overall['Response Text'][:100]}...")
-
     logging.info("Consensus analysis script finished.")
 
 
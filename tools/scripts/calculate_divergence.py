@@ -3,15 +3,11 @@ import argparse
 import logging
 import os
 import math
-import pandas as pd
-import numpy as np
-from lib.analysis_utils import parse_percentage # Keep parse_percentage
+from lib.dataset import GDDataset
+from lib.analysis_utils import parse_percentage, trace_span, lazy_import, ignore_performance_warnings # Keep parse_percentage
 
-# --- Suppress PerformanceWarning if needed ---
-import warnings
-from pandas.errors import PerformanceWarning
-warnings.filterwarnings('ignore', category=PerformanceWarning)
-# --------------------------------
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -164,6 +160,41 @@ def calculate_divergence_report(standardized_df, segment_counts_df, output_dir,
     print("--- Divergence Calculation Complete ---")
     return results_df # Return the full results DataFrame
 
+def run_divergence_analysis(standardized_data, segment_counts_data, output_path, min_segment_size=15,
+                            top_n_per_question=20, top_n_overall=50):
+    """
+    Runs the divergence report on already loaded data and prints a short summary.
+    The input DataFrames are not modified.
+
+    Returns:
+        pd.DataFrame: Divergence results sorted by score, or None.
+    """
+    ignore_performance_warnings()
+    os.makedirs(output_path, exist_ok=True)
+
+    # --- Calculate Divergence --- 
+    with trace_span("divergence report", category="divergence", rows=len(standardized_data)):
+        results_df = calculate_divergence_report(
+            standardized_data.copy(), # Pass copy to avoid modifying original
+            segment_counts_data.copy(),
+            output_path, 
+            min_segment_size=min_segment_size,
+            top_n_per_question=top_n_per_question,
+            top_n_overall=top_n_overall
+        )
+        
+    # --- Summary --- 
+    if results_df is not None and not results_df.empty:
+        most_divergent = results_df.iloc[0] # Already sorted descending
+        print("\n--- Overall Divergence Summary ---")
+        print(f"Most Divergent Response Overall (Score: {most_divergent['Divergence Score']:.4f}):")
+        print(f"  Question : {most_divergent['Question Text'][:100]}...")
+        print(f"  Response : {most_divergent['Response Text'][:100]}...")
+        print(f"  Segments : {most_divergent['Min Segment']} ({most_divergent['Min Agreement']:.1%}) vs {most_divergent['Max Segment']} ({most_divergent['Max Agreement']:.1%})")
+        
+    return results_df
+
+
 def main():
     parser = argparse.ArgumentParser(description='Calculate divergence analysis from standardized data.')
     
@@ -228,10 +259,11 @@ def main():
 
     os.makedirs(output_path, exist_ok=True)
 
-    # --- Load Data --- 
+    # --- Load Data ---
+    dataset = GDDataset(args.gd_number, paths={'aggregate': std_csv_path, 'segment_counts': counts_csv_path})
     logging.info(f"Loading standardized data from: {std_csv_path}")
     try:
-        standardized_data = pd.read_csv(std_csv_path, low_memory=False)
+        standardized_data = dataset.aggregate
         logging.info(f"Loaded standardized data with shape: {standardized_data.shape}")
     except FileNotFoundError:
         logging.error(f"Standardized data file not found: {std_csv_path}"); exit(1)
@@ -240,32 +272,22 @@ def main():
 
     logging.info(f"Loading segment counts data from: {counts_csv_path}")
     try:
-        segment_counts_data = pd.read_csv(counts_csv_path)
+        segment_counts_data = dataset.segment_counts
         logging.info(f"Loaded segment counts data with shape: {segment_counts_data.shape}")
     except FileNotFoundError:
         logging.error(f"Segment counts data file not found: {counts_csv_path}"); exit(1)
     except Exception as e:
         logging.error(f"Error loading segment counts data: {e}"); exit(1)
 
-    # --- Calculate Divergence --- 
-    results_df = calculate_divergence_report(
-        standardized_data.copy(), # Pass copy to avoid modifying original
-        segment_counts_data.copy(),
-        output_path, 
+    run_divergence_analysis(
+        standardized_data,
+        segment_counts_data,
+        output_path,
         min_segment_size=args.min_segment_size,
         top_n_per_question=args.top_n_per_question,
         top_n_overall=args.top_n_overall
     )
         
-    # --- Summary --- 
-    if results_df is not None and not results_df.empty:
-        most_divergent = results_df.iloc[0] # Already sorted descending
-        print("\n--- Overall Divergence Summary ---")
-        print(f"Most Divergent Response Overall (Score: {most_divergent['Divergence Score']:.4f}):")
-        print(f"  Question : {most_divergent['Question Text'][:100]}...")
-        print(f"  Response : {most_divergent['Response Text'][:100]}...")
-        print(f"  Segments : {most_divergent['Min Segment']} ({most_divergent['Min Agreement']:.1%}) vs {most_divergent['Max Segment']} ({most_divergent['Max Agreement']:.1%})")
-        
     logging.info("Divergence analysis script finished.")
 
 if __name__ == "__main__":
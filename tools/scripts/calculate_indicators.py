@@ -4,14 +4,23 @@ import logging
 import os
 import re
 import textwrap
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from lib.analysis_utils import load_standardized_data, parse_percentage
+from concurrent.futures import ProcessPoolExecutor
+from lib.dataset import GDDataset
+from lib.analysis_utils import load_standardized_data, parse_percentage, chart_hash, chart_is_current, record_chart, trace_span, lazy_import
+
+def _use_agg_backend():
+    import matplotlib
+    matplotlib.use('Agg') # Files only; also lets worker processes render without a display
+
+pd = lazy_import('pandas')
+plt = lazy_import('matplotlib.pyplot', setup=_use_agg_backend)
+sns = lazy_import('seaborn')
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+HEATMAP_DPI = 150
+
 # --- Semantic Ordering for Responses ---
 # Defines the desired order for common response sets on the heatmap x-axis.
 RESPONSE_ORDERS = {
@@ -59,19 +68,19 @@ def longest_common_suffix(strings):
     # Reverse back to get common suffix
     return lcp_reversed[::-1]
 
-def generate_indicator_heatmaps(standardized_df, indicator_codesheet_path, output_dir):
+def prepare_heatmap_specs(standardized_df, indicator_codesheet_path, output_dir):
     """
-    Generates heatmaps for Indicator poll questions using standardized data,
-    grouped by category defined in the codesheet.
+    Prepares everything needed to draw the indicator heatmaps, one spec per category
+    defined in the codesheet: the pivoted data, labels, title and figure size.
 
     Args:
         standardized_df (pd.DataFrame): DataFrame from _aggregate_standardized.csv.
         indicator_codesheet_path (str): Path to the indicator codesheet CSV file.
-        output_dir (str): Directory to save the indicator heatmap PNG files.
-    """
-    print("\n--- Generating Indicator Heatmaps (using standardized data) --- ")
-    os.makedirs(output_dir, exist_ok=True)
+        output_dir (str): Directory the heatmap PNG files will be saved to.
 
+    Returns:
+        list: Heatmap spec dicts (see render_heatmap), or an empty list on error.
+    """
     # --- Load Indicator Codesheet ---
     try:
         indicator_df = pd.read_csv(indicator_codesheet_path)
@@ -81,8 +90,8 @@ def generate_indicator_heatmaps(standardized_df, indicator_codesheet_path, outpu
         qtext_to_category = indicator_polls.set_index('question_text')['question_category'].to_dict()
         qtext_to_code = indicator_polls.set_index('question_text')['question_code'].to_dict()
         print(f"  Loaded {len(indicator_polls)} indicator poll questions from: {indicator_codesheet_path}")
-    except FileNotFoundError: print(f"  Error: Indicator codesheet not found at {indicator_codesheet_path}"); return
-    except Exception as e: print(f"  Error loading indicator codesheet: {e}"); return
+    except FileNotFoundError: print(f"  Error: Indicator codesheet not found at {indicator_codesheet_path}"); return []
+    except Exception as e: print(f"  Error loading indicator codesheet: {e}"); return []
 
     # --- Filter Standardized Data for Indicator Polls ---
     indicator_q_texts = list(qtext_to_category.keys())
@@ -92,14 +101,15 @@ def generate_indicator_heatmaps(standardized_df, indicator_codesheet_path, outpu
     ].copy()
 
     if indicator_data.empty:
-        print("  Warning: No matching indicator poll question data found in the standardized file."); return
+        print("  Warning: No matching indicator poll question data found in the standardized file."); return []
 
     # Add category information based on the codesheet mapping
     indicator_data['Category'] = indicator_data['Question'].map(qtext_to_category)
 
-    # --- Generate Heatmap per Category ---
+    # --- Prepare Heatmap Data per Category ---
+    specs = []
     for category, group in indicator_data.groupby('Category'):
-        print(f"  Generating heatmap for category: {category} ({group['Question'].nunique()} questions)")
+        print(f"  Preparing heatmap for category: {category} ({group['Question'].nunique()} questions)")
         category_data_for_pivot = []
         ordered_labels_info = []
         full_texts_in_category = group['Question'].unique().tolist()
@@ -189,37 +199,115 @@ def generate_indicator_heatmaps(standardized_df, indicator_codesheet_path, outpu
              heatmap_pivot = heatmap_pivot.sort_index(axis=1) # Fallback on any sorting error
         # --- <<< END Semantic Column Ordering >>> ---
 
-        # --- Plotting (same logic as before) ---
+        # --- Figure layout ---
         n_rows, n_cols = heatmap_pivot.shape
         fig_width = max(8, n_cols * 0.9 + max(0, max_lines_in_ylabel -1) * 1.5 )
         fig_height = max(5, n_rows * 0.7 + 2.5)
-        plt.figure(figsize=(fig_width, fig_height))
-
         wrapped_title_line2 = textwrap.fill(title_line2, width=80)
-        final_title = f"{title_line1}\n{wrapped_title_line2}".strip()
 
-        ax = sns.heatmap(heatmap_pivot, annot=True, fmt=".0%", cmap="Blues", linewidths=.5, cbar=False, annot_kws={"size": 9})
-        
-        ordered_wrapped_labels = [label for text, label in ordered_labels_info]
-        ax.set_yticklabels(ordered_wrapped_labels, rotation=0, fontsize=9, va='center') 
-        
+        safe_category_name = re.sub(r'[^\w\-\. ]', '', category).strip().replace(' ', '_')
+        specs.append({
+            'category': category,
+            'pivot': heatmap_pivot,
+            'y_labels': [label for text, label in ordered_labels_info],
+            'title': f"{title_line1}\n{wrapped_title_line2}".strip(),
+            'y_axis_label': "Question Detail" if y_label_type == 'varying_part' else "Question Code",
+            'figsize': (fig_width, fig_height),
+            'path': os.path.join(output_dir, f"indicator_heatmap_{safe_category_name}.png"),
+        })
+
+    return specs
+
+
+def heatmap_spec_hash(spec):
+    """Hashes a heatmap's pivot data and plotting parameters (everything that affects the PNG)."""
+    params = {key: spec[key] for key in ('y_labels', 'title', 'y_axis_label', 'figsize')}
+    params['dpi'] = HEATMAP_DPI
+    return chart_hash(spec['pivot'], params)
+
+
+def render_heatmap(spec):
+    """
+    Draws and saves one indicator heatmap (runs in a worker process, Agg backend).
+
+    Args:
+        spec (dict): Heatmap spec from prepare_heatmap_specs with keys 'category', 'pivot',
+            'y_labels', 'title', 'y_axis_label', 'figsize' and 'path'.
+
+    Returns:
+        tuple: (path, error message or None)
+    """
+    try:
+        plt.figure(figsize=spec['figsize'])
+
+        ax = sns.heatmap(spec['pivot'], annot=True, fmt=".0%", cmap="Blues", linewidths=.5, cbar=False, annot_kws={"size": 9})
+        ax.set_yticklabels(spec['y_labels'], rotation=0, fontsize=9, va='center')
+
         plt.xticks(rotation=30, ha='right', fontsize=9)
-        plt.title(final_title, fontsize=11, pad=25)
+        plt.title(spec['title'], fontsize=11, pad=25)
         plt.xlabel("Response Options", fontsize=10)
-        plt.ylabel("Question Detail" if y_label_type == 'varying_part' else "Question Code", fontsize=10)
-        
+        plt.ylabel(spec['y_axis_label'], fontsize=10)
+
         plt.tight_layout(rect=[0, 0.03, 1, 0.93])
-        
-        # --- Save heatmap ---
-        safe_category_name = re.sub(r'[^\w\-\. ]', '', category).strip().replace(' ', '_')
-        heatmap_filename = f"indicator_heatmap_{safe_category_name}.png"
-        heatmap_path = os.path.join(output_dir, heatmap_filename)
-        try:
-            plt.savefig(heatmap_path, dpi=150, bbox_inches='tight')
-            print(f"    Saved heatmap to: {heatmap_path}")
-        except Exception as e:
-            print(f"    Error saving heatmap for category '{category}': {e}")
-        plt.close()
+        plt.savefig(spec['path'], dpi=HEATMAP_DPI, bbox_inches='tight')
+        return spec['path'], None
+    except Exception as e:
+        return spec['path'], str(e)
+    finally:
+        plt.close('all')
+
+
+def generate_indicator_heatmaps(standardized_df, indicator_codesheet_path, output_dir, workers=None, redraw=False):
+    """
+    Generates heatmaps for Indicator poll questions using standardized data,
+    grouped by category defined in the codesheet.
+
+    Pivot data is prepared once in this process; rendering is farmed out to a
+    process pool (matplotlib Agg backend), since drawing and saving dominate runtime.
+
+    Args:
+        standardized_df (pd.DataFrame): DataFrame from _aggregate_standardized.csv.
+        indicator_codesheet_path (str): Path to the indicator codesheet CSV file.
+        output_dir (str): Directory to save the indicator heatmap PNG files.
+        workers (int): Number of render processes (None = CPU count, 1 = serial).
+        redraw (bool): Re-render every heatmap, even those whose data hash matches the
+            last render (recorded next to each PNG as <name>.png.chart.json).
+    """
+    print("\n--- Generating Indicator Heatmaps (using standardized data) --- ")
+    os.makedirs(output_dir, exist_ok=True)
+
+    with trace_span("heatmaps: prepare", category="charts", rows=len(standardized_df)):
+        specs = prepare_heatmap_specs(standardized_df, indicator_codesheet_path, output_dir)
+    if not specs:
+        return
+
+    # --- Skip heatmaps whose inputs are unchanged since the last render ---
+    hashes = {spec['path']: heatmap_spec_hash(spec) for spec in specs}
+    to_render = []
+    for spec in specs:
+        if not redraw and chart_is_current(spec['path'], hashes[spec['path']]):
+            print(f"    Unchanged, skipping: {spec['path']}")
+            continue
+        to_render.append(spec)
+
+    # --- Render ---
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(to_render)))
+    with trace_span("heatmaps: render", category="charts", charts=len(to_render), workers=workers):
+        if workers == 1:
+            results = [render_heatmap(spec) for spec in to_render]
+        else:
+            print(f"  Rendering {len(to_render)} heatmaps with {workers} worker processes...")
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(render_heatmap, to_render))
+
+    for path, error in results:
+        if error:
+            print(f"    Error saving heatmap {path}: {error}")
+            continue
+        print(f"    Saved heatmap to: {path}")
+        record_chart(path, hashes[path])
 
     print("--- Indicator Heatmap Generation Complete ---")
 
@@ -237,6 +325,10 @@ def main():
 
     # Output directory
     parser.add_argument('-o', '--output_dir', help='Directory to save indicator heatmap output files (required if --standardized_csv is used).')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='Number of processes used to render heatmaps (default: CPU count; 1 renders serially).')
+    parser.add_argument('--redraw-charts', action='store_true',
+                       help='Re-render all heatmaps, even those whose data is unchanged since the last run.')
     parser.add_argument('--debug', action='store_true', help='Enable debug logging.')
 
     args = parser.parse_args()
@@ -280,9 +372,10 @@ def main():
     os.makedirs(output_path, exist_ok=True)
 
     # --- Load Data ---
+    dataset = GDDataset(args.gd_number, paths={'aggregate': std_csv_path})
     logging.info(f"Loading standardized data from: {std_csv_path}")
     try:
-        standardized_data = pd.read_csv(std_csv_path, low_memory=False)
+        standardized_data = dataset.aggregate
         logging.info(f"Loaded standardized data with shape: {standardized_data.shape}")
     except FileNotFoundError:
         logging.error(f"Standardized data file not found: {std_csv_path}"); exit(1)
@@ -290,7 +383,8 @@ def main():
         logging.error(f"Error loading standardized data: {e}"); exit(1)
 
     # --- Generate Heatmaps ---
-    generate_indicator_heatmaps(standardized_data, codesheet_path, output_path)
+    generate_indicator_heatmaps(standardized_data, codesheet_path, output_path,
+                                workers=args.workers, redraw=args.redraw_charts)
     
     logging.info("Indicator analysis script finished.")
 
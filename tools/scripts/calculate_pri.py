@@ -7,72 +7,88 @@ combining multiple signals to create a comprehensive measure of participant enga
 and response quality.
 
 Usage:
-    python calculate_pri.py <gd_number> [--debug] [--limit N]
+    python calculate_pri.py <gd_number> [--debug] [--limit N] [--low-quality-tags TAG ...]
 
 Arguments:
-    gd_number   The Global Dialogue number (e.g., 1, 2, 3)
-    --debug     Enable verbose debug output
-    --limit     Limit processing to first N participants (for testing)
+    gd_number           The Global Dialogue number (e.g., 1, 2, 3)
+    --debug             Enable verbose debug output
+    --limit             Limit processing to first N participants (for testing)
+    --low-quality-tags  Tag names that mark a response as low quality
+    --trace             Write a per-step timing trace to analysis_output/GD<N>/traces/
+    --profile-memory    Like --trace, also recording per-step memory peaks and the largest DataFrames
 
 Output:
     CSV file with participant IDs and calculated metrics
 """
 
-import pandas as pd
-import numpy as np
 import argparse
 import time
 import sys
 import os
 import asyncio
+import functools
 import json
 from datetime import datetime
 from pathlib import Path
+from types import SimpleNamespace
 from typing import List, Dict, Optional, Tuple
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
-from dotenv import load_dotenv
-import aiohttp
-from pydantic import BaseModel, Field
-from scipy.stats import pearsonr, spearmanr
+from lib.dataset import GDDataset
+from lib.analysis_utils import build_dimension_tables, encode_dimension_columns, get_dimensions_dir, chart_hash, chart_is_current, record_chart, start_trace, stop_trace, trace_span, memory_checkpoint, TRACE_DIRNAME, lazy_import
 
-# Load environment variables
-load_dotenv()
+# Imported on first use: charts, statistics and the LLM judge are not needed by every run
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+plt = lazy_import('matplotlib.pyplot')
+mpatches = lazy_import('matplotlib.patches')
+scipy_stats = lazy_import('scipy.stats')
+aiohttp = lazy_import('aiohttp')
 
 
 # --- Pydantic Models for LLM Judge ---
 
-class LLMJudgeResponse(BaseModel):
-    """Pydantic model for LLM judge response parsing."""
-    confidence_score: float = Field(
-        ..., 
-        ge=0.0, 
-        le=1.0, 
-        description="Confidence score from 0.0 to 1.0 on participant earnestness"
-    )
-    reasoning: str = Field(
-        ..., 
-        min_length=10, 
-        description="Brief explanation of the confidence score"
-    )
+@functools.lru_cache(maxsize=None)
+def llm_judge_models():
+    """
+    Defines the pydantic models for the LLM judge on first use, so runs without
+    --llm-judge don't import pydantic.
 
+    Returns:
+        SimpleNamespace with LLMJudgeResponse, ParticipantResponses and LLMJudgeConfig.
+    """
+    from pydantic import BaseModel, Field
+
+    class LLMJudgeResponse(BaseModel):
+        """Pydantic model for LLM judge response parsing."""
+        confidence_score: float = Field(
+            ..., 
+            ge=0.0, 
+            le=1.0, 
+            description="Confidence score from 0.0 to 1.0 on participant earnestness"
+        )
+        reasoning: str = Field(
+            ..., 
+            min_length=10, 
+            description="Brief explanation of the confidence score"
+        )
 
-class ParticipantResponses(BaseModel):
-    """Pydantic model for participant response data."""
-    participant_id: str
-    responses: List[Dict[str, str]]  # List of {question: response} pairs
-    
+    class ParticipantResponses(BaseModel):
+        """Pydantic model for participant response data."""
+        participant_id: str
+        responses: List[Dict[str, str]]  # List of {question: response} pairs
+
+    class LLMJudgeConfig(BaseModel):
+        """Configuration for LLM judge assessment."""
+        models: List[str] = [
+            "anthropic/claude-sonnet-4",
+            "openai/gpt-4o-mini", 
+            "google/gemini-2.5-flash-preview"
+        ]
+        api_base_url: str = "https://openrouter.ai/api/v1"
+        max_concurrent_requests: int = 10
+        timeout_seconds: int = 60
 
-class LLMJudgeConfig(BaseModel):
-    """Configuration for LLM judge assessment."""
-    models: List[str] = [
-        "anthropic/claude-sonnet-4",
-        "openai/gpt-4o-mini", 
-        "google/gemini-2.5-flash-preview"
-    ]
-    api_base_url: str = "https://openrouter.ai/api/v1"
-    max_concurrent_requests: int = 10
-    timeout_seconds: int = 60
+    return SimpleNamespace(LLMJudgeResponse=LLMJudgeResponse, ParticipantResponses=ParticipantResponses,
+                           LLMJudgeConfig=LLMJudgeConfig)
 
 
 def parse_args():
@@ -82,6 +98,14 @@ def parse_args():
     parser.add_argument('--debug', action='store_true', help='Enable verbose debug output')
     parser.add_argument('--limit', type=int, help='Limit processing to first N participants (for testing)', default=None)
     parser.add_argument('--llm-judge', action='store_true', help='Enable LLM judge assessment (requires API key and costs $)')
+    parser.add_argument('--low-quality-tags', nargs='+', default=None,
+                        help="Tag names that mark a response as low quality (default: 'Uninformative answer')")
+    parser.add_argument('--trace', action='store_true',
+                        help='Record per-step timings: writes a Chrome/Perfetto trace JSON and a summary CSV to analysis_output/GD<N>/traces/')
+    parser.add_argument('--profile-memory', action='store_true',
+                        help='Like --trace, also recording RSS and tracemalloc peaks per step and the largest DataFrames after each load (slower)')
+    parser.add_argument('--redraw-charts', action='store_true',
+                        help='Redraw the PRI distribution chart even if its data is unchanged since the last run')
     return parser.parse_args()
 
 
@@ -100,6 +124,7 @@ def get_config(gd_number):
     
     # File paths
     config = {
+        'GD_NUMBER': gd_number,
         'DATA_DIR': str(data_dir),
         'TAGS_DIR': str(tags_dir),
         'OUTPUT_DIR': str(output_dir),
@@ -111,6 +136,7 @@ def get_config(gd_number):
         'THOUGHT_LABELS_PATH': str(tags_dir / "all_thought_labels.csv"),
         'DISCUSSION_GUIDE_PATH': str(data_dir / f"GD{gd_number}_discussion_guide.csv"),
         'OUTPUT_PATH': str(output_dir / f"GD{gd_number}_pri_scores.csv"),
+        'DIMENSIONS_DIR': get_dimensions_dir(gd_number),
         
         # PRI Parameters (per documentation)
         'ASC_HIGH_THRESHOLD': 0.70,                         # Agreement rate for strong agreement
@@ -119,6 +145,8 @@ def get_config(gd_number):
         'UNIVERSAL_DISAGREEMENT_THRESHOLD_SEGMENTS': 0.40,  # Max agreement for "disagreed" responses for all individual Segments
         'MAJOR_SEGMENT_MIN_PARTICIPANTS': 20,               # Min participants required for a segment to be considered "major"
         'DURATION_REASONABLE_MAX': 60*90,                   # Reasonable max duration to complete survey in seconds
+        'DURATION_IDLE_GAP_THRESHOLD': 60*5,                # Gaps between activities above this (seconds) count as idle
+        'LOW_QUALITY_TAGS': ['Uninformative answer'],       # Tags that mark a response as low quality
 
         
         # Component weights for final PRI score (without LLM judge)
@@ -138,15 +166,42 @@ def get_config(gd_number):
     return config
 
 
-def load_data(config, debug=False):
+# Tables read by load_data (table name -> columns, None for all), preloaded concurrently
+PRI_INPUT_TABLES = {
+    'binary_votes': None,
+    'preference_votes': None,
+    'thought_labels': ['Question ID', 'Participant ID'],
+    'thought_tags': None,
+    'tag_dictionary': None,
+    'verbatim_map': None,
+    'aggregate': None,
+    'segment_counts': None,
+}
+
+def load_data(config, debug=False, dataset=None):
     """
     Load and preprocess all necessary data files.
     
+    Args:
+        config: Dictionary with configuration values
+        debug: Whether to print debug information
+        dataset: GDDataset to take the tables from (a new one for config['GD_NUMBER'] if None);
+                 its cached tables are not modified
+    
     Returns:
         Tuple of DataFrames, participant IDs, and major segments:
         (binary_df, preference_df, thought_labels_df, verbatim_map_df, aggregate_std_df, all_participant_ids, major_segments)
     """
     print(f"Loading data from {config['DATA_DIR']}...")
+    if dataset is None:
+        dataset = GDDataset(config['GD_NUMBER'])
+    
+    # With the Arrow reader (which releases the GIL) and several CPUs, read every input
+    # file at once; a file that fails is reported by its own step below. pandas' parsers
+    # hold the GIL, so with them a thread pool is slower than reading one file at a time.
+    if dataset.csv_reader == 'arrow' and (os.cpu_count() or 1) > 1:
+        with trace_span("read input files", category="load"):
+            dataset.preload(PRI_INPUT_TABLES)
     
     # Set pandas display options for debugging
     if debug:
@@ -155,57 +210,57 @@ def load_data(config, debug=False):
     
     # 1. Load binary vote data
     try:
-        binary_df = pd.read_csv(config['BINARY_PATH'], quotechar='"', low_memory=False)
-        
-        # Convert timestamps to datetime
-        if 'Timestamp' in binary_df.columns:
-            binary_df['Timestamp'] = pd.to_datetime(
-                binary_df['Timestamp'], 
-                format='%B %d, %Y at %I:%M %p (GMT)',
-                errors='coerce'
-            )
-        
-        # Normalize vote values
-        if 'Vote' in binary_df.columns:
-            binary_df['VoteNumeric'] = binary_df['Vote'].map(
-                {'Agree': 1, 'agree': 1, 'Disagree': 0, 'disagree': 0}
-            ).astype(float)
-        
-        print(f"Loaded binary data with shape: {binary_df.shape}")
+        with trace_span("load binary", category="load") as span:
+            binary_df = dataset.binary_votes # Timestamps already parsed
+        
+            # Normalize vote values
+            if 'Vote' in binary_df.columns:
+                binary_df['VoteNumeric'] = binary_df['Vote'].map(
+                    {'Agree': 1, 'agree': 1, 'Disagree': 0, 'disagree': 0}
+                ).astype(float)
+        
+            print(f"Loaded binary data with shape: {binary_df.shape}")
+            span['rows'] = len(binary_df)
+        memory_checkpoint("loaded binary")
     except Exception as e:
         print(f"Error loading binary data: {e}")
         sys.exit(1)
     
     # 2. Load preference judgment data
     try:
-        preference_df = pd.read_csv(config['PREFERENCE_PATH'], quotechar='"', low_memory=False)
-        
-        # Convert timestamps to datetime
-        if 'Timestamp' in preference_df.columns:
-            preference_df['Timestamp'] = pd.to_datetime(
-                preference_df['Timestamp'], 
-                format='%B %d, %Y at %I:%M %p (GMT)',
-                errors='coerce'
-            )
-        
-        print(f"Loaded preference data with shape: {preference_df.shape}")
+        with trace_span("load preference", category="load") as span:
+            preference_df = dataset.preference_votes # Timestamps already parsed
+            print(f"Loaded preference data with shape: {preference_df.shape}")
+            span['rows'] = len(preference_df)
+        memory_checkpoint("loaded preference")
     except Exception as e:
         print(f"Error loading preference data: {e}")
         sys.exit(1)
     
-    # 3. Load thought labels data (for quality tags)
+    # 3. Load thought labels data (for quality tags) in long format: one row per
+    #    (response, tag), with a missing Tag for labeled responses that carry no tags
     try:
-        thought_labels_df = pd.read_csv(config['THOUGHT_LABELS_PATH'], encoding='utf-8-sig')
-        print(f"Loaded thought labels data with shape: {thought_labels_df.shape}")
+        with trace_span("load thought labels", category="load") as span:
+            responses_df = dataset.table('thought_labels', columns=['Question ID', 'Participant ID'])
+            thought_tags_df, tag_dictionary_df = dataset.thought_tags, dataset.tag_dictionary
+            response_tags = thought_tags_df.merge(tag_dictionary_df[['tag_id', 'Tag']], on='tag_id')
+            thought_labels_df = responses_df.drop_duplicates().merge(
+                response_tags[['Question ID', 'Participant ID', 'Tag']], on=['Question ID', 'Participant ID'], how='left')
+            print(f"Loaded thought labels data: {len(responses_df)} responses, {len(thought_tags_df)} tags")
+            span['rows'] = len(thought_labels_df)
+        memory_checkpoint("loaded thought labels")
     except Exception as e:
         print(f"Error loading thought labels data: {e}")
         # Non-fatal error - can continue without tags
-        thought_labels_df = pd.DataFrame(columns=['Participant ID', 'Question ID'])
+        thought_labels_df = pd.DataFrame(columns=['Participant ID', 'Question ID', 'Tag'])
     
     # 4. Load verbatim map data
     try:
-        verbatim_map_df = pd.read_csv(config['VERBATIM_MAP_PATH'], quotechar='"', engine='python')
-        print(f"Loaded verbatim map data with shape: {verbatim_map_df.shape}")
+        with trace_span("load verbatim map", category="load") as span:
+            verbatim_map_df = dataset.verbatim_map
+            print(f"Loaded verbatim map data with shape: {verbatim_map_df.shape}")
+            span['rows'] = len(verbatim_map_df)
+        memory_checkpoint("loaded verbatim map")
     except Exception as e:
         print(f"Error loading verbatim map data: {e}")
         sys.exit(1)
@@ -213,8 +268,8 @@ def load_data(config, debug=False):
     # 5. Load aggregate standardized data
     try:
         # Suppress dtype warnings for mixed columns
-        with pd.option_context('mode.chained_assignment', None):
-            aggregate_std_df = pd.read_csv(config['AGGREGATE_STD_PATH'], low_memory=False)
+        with trace_span("load aggregate", category="load") as span, pd.option_context('mode.chained_assignment', None):
+            aggregate_std_df = dataset.aggregate
             
             # Convert percentage columns to numeric values
             if 'All' in aggregate_std_df.columns:
@@ -223,7 +278,7 @@ def load_data(config, debug=False):
                 )
             
             # Load major segments from segment counts file
-            major_segments = load_major_segments(config, debug)
+            major_segments = load_major_segments(config, debug, dataset)
             
             # Convert percentage columns to numeric values for major segment columns
             segment_cols = [col for col in aggregate_std_df.columns if col in major_segments]
@@ -239,10 +294,21 @@ def load_data(config, debug=False):
                     print(f"Processed {len(segment_cols)} major segment columns for agreement calculation")
 
             print(f"Loaded aggregate data with shape: {aggregate_std_df.shape}")
+            span['rows'] = len(aggregate_std_df)
+        memory_checkpoint("loaded aggregate")
     except Exception as e:
         print(f"Error loading aggregate data: {e}")
         sys.exit(1)
     
+    # Store participant/question/thought IDs as integer codes against the GD's persisted
+    # dimension tables, so joins and groupbys below don't hash UUID strings
+    fact_tables = [binary_df, preference_df, thought_labels_df, verbatim_map_df, aggregate_std_df]
+    with trace_span("encode dimensions", category="load", rows=sum(len(df) for df in fact_tables)):
+        dimensions = build_dimension_tables(config['DIMENSIONS_DIR'], fact_tables, segments=major_segments)
+        for df in fact_tables:
+            encode_dimension_columns(df, dimensions)
+    memory_checkpoint("encoded dimensions")
+    
     # Get unique participant IDs from binary votes
     all_participant_ids = binary_df['Participant ID'].unique()
     print(f"Found {len(all_participant_ids)} unique participants")
@@ -296,19 +362,22 @@ def parse_percentage(value, debug=False):
         return np.nan
 
 
-def load_major_segments(config, debug=False):
+def load_major_segments(config, debug=False, dataset=None):
     """
     Load and identify major segments based on participation counts from segment counts file.
     
     Args:
         config: Dictionary with configuration values including SEGMENT_COUNTS_PATH
         debug: Whether to print debug information
+        dataset: GDDataset holding the segment counts (read from SEGMENT_COUNTS_PATH if None)
         
     Returns:
         List of segment names that qualify as "major" (have sufficient participation)
     """
     try:
-        segment_counts_df = pd.read_csv(config['SEGMENT_COUNTS_PATH'])
+        if dataset is None:
+            dataset = GDDataset(paths={'segment_counts': config['SEGMENT_COUNTS_PATH']})
+        segment_counts_df = dataset.segment_counts
         
         # Get segment columns (exclude metadata columns)
         excluded_prefixes = ('Question ID', 'Question Text', 'All', '44+', '55+')
@@ -352,201 +421,192 @@ def load_major_segments(config, debug=False):
 
 # --- Signal Calculation Functions ---
 
-def calculate_duration(participant_id, binary_df, preference_df, debug=False):
+def build_duration_index(binary_df, preference_df, idle_gap_threshold, debug=False):
     """
-    Calculate the total time a participant spent in the survey based on timestamps.
+    Build a per-participant activity index from binary vote and preference judgment timestamps.
+    
+    Both timestamp sources are concatenated once and sorted by (Participant ID, Timestamp), so
+    all metrics come out of a single vectorized pass:
+    - Duration_seconds: time between first and last recorded activity (0 if fewer than 2 timestamps)
+    - ActiveDuration_seconds: sum of gaps between consecutive activities, excluding idle gaps
+      longer than ``idle_gap_threshold`` seconds
+    - VotesPerMinute: recorded activities per minute of active time
     
     Args:
-        participant_id: Unique ID of the participant
         binary_df: DataFrame with binary vote timestamps
         preference_df: DataFrame with preference judgment timestamps
+        idle_gap_threshold: Gaps (in seconds) above this are treated as idle time
         debug: Whether to print debug information
         
     Returns:
-        pd.Timedelta: Duration between first and last recorded activity
+        DataFrame indexed by Participant ID with First_Activity, Last_Activity, Activity_Count,
+        Duration_seconds, ActiveDuration_seconds and VotesPerMinute
     """
     if debug:
-        print(f"[Duration {participant_id}] Calculating duration...")
-    
-    # Filter timestamps for this participant
-    participant_binary_times = binary_df[binary_df['Participant ID'] == participant_id]['Timestamp'].dropna()
-    participant_pref_times = preference_df[preference_df['Participant ID'] == participant_id]['Timestamp'].dropna()
-    
-    # Combine all timestamps
-    all_times = pd.concat([participant_binary_times, participant_pref_times])
-    
-    # Check if we have enough timestamps
-    if len(all_times) < 2:
-        if debug:
-            print(f"[Duration {participant_id}] Insufficient timestamps (found {len(all_times)})")
-        return pd.Timedelta(seconds=0)
-    
-    # Calculate time difference between first and last activity
-    duration = all_times.max() - all_times.min()
+        print(f"[Duration] Building duration index (idle gap threshold: {idle_gap_threshold}s)...")
+    
+    # Combine all timestamps once, ordered within each participant
+    all_times = pd.concat(
+        [binary_df[['Participant ID', 'Timestamp']], preference_df[['Participant ID', 'Timestamp']]],
+        ignore_index=True
+    ).dropna()
+    all_times = all_times.sort_values(['Participant ID', 'Timestamp'], kind='mergesort')
+    
+    # Gaps between consecutive activities of the same participant; idle gaps count as zero
+    same_participant = all_times['Participant ID'].eq(all_times['Participant ID'].shift())
+    gaps = all_times['Timestamp'].diff().dt.total_seconds().where(same_participant)
+    all_times['Active_Gap_seconds'] = gaps.where(gaps <= idle_gap_threshold, 0.0)
+    
+    duration_index = all_times.groupby('Participant ID', observed=True).agg(
+        First_Activity=('Timestamp', 'min'),
+        Last_Activity=('Timestamp', 'max'),
+        Activity_Count=('Timestamp', 'count'),
+        ActiveDuration_seconds=('Active_Gap_seconds', 'sum'),
+    )
+    duration_index['Duration_seconds'] = (
+        duration_index['Last_Activity'] - duration_index['First_Activity']
+    ).dt.total_seconds()
+    duration_index['VotesPerMinute'] = (
+        duration_index['Activity_Count'] / (duration_index['ActiveDuration_seconds'] / 60)
+    ).where(duration_index['ActiveDuration_seconds'] > 0)
     
     if debug:
-        print(f"[Duration {participant_id}] First activity: {all_times.min()}")
-        print(f"[Duration {participant_id}] Last activity: {all_times.max()}")
-        print(f"[Duration {participant_id}] Duration: {duration}")
+        insufficient = (duration_index['Activity_Count'] < 2).sum()
+        print(f"[Duration] Indexed {len(duration_index)} participants from {len(all_times)} timestamps "
+              f"({insufficient} with fewer than 2 timestamps)")
+        print(f"[Duration] Median duration: {duration_index['Duration_seconds'].median():.0f}s, "
+              f"median active time: {duration_index['ActiveDuration_seconds'].median():.0f}s")
     
-    return duration
+    return duration_index
 
 
-def calculate_low_quality_tag_percentage(participant_id, thought_labels_df, debug=False):
+def calculate_low_quality_tag_percentages(thought_labels_df, low_quality_tags, debug=False):
     """
-    Calculate the percentage of a participant's responses tagged as 'Uninformative answer'.
+    Calculate, for all participants at once, the percentage of responses carrying a low-quality tag.
+    
+    A response counts as low quality if any of its tags is one of ``low_quality_tags``.
+    The check runs as a single vectorized ``isin`` over the long tag table, followed by
+    one groupby per response and one mean per participant.
     
     Args:
-        participant_id: Unique ID of the participant
-        thought_labels_df: DataFrame with thought labels
+        thought_labels_df: DataFrame with thought labels in long format ('Question ID',
+                           'Participant ID', 'Tag'; Tag is missing for untagged responses)
+        low_quality_tags: Iterable of tag names that mark a response as low quality
         debug: Whether to print debug information
         
     Returns:
-        float: Ratio of low quality responses to total responses (0-1)
+        pd.Series: Ratio of low quality responses to total labeled responses (0-1),
+                   indexed by Participant ID. Participants without labels are absent.
     """
     if debug:
-        print(f"[LowQuality {participant_id}] Calculating low quality percentage...")
+        print(f"[LowQuality] Calculating low quality percentages (tags: {list(low_quality_tags)})...")
     
-    # If no thought labels data is available, return 0
-    if thought_labels_df.empty:
+    # If no thought labels data is available, nobody can be evaluated
+    if thought_labels_df.empty or 'Participant ID' not in thought_labels_df.columns:
         if debug:
-            print(f"[LowQuality {participant_id}] No thought labels data available")
-        return 0.0
-    
-    # Filter for this participant's labeled responses
-    participant_labels = thought_labels_df[thought_labels_df['Participant ID'] == participant_id]
+            print("[LowQuality] No thought labels data available")
+        return pd.Series(dtype=float)
     
-    if participant_labels.empty:
-        if debug:
-            print(f"[LowQuality {participant_id}] No labeled responses found")
-        return 0.0  # No labeled responses, assume perfect quality
+    if 'Tag' not in thought_labels_df.columns:
+        return pd.Series(dtype=float)  # No tag column, cannot evaluate
     
-    # Find tag columns
-    tag_cols = [col for col in thought_labels_df.columns if col.startswith('Tag ')]
+    # Flag each labeled response that carries at least one low-quality tag
+    is_low_quality_tag = thought_labels_df['Tag'].isin(list(low_quality_tags))
+    is_low_quality = is_low_quality_tag.groupby(
+        [thought_labels_df['Participant ID'], thought_labels_df['Question ID']], sort=False, observed=True).any()
+    low_quality_perc = is_low_quality.groupby(level='Participant ID', observed=True).mean()
     
     if debug:
-        print(f"[LowQuality {participant_id}] Found {len(tag_cols)} tag columns")
+        print(f"[LowQuality] Low quality responses: {int(is_low_quality.sum())}/{len(is_low_quality)} "
+              f"across {len(low_quality_perc)} participants")
     
-    if not tag_cols:
-        if debug:
-            print(f"[LowQuality {participant_id}] No tag columns found")
-        return 0.0  # No tag columns, cannot evaluate
-    
-    # Check for 'Uninformative answer' tag in any tag column
-    is_low_quality = participant_labels[tag_cols].apply(
-        lambda row: any('Uninformative answer' == val for val in row.values if pd.notna(val)), 
-        axis=1
-    )
-    
-    num_low_quality = is_low_quality.sum()
-    total_responses = len(participant_labels)
-    
-    if debug:
-        print(f"[LowQuality {participant_id}] Low quality responses: {num_low_quality}/{total_responses}")
-    
-    return num_low_quality / total_responses if total_responses > 0 else 0.0
+    return low_quality_perc
 
 
-def calculate_universal_disagreement_percentage(participant_id, verbatim_map_df, aggregate_std_df, major_segments, config, debug=False):
+def build_authored_agreement_table(verbatim_map_df, aggregate_std_df, major_segments, debug=False):
     """
-    Calculate the percentage of a participant's responses that received widespread disagreement
-    across major demographic segments.
+    Build a thought-level agreement table for every authored response.
+    
+    Each authored thought (from the verbatim map) is joined in one merge to the
+    standardized aggregate row for its (Question ID, Participant ID), carrying the
+    'All' agreement rate and the maximum agreement over major segments.
     
     Args:
-        participant_id: Unique ID of the participant
         verbatim_map_df: DataFrame mapping thoughts to participants
         aggregate_std_df: DataFrame with agreement scores
         major_segments: List of major segment names to evaluate
-        config: Dictionary with configuration values
         debug: Whether to print debug information
         
     Returns:
-        float: Ratio of universally disagreed responses to total responses (0-1)
+        DataFrame with columns Participant ID, Thought ID, Question ID, All_Agreement and
+        Max_Segment_Agreement (only thoughts with a known 'All' agreement rate)
     """
-    if debug:
-        print(f"[UniversalDisagreement {participant_id}] Calculating universal disagreement...")
+    columns = ['Participant ID', 'Thought ID', 'Question ID', 'All_Agreement', 'Max_Segment_Agreement']
+    if 'All_Agreement' not in aggregate_std_df.columns or 'Participant ID' not in aggregate_std_df.columns:
+        if debug:
+            print("[UniversalDisagreement] Aggregate data has no per-participant agreement rates")
+        return pd.DataFrame(columns=columns)
+    
+    # Unique authored thoughts per participant, each resolved to the question it was first mapped to
+    authored = verbatim_map_df[['Participant ID', 'Thought ID']].drop_duplicates()
+    thought_questions = verbatim_map_df.drop_duplicates('Thought ID')[['Thought ID', 'Question ID']]
+    authored = authored.merge(thought_questions, on='Thought ID', how='left')
+    
+    # One agreement row per (question, author); use major segments for the segment maximum
+    segment_agreement_cols = [f'{col}_Agreement' for col in major_segments
+                              if f'{col}_Agreement' in aggregate_std_df.columns]
+    agreement = aggregate_std_df.dropna(subset=['Participant ID']).drop_duplicates(['Question ID', 'Participant ID'])
+    agreement = agreement[['Question ID', 'Participant ID', 'All_Agreement'] + segment_agreement_cols]
+    if segment_agreement_cols:
+        agreement['Max_Segment_Agreement'] = agreement[segment_agreement_cols].max(axis=1)
+    else:
+        agreement['Max_Segment_Agreement'] = np.nan
+    agreement = agreement.drop(columns=segment_agreement_cols)
     
-    # Get thoughts authored by this participant
-    authored_thought_ids = verbatim_map_df[verbatim_map_df['Participant ID'] == participant_id]['Thought ID'].unique()
+    authored_aggr_df = authored.merge(agreement, on=['Question ID', 'Participant ID'], how='inner')
+    authored_aggr_df = authored_aggr_df[authored_aggr_df['All_Agreement'].notna()]
     
     if debug:
-        print(f"[UniversalDisagreement {participant_id}] Found {len(authored_thought_ids)} authored thoughts")
-    
-    if len(authored_thought_ids) == 0:
-        return 0.0  # No authored thoughts, cannot evaluate
+        print(f"[UniversalDisagreement] Built agreement table for {len(authored_aggr_df)} of {len(authored)} authored thoughts "
+              f"using {len(segment_agreement_cols)} major segment columns")
     
-    # Get agreement rates for these thoughts from aggregate data
-    authored_thoughts_data = []
-    
-    
-    # Process each authored thought
-    for thought_id in authored_thought_ids:
-        # Get question ID for this thought
-        question_row = verbatim_map_df[verbatim_map_df['Thought ID'] == thought_id]
-        if question_row.empty:
-            continue
-            
-        question_id = question_row['Question ID'].iloc[0]
-        
-        # Find agreement data for the response from this Participant on this question in aggregate
-        # TODO: Don't we actually need the agreement data for this specific Thought for this Question? Not the agreement rates across all Thoughts on this Question?
-        # TODO: We can get the authoring Participant Id from aggregate_standardized, but not the Thought ID. So that's what we should be filtering on
-        question_data = aggregate_std_df[
-            (aggregate_std_df['Question ID'] == question_id) &
-            (aggregate_std_df['Participant ID'] == participant_id)
-        ]
-
-        if question_data.empty:
-            continue
+    return authored_aggr_df[columns].reset_index(drop=True)
 
-        # Use major segments for agreement calculation
-        segment_agreement_cols = [f'{col}_Agreement' for col in major_segments 
-                                if f'{col}_Agreement' in question_data.columns]
 
-        # Get the Maximum agreement rate found among any major segment for responses from this Participant on this question
-        if segment_agreement_cols:
-            segment_agreements = question_data[segment_agreement_cols]
-            max_segment_agreement_value = segment_agreements.max(axis=1).iloc[0] if not segment_agreements.empty else np.nan
-        else:
-            max_segment_agreement_value = np.nan
+def calculate_universal_disagreement_percentages(authored_aggr_df, config, debug=False):
+    """
+    Calculate, for all participants at once, the percentage of their responses that received
+    widespread disagreement across major demographic segments.
+    
+    Args:
+        authored_aggr_df: Thought-level agreement table from build_authored_agreement_table()
+        config: Dictionary with configuration values
+        debug: Whether to print debug information
         
-        if debug and len(authored_thought_ids) <= 5:  # Only show debug for first few participants to avoid spam
-            print(f"[UniversalDisagreement {participant_id}] max_segment_agreement_value: {max_segment_agreement_value} for thought {thought_id}")
-
-            
-        # For now, we'll use the 'All_Agreement' as a proxy for simplicity
-        # In a complete implementation, we would check agreement across segments (started implementation, TODO: use only 'major' segments rather than all Segments)
-        agreement_value = question_data['All_Agreement'].iloc[0] if 'All_Agreement' in question_data.columns else None
-        
-        if agreement_value is not None and not pd.isna(agreement_value):
-            authored_thoughts_data.append({
-                'Thought ID': thought_id,
-                'Question ID': question_id,
-                'All_Agreement': agreement_value,
-                'Max_Segment_Agreement': max_segment_agreement_value,
-            })
-    
-    if not authored_thoughts_data:
+    Returns:
+        pd.Series: Ratio of universally disagreed responses to total evaluated responses (0-1),
+                   indexed by Participant ID. Participants without evaluated responses are absent.
+    """
+    if authored_aggr_df.empty:
         if debug:
-            print(f"[UniversalDisagreement {participant_id}] No agreement data found for authored thoughts")
-        return 0.0
-        
-    # Create DataFrame with thought agreement data
-    authored_aggr_df = pd.DataFrame(authored_thoughts_data)
+            print("[UniversalDisagreement] No agreement data found for authored thoughts")
+        return pd.Series(dtype=float)
     
-    # Check how many thoughts from this prticipant have universal disagreement (below threshold)
     threshold_all = config['UNIVERSAL_DISAGREEMENT_THRESHOLD_ALL']
     threshold_segments = config['UNIVERSAL_DISAGREEMENT_THRESHOLD_SEGMENTS']
     # consider the Participant's Thought (Response) 'Universally disagreed' if EITHER agreement across 'ALL' participants is below some threshold,
     # OR if no single segment has an agreement rate above some threshold
-    is_universally_disagreed = (authored_aggr_df['All_Agreement'] < threshold_all) | (authored_aggr_df['Max_Segment_Agreement'] < threshold_segments)
-    num_universally_disagreed = is_universally_disagreed.sum()
-    total_evaluated = len(authored_aggr_df)
+    is_universally_disagreed = (
+        (authored_aggr_df['All_Agreement'] < threshold_all) |
+        (authored_aggr_df['Max_Segment_Agreement'] < threshold_segments)
+    )
+    universal_disagreement_perc = is_universally_disagreed.groupby(authored_aggr_df['Participant ID'], observed=True).mean()
     
     if debug:
-        print(f"[UniversalDisagreement {participant_id}] Universally disagreed: {num_universally_disagreed}/{total_evaluated}")
+        print(f"[UniversalDisagreement] Universally disagreed: {int(is_universally_disagreed.sum())}/{len(is_universally_disagreed)} "
+              f"across {len(universal_disagreement_perc)} participants")
     
-    return num_universally_disagreed / total_evaluated if total_evaluated > 0 else 0.0
+    return universal_disagreement_perc
 
 
 def precompute_consensus_data(binary_df, verbatim_map_df, aggregate_std_df, config, debug=False):
@@ -561,7 +621,9 @@ def precompute_consensus_data(binary_df, verbatim_map_df, aggregate_std_df, conf
         debug: Whether to print debug information
         
     Returns:
-        dict: Dictionary with sets of strong agreement and disagreement thought IDs
+        dict: Dictionary with 'thought_consensus', a Series indexed by Thought ID holding the
+              consensus vote for strong-consensus thoughts (1.0 = strong agreement,
+              0.0 = strong disagreement)
     """
     start_time = time.time()
     print("Pre-computing consensus data for ASC calculation...")
@@ -569,150 +631,101 @@ def precompute_consensus_data(binary_df, verbatim_map_df, aggregate_std_df, conf
     high_threshold = config['ASC_HIGH_THRESHOLD']
     low_threshold = config['ASC_LOW_THRESHOLD']
     
-    # Create a mapping of Question ID to Agreement Score
-    question_agreement_map = {}
-    
-    # Process each question in aggregate data
-    agreement_count = 0
-    for _, row in aggregate_std_df.iterrows():
-        if 'Question ID' in row and 'All_Agreement' in row and pd.notna(row['All_Agreement']):
-            question_id = row['Question ID']
-            agreement = row['All_Agreement']
-            agreement_count += 1
-            
-            # For each question, store the agreement score
-            # If we have multiple rows for the same question, use the highest agreement
-            if question_id in question_agreement_map:
-                question_agreement_map[question_id] = max(question_agreement_map[question_id], agreement)
-            else:
-                question_agreement_map[question_id] = agreement
+    # Map each question to its agreement score.
+    # If we have multiple rows for the same question, use the highest agreement
+    if 'Question ID' in aggregate_std_df.columns and 'All_Agreement' in aggregate_std_df.columns:
+        valid_agreement = aggregate_std_df.dropna(subset=['All_Agreement'])
+        question_agreement = valid_agreement.groupby('Question ID', observed=True)['All_Agreement'].max()
+    else:
+        valid_agreement = aggregate_std_df.iloc[0:0]
+        question_agreement = pd.Series(dtype=float)
     
     if debug:
-        print(f"Found {agreement_count} rows with valid agreement data")
-        print(f"Mapped agreement scores for {len(question_agreement_map)} unique questions")
+        print(f"Found {len(valid_agreement)} rows with valid agreement data")
+        print(f"Mapped agreement scores for {len(question_agreement)} unique questions")
         
         # Show distribution of agreement scores
-        if question_agreement_map:
-            scores = list(question_agreement_map.values())
+        if not question_agreement.empty:
             print(f"Agreement score distribution:")
-            print(f"  Min: {min(scores):.3f}")
-            print(f"  Max: {max(scores):.3f}")
-            print(f"  Mean: {sum(scores)/len(scores):.3f}")
-            print(f"  Scores ≥ {high_threshold}: {sum(1 for s in scores if s >= high_threshold)}")
-            print(f"  Scores ≤ {low_threshold}: {sum(1 for s in scores if s <= low_threshold)}")
-    
-    # Create sets for strong consensus thoughts
-    strong_agree_thoughts = set()
-    strong_disagree_thoughts = set()
+            print(f"  Min: {question_agreement.min():.3f}")
+            print(f"  Max: {question_agreement.max():.3f}")
+            print(f"  Mean: {question_agreement.mean():.3f}")
+            print(f"  Scores ≥ {high_threshold}: {(question_agreement >= high_threshold).sum()}")
+            print(f"  Scores ≤ {low_threshold}: {(question_agreement <= low_threshold).sum()}")
     
-    # Create a mapping of thought ID to question ID for quick lookups
-    thought_to_question = dict(zip(verbatim_map_df['Thought ID'], verbatim_map_df['Question ID']))
+    # Map each thought to its question (last mapping wins), then to the question's agreement score
+    thought_to_question = verbatim_map_df.drop_duplicates('Thought ID', keep='last').set_index('Thought ID')['Question ID']
+    thought_agreement = thought_to_question.map(question_agreement).astype(float)
     
     if debug:
         print(f"Verbatim map contains {len(thought_to_question)} thought-to-question mappings")
-    
-    # Process each thought and assign it to the appropriate consensus category
-    mapped_thoughts = 0
-    for thought_id, question_id in thought_to_question.items():
-        if question_id in question_agreement_map:
-            mapped_thoughts += 1
-            agreement = question_agreement_map[question_id]
-            
-            if agreement >= high_threshold:
-                strong_agree_thoughts.add(thought_id)
-            elif agreement <= low_threshold:
-                strong_disagree_thoughts.add(thought_id)
-    
-    if debug and mapped_thoughts < len(thought_to_question):
-        print(f"Warning: Only {mapped_thoughts}/{len(thought_to_question)} thoughts could be mapped to agreement scores")
+        mapped_thoughts = thought_agreement.notna().sum()
+        if mapped_thoughts < len(thought_to_question):
+            print(f"Warning: Only {mapped_thoughts}/{len(thought_to_question)} thoughts could be mapped to agreement scores")
+    
+    # Label each thought with its consensus vote; thoughts without strong consensus are dropped
+    thought_consensus = pd.Series(
+        np.select(
+            [thought_agreement >= high_threshold, thought_agreement <= low_threshold],
+            [1.0, 0.0],
+            default=np.nan
+        ),
+        index=thought_agreement.index,
+        name='Consensus_Vote'
+    ).dropna()
     
     # Create a reusable dictionary of consensus data
     consensus_data = {
-        'strong_agree_thoughts': strong_agree_thoughts,
-        'strong_disagree_thoughts': strong_disagree_thoughts
+        'thought_consensus': thought_consensus
     }
     
-    print(f"Identified {len(strong_agree_thoughts)} thoughts with strong agreement (≥{high_threshold})")
-    print(f"Identified {len(strong_disagree_thoughts)} thoughts with strong disagreement (≤{low_threshold})")
-    print(f"Total consensus thoughts: {len(strong_agree_thoughts) + len(strong_disagree_thoughts)}")
+    num_strong_agree = int((thought_consensus == 1.0).sum())
+    num_strong_disagree = int((thought_consensus == 0.0).sum())
+    print(f"Identified {num_strong_agree} thoughts with strong agreement (≥{high_threshold})")
+    print(f"Identified {num_strong_disagree} thoughts with strong disagreement (≤{low_threshold})")
+    print(f"Total consensus thoughts: {len(thought_consensus)}")
     print(f"Consensus data computation completed in {time.time() - start_time:.2f} seconds")
     
     return consensus_data
 
 
-def calculate_asc_score(participant_id, binary_df, consensus_data, debug=False):
+def calculate_asc_scores(binary_df, consensus_data, debug=False):
     """
-    Calculate the Anti-Social Consensus (ASC) score - the rate at which the participant votes
-    against strong consensus items.
+    Calculate the Anti-Social Consensus (ASC) score for all participants at once - the rate
+    at which each participant votes against strong consensus items.
+    
+    Every vote is labeled with the consensus vote of its thought (via a mapped Series);
+    a vote is "against" when it differs from that label. One groupby mean gives the score.
     
     Args:
-        participant_id: Unique ID of the participant
         binary_df: DataFrame with binary votes
         consensus_data: Pre-computed consensus data dictionary
         debug: Whether to print debug information
         
     Returns:
-        float: Ratio of votes against consensus to total votes on consensus items (0-1)
+        pd.Series: Ratio of votes against consensus to total votes on consensus items (0-1),
+                   indexed by Participant ID. Participants without valid consensus votes are absent.
     """
-    if debug:
-        print(f"[ASC {participant_id}] Calculating Anti-Social Consensus score...")
+    thought_consensus = consensus_data['thought_consensus']
     
-    # Extract pre-computed consensus data
-    strong_agree_thoughts = consensus_data['strong_agree_thoughts']
-    strong_disagree_thoughts = consensus_data['strong_disagree_thoughts']
-    
-    # Create a set of all consensus thoughts for faster lookups
-    all_consensus_thoughts = strong_agree_thoughts.union(strong_disagree_thoughts)
-    
-    if not all_consensus_thoughts:
+    if thought_consensus.empty or 'VoteNumeric' not in binary_df.columns:
         if debug:
-            print(f"[ASC {participant_id}] No consensus thoughts found for analysis")
-        return np.nan  # Cannot evaluate ASC without consensus thoughts
-    
-    # Get participant's votes on consensus thoughts
-    participant_binary_df = binary_df[binary_df['Participant ID'] == participant_id]
+            print("[ASC] No consensus thoughts found for analysis")
+        return pd.Series(dtype=float)  # Cannot evaluate ASC without consensus thoughts
     
-    # Only keep votes on consensus thoughts
-    consensus_votes = participant_binary_df[participant_binary_df['Thought ID'].isin(all_consensus_thoughts)]
-    
-    if consensus_votes.empty:
-        if debug:
-            print(f"[ASC {participant_id}] Participant did not vote on any consensus thoughts")
-        return np.nan  # Cannot evaluate if no votes on consensus thoughts
+    # Skip votes that are not on consensus thoughts or not clearly agree (1) / disagree (0)
+    consensus_vote = binary_df['Thought ID'].map(thought_consensus).astype(float)
+    evaluated = consensus_vote.notna() & binary_df['VoteNumeric'].notna()
     
-    # Count votes AGAINST consensus
-    against_consensus_count = 0
-    total_consensus_votes = 0
-    
-    # Process each vote
-    for _, vote_row in consensus_votes.iterrows():
-        thought_id = vote_row['Thought ID']
-        vote_value = vote_row['VoteNumeric']
-        
-        # Skip if vote is not clearly agree (1) or disagree (0)
-        if pd.isna(vote_value):
-            continue
-            
-        total_consensus_votes += 1
-            
-        # Check if vote is against consensus
-        if thought_id in strong_agree_thoughts and vote_value == 0:  # Disagreed with high consensus
-            against_consensus_count += 1
-        elif thought_id in strong_disagree_thoughts and vote_value == 1:  # Agreed with low consensus
-            against_consensus_count += 1
-    
-    if total_consensus_votes == 0:
-        if debug:
-            print(f"[ASC {participant_id}] No valid consensus votes found")
-        return np.nan
-    
-    asc_score = against_consensus_count / total_consensus_votes
+    # Disagreed with high consensus, or agreed with low consensus
+    against_consensus = binary_df.loc[evaluated, 'VoteNumeric'] != consensus_vote[evaluated]
+    asc_scores = against_consensus.groupby(binary_df.loc[evaluated, 'Participant ID'], observed=True).mean()
     
     if debug:
-        print(f"[ASC {participant_id}] Against consensus votes: {against_consensus_count}/{total_consensus_votes}")
-        print(f"[ASC {participant_id}] ASC score: {asc_score}")
+        print(f"[ASC] Against consensus votes: {int(against_consensus.sum())}/{len(against_consensus)} "
+              f"across {len(asc_scores)} participants")
     
-    return asc_score
+    return asc_scores
 
 
 # --- LLM Judge Functions ---
@@ -1020,7 +1033,7 @@ async def call_llm_judge(session, model, participant_responses, config, contextu
                 try:
                     # First, try direct parsing
                     parsed = json.loads(content)
-                    judge_response = LLMJudgeResponse(**parsed)
+                    judge_response = llm_judge_models().LLMJudgeResponse(**parsed)
                     return (model, judge_response.confidence_score, judge_response.reasoning)
                 except (json.JSONDecodeError, ValueError) as parse_error:
                     # Try to extract JSON from within the response
@@ -1031,7 +1044,7 @@ async def call_llm_judge(session, model, participant_responses, config, contextu
                         if json_match:
                             json_str = json_match.group()
                             parsed = json.loads(json_str)
-                            judge_response = LLMJudgeResponse(**parsed)
+                            judge_response = llm_judge_models().LLMJudgeResponse(**parsed)
                             if debug:
                                 print(f"[LLMJudge] Recovered JSON for {model} using regex")
                             return (model, judge_response.confidence_score, judge_response.reasoning)
@@ -1182,12 +1195,13 @@ async def calculate_llm_judge_score(participant_id, verbatim_map_df, evaluatable
         return 0.5, {}  # Neutral score if no responses
     
     # Create participant responses object
-    participant_responses = ParticipantResponses(
+    judge_models = llm_judge_models()
+    participant_responses = judge_models.ParticipantResponses(
         participant_id=participant_id,
         responses=responses
     )
     
-    config = LLMJudgeConfig()
+    config = judge_models.LLMJudgeConfig()
     
     # Make async calls to all models
     async with aiohttp.ClientSession() as session:
@@ -1262,7 +1276,8 @@ def calculate_all_pri_signals(data_tuple, config, participant_limit=None, debug=
     print(f"Processing {participant_limit} participants...")
     
     # Pre-compute consensus data once for all participants
-    consensus_data = precompute_consensus_data(binary_df, verbatim_map_df, aggregate_std_df, config, debug)
+    with trace_span("signal: consensus data", category="pri", rows=len(binary_df)):
+        consensus_data = precompute_consensus_data(binary_df, verbatim_map_df, aggregate_std_df, config, debug)
     
     # Load evaluatable questions and context for LLM judge if enabled
     evaluatable_questions = {}
@@ -1277,124 +1292,73 @@ def calculate_all_pri_signals(data_tuple, config, participant_limit=None, debug=
             print("Building contextual information for enhanced LLM prompts...")
             contextual_info = build_contextual_guide(full_guide_df, evaluatable_questions, debug)
     
-    # Pre-filter timestamp data for efficiency
-    binary_times_df = binary_df[['Participant ID', 'Timestamp']].copy()
-    preference_times_df = preference_df[['Participant ID', 'Timestamp']].copy()
+    # Low quality tag percentages for all participants in one vectorized pass
+    with trace_span("signal: low quality tags", category="pri", rows=len(thought_labels_df)):
+        low_quality_percs = calculate_low_quality_tag_percentages(thought_labels_df, config['LOW_QUALITY_TAGS'], debug)
     
-    # Process each participant
-    results = []
+    # Universal disagreement percentages from a single authored-response agreement table
+    with trace_span("signal: universal disagreement", category="pri", rows=len(verbatim_map_df)):
+        authored_aggr_df = build_authored_agreement_table(verbatim_map_df, aggregate_std_df, major_segments, debug)
+        universal_disagreement_percs = calculate_universal_disagreement_percentages(authored_aggr_df, config, debug)
     
-    # Use for progress reporting
-    progress_step = max(1, participant_limit // 10)
-    start_time = time.time()
+    # Duration and activity metrics for all participants in one sorted pass over the timestamps
+    with trace_span("signal: duration", category="pri", rows=len(binary_df) + len(preference_df)):
+        duration_index = build_duration_index(binary_df, preference_df, config['DURATION_IDLE_GAP_THRESHOLD'], debug)
     
-    for i, participant_id in enumerate(all_participant_ids):
-        if i % progress_step == 0 or i == participant_limit - 1:
-            elapsed = time.time() - start_time
-            avg_time = elapsed / (i + 1) if i > 0 else 0
-            est_remaining = avg_time * (participant_limit - i - 1)
-            print(f"Processing participant {i+1}/{participant_limit} ({i/participant_limit*100:.1f}%)... " +
-                  f"(Est. remaining: {est_remaining/60:.1f} minutes)")
-        
-        # Calculate metrics
-        try:
-            # 1. Duration
-            duration = calculate_duration(participant_id, binary_times_df, preference_times_df, debug)
-            
-            # 2. Low Quality Tags Percentage
-            low_quality_perc = calculate_low_quality_tag_percentage(participant_id, thought_labels_df, debug)
-            
-            # 3. Universal Disagreement Percentage
-            universal_disagreement_perc = calculate_universal_disagreement_percentage(
-                participant_id, verbatim_map_df, aggregate_std_df, major_segments, config, debug
-            )
-            
-            # 4. Anti-Social Consensus Score (raw - lower is better)
-            asc_raw = calculate_asc_score(participant_id, binary_df, consensus_data, debug)
-            
-            # 5. LLM Judge Score (if enabled)
-            llm_judge_score = np.nan
-            individual_scores = {}
-            if enable_llm_judge:
-                try:
-                    # Store participant for batch processing (will be handled below)
-                    llm_judge_score = np.nan
-                    individual_scores = {}
-                except Exception as llm_error:
-                    if debug:
-                        print(f"[LLMJudge {participant_id}] Error: {llm_error}")
-                    llm_judge_score = 0.5  # Neutral score on error
-                    individual_scores = {}
-            
-            # Add results
-            result_dict = {
-                'Participant ID': participant_id,
-                'Duration_seconds': duration.total_seconds() if pd.notna(duration) else np.nan,
-                'LowQualityTag_Perc': low_quality_perc,
-                'UniversalDisagreement_Perc': universal_disagreement_perc,
-                'ASC_Score_Raw': asc_raw,
-            }
-            
-            if enable_llm_judge:
-                result_dict['LLM_Judge_Score'] = llm_judge_score
-                # Add individual model scores
-                for model_name, score_data in individual_scores.items():
-                    if score_data and 'confidence_score' in score_data:
-                        # Clean model name for column
-                        clean_model_name = model_name.replace('/', '_').replace('-', '_')
-                        result_dict[f'LLM_{clean_model_name}'] = score_data['confidence_score']
-                
-            results.append(result_dict)
-        except Exception as e:
-            print(f"Error processing participant {participant_id}: {e}")
-            # Add empty results to maintain participant count
-            error_dict = {
-                'Participant ID': participant_id,
-                'Duration_seconds': np.nan,
-                'LowQualityTag_Perc': np.nan,
-                'UniversalDisagreement_Perc': np.nan,
-                'ASC_Score_Raw': np.nan,
-            }
-            
-            if enable_llm_judge:
-                error_dict['LLM_Judge_Score'] = np.nan
-                
-            results.append(error_dict)
+    # Anti-Social Consensus scores for all participants from one labeled vote table
+    with trace_span("signal: anti-social consensus", category="pri", rows=len(binary_df)):
+        asc_scores = calculate_asc_scores(binary_df, consensus_data, debug)
+    
+    # Assemble raw signals for all participants by aligning on Participant ID
+    results_df = pd.DataFrame({'Participant ID': all_participant_ids})
+    participant_ids = results_df['Participant ID']
+    
+    # 1. Duration (participants with fewer than 2 timestamps get 0)
+    results_df['Duration_seconds'] = participant_ids.map(duration_index['Duration_seconds']).astype(float).fillna(0.0)
+    results_df['ActiveDuration_seconds'] = participant_ids.map(duration_index['ActiveDuration_seconds']).astype(float).fillna(0.0)
+    results_df['VotesPerMinute'] = participant_ids.map(duration_index['VotesPerMinute']).astype(float)
+    
+    # 2. Low Quality Tags Percentage (no labeled responses, assume perfect quality)
+    results_df['LowQualityTag_Perc'] = participant_ids.map(low_quality_percs).astype(float).fillna(0.0)
     
-    # Batch process LLM judge scores for efficiency
+    # 3. Universal Disagreement Percentage (no authored thoughts, cannot evaluate)
+    results_df['UniversalDisagreement_Perc'] = participant_ids.map(universal_disagreement_percs).astype(float).fillna(0.0)
+    
+    # 4. Anti-Social Consensus Score (raw - lower is better; NaN without consensus votes)
+    results_df['ASC_Score_Raw'] = participant_ids.map(asc_scores).astype(float)
+    
+    # 5. Batch process LLM judge scores for efficiency
     if enable_llm_judge:
-        print(f"\nRunning batch LLM judge assessment for {len(results)} participants...")
+        print(f"\nRunning batch LLM judge assessment for {len(results_df)} participants...")
         print("This will significantly speed up the LLM assessment process!")
         
-        # Extract participant IDs from results
-        participant_ids_for_llm = [r['Participant ID'] for r in results]
-        
         # Run batch async LLM processing
-        llm_results = asyncio.run(
-            batch_process_llm_judge(
-                participant_ids_for_llm, verbatim_map_df, evaluatable_questions, 
-                contextual_info, debug
+        with trace_span("signal: LLM judge", category="llm", rows=len(participant_ids)):
+            llm_results = asyncio.run(
+                batch_process_llm_judge(
+                    participant_ids.tolist(), verbatim_map_df, evaluatable_questions, 
+                    contextual_info, debug
+                )
             )
-        )
         
-        # Update results with LLM scores
-        for i, result_dict in enumerate(results):
-            participant_id = result_dict['Participant ID']
+        # Collect LLM scores per participant
+        llm_rows = []
+        for participant_id in participant_ids:
+            row = {'LLM_Judge_Score': 0.5}  # Fallback score
             if participant_id in llm_results:
                 llm_score, individual_scores = llm_results[participant_id]
-                result_dict['LLM_Judge_Score'] = llm_score
+                row['LLM_Judge_Score'] = llm_score
                 
                 # Add individual model scores
                 for model_name, score_data in individual_scores.items():
                     if score_data and 'confidence_score' in score_data:
                         clean_model_name = model_name.replace('/', '_').replace('-', '_')
-                        result_dict[f'LLM_{clean_model_name}'] = score_data['confidence_score']
-            else:
-                result_dict['LLM_Judge_Score'] = 0.5  # Fallback score
+                        row[f'LLM_{clean_model_name}'] = score_data['confidence_score']
+            llm_rows.append(row)
         
+        results_df = pd.concat([results_df, pd.DataFrame(llm_rows, index=results_df.index)], axis=1)
         print("Batch LLM judge assessment completed!")
     
-    results_df = pd.DataFrame(results)
     print("Signal calculation complete.")
     return results_df
 
@@ -1606,6 +1570,13 @@ def create_pri_distribution_chart(pri_signals_df, gd_number, config, debug=False
     if debug:
         print(f"PRI visualization stats: {stats}")
     
+    # Skip drawing if the scores are unchanged since the chart was last saved
+    chart_path = f"{config['OUTPUT_DIR']}/GD{gd_number}_pri_distribution.png"
+    digest = chart_hash(valid_scores.to_numpy(), {'gd_number': gd_number, 'figsize': (12, 10), 'dpi': 300})
+    if not config.get('REDRAW_CHARTS') and chart_is_current(chart_path, digest):
+        print(f"PRI distribution chart unchanged, skipping redraw: {chart_path}")
+        return chart_path
+    
     # Create the figure and subplots
     fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 10), height_ratios=[3, 1])
     fig.suptitle(f'Participant Reliability Index (PRI) Distribution - Global Dialogue {gd_number}', 
@@ -1669,8 +1640,8 @@ def create_pri_distribution_chart(pri_signals_df, gd_number, config, debug=False
     plt.subplots_adjust(top=0.92, bottom=0.12)
     
     # Save the chart
-    chart_path = f"{config['OUTPUT_DIR']}/GD{gd_number}_pri_distribution.png"
     plt.savefig(chart_path, dpi=300, bbox_inches='tight', facecolor='white')
+    record_chart(chart_path, digest)
     
     if debug:
         print(f"PRI distribution chart saved to: {chart_path}")
@@ -1716,8 +1687,8 @@ def analyze_llm_correlation(pri_signals_df, debug=False):
     heuristic_scores = pri_signals_df.loc[valid_mask, 'PRI_Score_Heuristic']
     
     # Calculate correlations
-    pearson_corr, pearson_p = pearsonr(llm_scores, heuristic_scores)
-    spearman_corr, spearman_p = spearmanr(llm_scores, heuristic_scores)
+    pearson_corr, pearson_p = scipy_stats.pearsonr(llm_scores, heuristic_scores)
+    spearman_corr, spearman_p = scipy_stats.spearmanr(llm_scores, heuristic_scores)
     
     print(f"Correlation between LLM Judge and Heuristic-Only PRI:")
     print(f"  Pearson correlation:  {pearson_corr:.3f} (p={pearson_p:.3f})")
@@ -1743,7 +1714,7 @@ def analyze_llm_correlation(pri_signals_df, debug=False):
                 comp_llm = pri_signals_df.loc[comp_valid_mask, 'LLM_Judge_Score']
                 comp_values = pri_signals_df.loc[comp_valid_mask, component]
                 
-                comp_pearson, comp_p = pearsonr(comp_llm, comp_values)
+                comp_pearson, comp_p = scipy_stats.pearsonr(comp_llm, comp_values)
                 component_correlations[component] = comp_pearson
                 print(f"  {component}: {comp_pearson:.3f} (p={comp_p:.3f})")
     
@@ -2181,7 +2152,8 @@ async def batch_process_llm_judge(participant_ids, verbatim_map_df, evaluatable_
         ]
         
         # Wait for all tasks in this batch to complete
-        batch_results = await asyncio.gather(*tasks, return_exceptions=True)
+        with trace_span("LLM batch", category="llm", batch=batch_idx + 1, rows=len(batch_participants)):
+            batch_results = await asyncio.gather(*tasks, return_exceptions=True)
         
         # Store results
         for participant_id, result in zip(batch_participants, batch_results):
@@ -2238,7 +2210,7 @@ def extract_open_ended_responses(verbatim_map_df, discussion_guide_df, participa
     question_mapping = dict(zip(responses_df['Question ID'], responses_df['Question Text']))
     
     # Group by participant and question, concatenate multiple thoughts if any
-    grouped_responses = responses_df.groupby(['Participant ID', 'Question ID'])['Thought Text'].agg(
+    grouped_responses = responses_df.groupby(['Participant ID', 'Question ID'], observed=True)['Thought Text'].agg(
         lambda x: ' | '.join(x.astype(str)) if len(x) > 1 else x.iloc[0] if len(x) == 1 else ''
     ).reset_index()
     
@@ -2248,12 +2220,12 @@ def extract_open_ended_responses(verbatim_map_df, discussion_guide_df, participa
     # Rename columns to use question text instead of question ID
     pivoted_df.columns = [question_mapping.get(col, col) for col in pivoted_df.columns]
     
-    # Reset index to make Participant ID a regular column
-    pivoted_df = pivoted_df.reset_index()
-    
     # Fill NaN values with empty strings
     pivoted_df = pivoted_df.fillna('')
     
+    # Reset index to make Participant ID a regular column
+    pivoted_df = pivoted_df.reset_index()
+    
     if debug:
         print(f"Extracted responses for {len(pivoted_df)} participants across {len(pivoted_df.columns)-1} questions")
     
@@ -2410,6 +2382,8 @@ def main():
     debug = args.debug
     participant_limit = args.limit
     enable_llm_judge = getattr(args, 'llm_judge', False)
+    if args.trace or args.profile_memory:
+        start_trace(f"GD{gd_number}_pri", memory=args.profile_memory)
     
     print(f"Calculating PRI for Global Dialogue {gd_number}")
     print(f"Debug mode: {'Enabled' if debug else 'Disabled'}")
@@ -2419,6 +2393,8 @@ def main():
     
     # Check API key if LLM judge is enabled
     if enable_llm_judge:
+        from dotenv import load_dotenv
+        load_dotenv() # API key from .env
         api_key = os.getenv('OPENROUTER_API_KEY')
         if not api_key:
             print("Error: OPENROUTER_API_KEY not found in environment variables")
@@ -2432,18 +2408,28 @@ def main():
         print(f"Error in configuration: {e}")
         sys.exit(1)
     
+    if args.low_quality_tags:
+        config['LOW_QUALITY_TAGS'] = args.low_quality_tags
+        print(f"Low quality tags: {config['LOW_QUALITY_TAGS']}")
+    config['REDRAW_CHARTS'] = args.redraw_charts
+    
     # 1. Load and clean all necessary data
+    dataset = GDDataset(gd_number)
     try:
-        data_tuple = load_data(config, debug)
+        with trace_span("load data", category="load"):
+            data_tuple = load_data(config, debug, dataset)
     except Exception as e:
         print(f"Error loading data: {e}")
         sys.exit(1)
     
     # 2. Calculate raw PRI signals for all participants
-    pri_signals_df = calculate_all_pri_signals(data_tuple, config, participant_limit, debug, enable_llm_judge)
+    with trace_span("PRI signals", category="pri", rows=len(data_tuple[5])):
+        pri_signals_df = calculate_all_pri_signals(data_tuple, config, participant_limit, debug, enable_llm_judge)
+    memory_checkpoint("calculated signals")
     
     # 3. Normalize and calculate final PRI score
-    pri_signals_df = normalize_and_calculate_pri(pri_signals_df, config, debug)
+    with trace_span("normalize", category="pri", rows=len(pri_signals_df)):
+        pri_signals_df = normalize_and_calculate_pri(pri_signals_df, config, debug)
     
     # 3a. LLM Judge correlation analysis (if enabled)
     if enable_llm_judge:
@@ -2460,7 +2446,8 @@ def main():
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         correlation_report_path = f"{config['OUTPUT_DIR']}/GD{gd_number}_comprehensive_correlation_report_{timestamp}.txt"
         print(f"Creating comprehensive correlation report...")
-        comprehensive_results = create_comprehensive_correlation_report(pri_signals_df, correlation_report_path, debug)
+        with trace_span("correlation report", category="report"):
+            comprehensive_results = create_comprehensive_correlation_report(pri_signals_df, correlation_report_path, debug)
     except Exception as e:
         print(f"Warning: Could not create comprehensive correlation report: {e}")
         if debug:
@@ -2480,12 +2467,14 @@ def main():
     
     # 6. Save results to CSV
     output_path = config['OUTPUT_PATH']
-    pri_signals_df.to_csv(output_path, index=False)
+    with trace_span("save scores", category="export", rows=len(pri_signals_df)):
+        pri_signals_df.to_csv(output_path, index=False)
     print(f"\nResults saved to {output_path}")
     
     # 7. Generate PRI distribution visualization
     try:
-        chart_path = create_pri_distribution_chart(pri_signals_df, gd_number, config, debug)
+        with trace_span("distribution chart", category="charts"):
+            chart_path = create_pri_distribution_chart(pri_signals_df, gd_number, config, debug)
         if chart_path:
             print(f"PRI distribution chart saved to {chart_path}")
     except Exception as e:
@@ -2500,27 +2489,28 @@ def main():
         binary_df, preference_df, thought_labels_df, verbatim_map_df, aggregate_std_df, all_participant_ids, major_segments = data_tuple
         
         # Load discussion guide for question type identification
-        discussion_guide_df = pd.read_csv(config['DISCUSSION_GUIDE_PATH'], encoding='utf-8-sig')
-        
-        # Export using outliers method by default
-        unreliable_csv_path = f"{config['OUTPUT_DIR']}/GD{gd_number}_unreliable_participants_outliers.csv"
-        export_path = export_unreliable_participants_csv(
-            pri_signals_df, verbatim_map_df, discussion_guide_df, 
-            unreliable_csv_path, method='outliers', debug=debug
-        )
+        with trace_span("export unreliable participants", category="export"):
+            discussion_guide_df = dataset.discussion_guide
+        
+            # Export using outliers method by default
+            unreliable_csv_path = f"{config['OUTPUT_DIR']}/GD{gd_number}_unreliable_participants_outliers.csv"
+            export_path = export_unreliable_participants_csv(
+                pri_signals_df, verbatim_map_df, discussion_guide_df, 
+                unreliable_csv_path, method='outliers', debug=debug
+            )
         
-        if export_path:
-            print(f"Unreliable participants (outliers) CSV saved to {export_path}")
+            if export_path:
+                print(f"Unreliable participants (outliers) CSV saved to {export_path}")
         
-        # Also export using 10th percentile method
-        unreliable_csv_path_percentile = f"{config['OUTPUT_DIR']}/GD{gd_number}_unreliable_participants_bottom10pct.csv"
-        export_path_percentile = export_unreliable_participants_csv(
-            pri_signals_df, verbatim_map_df, discussion_guide_df, 
-            unreliable_csv_path_percentile, method='percentile', threshold=10, debug=debug
-        )
+            # Also export using 10th percentile method
+            unreliable_csv_path_percentile = f"{config['OUTPUT_DIR']}/GD{gd_number}_unreliable_participants_bottom10pct.csv"
+            export_path_percentile = export_unreliable_participants_csv(
+                pri_signals_df, verbatim_map_df, discussion_guide_df, 
+                unreliable_csv_path_percentile, method='percentile', threshold=10, debug=debug
+            )
         
-        if export_path_percentile:
-            print(f"Unreliable participants (bottom 10%) CSV saved to {export_path_percentile}")
+            if export_path_percentile:
+                print(f"Unreliable participants (bottom 10%) CSV saved to {export_path_percentile}")
             
     except Exception as e:
         print(f"Warning: Could not export unreliable participants CSV: {e}")
@@ -2532,6 +2522,8 @@ def main():
     end_time = time.time()
     elapsed_time = end_time - start_time
     print(f"\nExecution completed in {elapsed_time:.2f} seconds ({elapsed_time/60:.2f} minutes)")
+    if args.trace or args.profile_memory:
+        stop_trace(os.path.join(os.path.dirname(config['OUTPUT_DIR']), TRACE_DIRNAME))
 
 
 if __name__ == "__main__":
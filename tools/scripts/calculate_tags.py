@@ -1,245 +1,76 @@
-import pandas as pd
-import numpy as np
 import os
 import argparse
 import logging
 import re
 from pathlib import Path
+from lib.dataset import GDDataset
+from lib.analysis_utils import build_dimension_tables, encode_dimension_columns, get_dimensions_dir, trace_span, memory_checkpoint, lazy_import
+
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# --- Constants ---
-TAG_COL_PATTERN = re.compile(r'^Tag \d+$')
-
-# --- Helper Functions ---
-
-def safe_read_csv(path, **kwargs):
-    """Reads a CSV, attempting to detect and skip initial metadata rows using heuristics."""
-    try:
-        # Try reading normally first
-        return pd.read_csv(path, **kwargs)
-    except (pd.errors.ParserError, UnicodeDecodeError) as e:
-        logging.warning(f"{type(e).__name__} reading {path}: {e}. Attempting to find header...")
-
-        header_row = -1
-        min_commas_for_header = 5 # Heuristic: header row should have at least this many fields
-        # Define essential columns that MUST be in the header
-        essential_markers = {
-            'participants': ['Participant Id', 'Sample Provider Id'], # Be more specific
-            'labels': ['Question ID', 'Participant ID', 'ResponseText'],
-            'categories': ['Question ID', 'Category'],
-            'guide': ['Item type (dropdown)', 'Content', 'Duration in minutes (dropdown)'], # Use expected names
-            'aggregate': ['Question ID', 'Question Type', 'Question'], # Standardized aggregate
-        }
-        markers = []
-        filename = Path(path).name
-        for key, value in essential_markers.items():
-            # Use startswith for better matching (e.g., GD3_participants.csv)
-            if filename.startswith(key) or key in filename:
-                 markers = value
-                 break
-        if not markers:
-            markers = ['Question ID'] # Generic fallback
-
-        encodings_to_try = [kwargs.get('encoding', 'utf-8-sig'), 'utf-8', 'latin1', 'iso-8859-1']
-        detected_encoding = None
-
-        for enc in encodings_to_try:
-            try:
-                with open(path, 'r', encoding=enc) as f:
-                    for i, line in enumerate(f):
-                        # Check 1: Does it have enough commas?
-                        if line.count(',') >= min_commas_for_header:
-                            # Check 2: Does it contain all essential markers?
-                            if all(marker in line for marker in markers):
-                                header_row = i
-                                detected_encoding = enc
-                                logging.info(f"Detected potential header on line {header_row+1} in {path} using encoding '{detected_encoding}' and markers: {markers}")
-                                break # Found potential header
-                if header_row != -1:
-                    break # Stop trying encodings if header found
-            except UnicodeDecodeError:
-                logging.warning(f"Encoding {enc} failed for {path}, trying next...")
-                continue
-            except Exception as file_read_error:
-                 logging.error(f"Unexpected error reading {path} with encoding {enc}: {file_read_error}")
-                 break
-
-        if header_row != -1 and detected_encoding:
-            try:
-                kwargs['encoding'] = detected_encoding
-                # --- Read with detected header and VALIDATE columns ---
-
-                # Add on_bad_lines specifically for discussion guide if needed
-                read_kwargs = kwargs.copy()
-                # Use startswith for better matching (e.g., GD3_participants.csv)
-                is_participants_file = filename.startswith('participants') or 'participants' in filename
-                is_guide_file = filename.startswith('guide') or 'guide' in filename # Check again for validation context
-                is_agg_std_file = filename.startswith('aggregate_standardized') or 'aggregate_standardized' in filename # Standardized Aggregate
-
-                if is_guide_file:
-                    read_kwargs['on_bad_lines'] = 'warn'
-                    logging.info("Applying 'on_bad_lines=warn' for discussion guide file.")
-
-                df_temp = pd.read_csv(path, header=header_row, **read_kwargs)
-
-                # --- Standardized Column Cleaning ---
-                # Clean column names (remove BOM/extra spaces if any) *immediately* after loading
-                df_temp.columns = df_temp.columns.str.replace('^\\ufeff', '', regex=True).str.strip()
-                logging.info(f"Cleaned columns after loading {filename}: {df_temp.columns.tolist()[:10]}...") # Log cleaned columns
-
-
-                # --- Validate Columns ---
-                validation_passed = False
-                required_cols = markers # Use the detected markers for validation
-
-                # Add specific validation rules if needed
-                if is_participants_file:
-                    # Just check if the required markers are present by name now
-                    if all(marker in df_temp.columns for marker in required_cols):
-                         logging.info(f"Participants file validation passed based on column names: {required_cols}")
-                         validation_passed = True
-                    else:
-                         missing = [marker for marker in required_cols if marker not in df_temp.columns]
-                         logging.error(f"Participants file loaded but missing expected columns: {missing}. Found: {df_temp.columns.tolist()[:20]}")
-                elif is_guide_file:
-                    # Check if required guide markers are present
-                    if all(marker in df_temp.columns for marker in required_cols):
-                         logging.info(f"Discussion guide file validation passed based on column names: {required_cols}")
-                         validation_passed = True
-                    else:
-                         missing = [marker for marker in required_cols if marker not in df_temp.columns]
-                         logging.error(f"Guide file loaded but missing expected columns: {missing}. Found: {df_temp.columns.tolist()[:10]}")
-                elif is_agg_std_file: # Validation for standardized aggregate
-                     required_cols = ['Question ID', 'Participant ID', 'Question'] # Specific check
-                     if all(marker in df_temp.columns for marker in required_cols):
-                          logging.info(f"Aggregate standardized file validation passed based on column names: {required_cols}")
-                          validation_passed = True
-                     else:
-                          missing = [marker for marker in required_cols if marker not in df_temp.columns]
-                          logging.error(f"Aggregate standardized file loaded but missing expected columns: {missing}. Found: {df_temp.columns.tolist()[:10]}")
-                else: # Validation for other files (labels, categories)
-                    if all(marker in df_temp.columns for marker in required_cols):
-                        logging.info(f"Header validated for other file ({filename}). Columns look reasonable: {df_temp.columns[:5].tolist()}...")
-                        validation_passed = True
-                    else:
-                        missing = [marker for marker in required_cols if marker not in df_temp.columns]
-                        logging.error(f"Header validation failed for other file ({filename})! Detected header on line {header_row+1} but loaded columns ({df_temp.columns.tolist()}) don't contain all markers {missing}.")
-
-                # Return df if validation passed
-                if validation_passed:
-                    return df_temp
-                else:
-                     # Raise the original error if validation failed
-                     raise e
-
-            except Exception as read_error:
-                 logging.error(f"Error reading {path} even after detecting header at line {header_row+1}: {read_error}")
-                 raise read_error
-        else:
-            logging.error(f"Could not reliably detect header row in {path} using markers {markers} and comma count heuristic.")
-            raise e # Re-raise the original error
-
-    except Exception as general_error:
-         logging.error(f"Unexpected error reading {path}: {general_error}")
-         raise general_error
-
-
 # --- Core Logic Functions ---
 
-def load_and_prep_data(gd_number, data_dir):
-    """Loads and preprocesses all necessary input files."""
+def load_and_prep_data(gd_number, data_dir, output_base_dir=Path("./analysis_output"), dataset=None):
+    """
+    Loads and preprocesses all necessary input files.
+
+    ``dataset`` is the GDDataset to take the tables from (a new one for ``data_dir`` if None);
+    its cached tables are not modified.
+    """
     logging.info("Loading and preparing data...")
-    paths = {
-        'labels': data_dir / f"GD{gd_number}" / "tags" / f"all_thought_labels.csv",
-        'categories': data_dir / f"GD{gd_number}" / "tags" / f"all_tag_categories.csv",
-        'participants': data_dir / f"GD{gd_number}" / f"GD{gd_number}_participants.csv",
-        'aggregate': data_dir / f"GD{gd_number}" / f"GD{gd_number}_aggregate_standardized.csv",
-        'discussion_guide': data_dir / f"GD{gd_number}" / f"GD{gd_number}_discussion_guide.csv", # Needed to identify segment columns
-    }
-
-    # Check if files exist
-    for name, path in paths.items():
-        if not path.exists():
-            logging.error(f"Required input file not found: {path}")
+    if dataset is None:
+        dataset = GDDataset(gd_number, data_dir=data_dir)
+    # The discussion guide is needed to identify segment columns
+    for name in ('thought_labels', 'participants', 'aggregate', 'discussion_guide'):
+        if not dataset.exists(name):
+            logging.error(f"Required input file not found: {dataset.path(name)}")
             return None # Indicate failure
 
     try:
-        # 1. Load Thought Labels and Melt
-        logging.info(f"Loading {paths['labels']}...")
-        labels_df = safe_read_csv(paths['labels'], encoding='utf-8-sig')
-        logging.info(f"  Loaded {len(labels_df)} rows.")
-        # Clean column names (remove BOM/extra spaces if any)
-        labels_df.columns = labels_df.columns.str.replace('^\ufeff', '', regex=True).str.strip()
-        # Identify tag columns
-        tag_cols = [col for col in labels_df.columns if TAG_COL_PATTERN.match(col)]
-        id_vars = [col for col in labels_df.columns if col not in tag_cols]
-        if not tag_cols:
-            logging.error("No columns matching 'Tag \\d+' found in all_thought_labels.csv")
-            return None
-
-        logging.info(f"Melting tag columns: {tag_cols}")
-        melted_labels = pd.melt(labels_df,
-                                id_vars=id_vars,
-                                value_vars=tag_cols,
-                                var_name='Tag Source',
-                                value_name='Tag')
-        # Drop rows where Tag is NaN/None/empty and clean Tag text
-        melted_labels.dropna(subset=['Tag'], inplace=True)
-        melted_labels['Tag'] = melted_labels['Tag'].astype(str).str.strip()
-        melted_labels = melted_labels[melted_labels['Tag'] != '']
-        logging.info(f"  Melted to {len(melted_labels)} tag instances.")
-        # Ensure correct types
-        melted_labels['Participant ID'] = melted_labels['Participant ID'].astype(str)
-        melted_labels['Question ID'] = melted_labels['Question ID'].astype(str)
-
-
-        # 2. Load Tag Categories
-        logging.info(f"Loading {paths['categories']}...")
-        categories_df = safe_read_csv(paths['categories'], encoding='utf-8-sig')
-        logging.info(f"  Loaded {len(categories_df)} rows.")
-        categories_df.columns = categories_df.columns.str.replace('^\ufeff', '', regex=True).str.strip()
-        # Identify tag columns in categories file to melt *its* tags for joining
-        cat_tag_cols = [col for col in categories_df.columns if TAG_COL_PATTERN.match(col)]
-        cat_id_vars = ['Question ID', 'Category'] # Assume these are the key identifiers
-        if not all(c in categories_df.columns for c in cat_id_vars):
-             logging.error(f"Missing required columns ('Question ID', 'Category') in {paths['categories']}")
-             return None
-        if not cat_tag_cols:
-            logging.error(f"No columns matching 'Tag \\d+' found in {paths['categories']}")
+        # 1. Load long-format tags (one row per applied tag) and the tag dictionary
+        try:
+            thought_tags_df, tag_dictionary_df = dataset.thought_tags, dataset.tag_dictionary
+        except FileNotFoundError as e:
+            logging.error(f"Could not load tag data: {e}")
             return None
-
-        logging.info("Melting category tag columns...")
-        melted_categories = pd.melt(categories_df,
-                                    id_vars=cat_id_vars,
-                                    value_vars=cat_tag_cols,
-                                    value_name='Tag')
-        melted_categories.dropna(subset=['Tag'], inplace=True)
-        melted_categories['Tag'] = melted_categories['Tag'].astype(str).str.strip()
-        melted_categories = melted_categories[melted_categories['Tag'] != '']
-        # Keep only necessary columns and drop duplicates just in case
-        category_map = melted_categories[['Question ID', 'Tag', 'Category']].drop_duplicates()
-        logging.info(f"  Created category map with {len(category_map)} unique QID-Tag-Category entries.")
-        category_map['Question ID'] = category_map['Question ID'].astype(str)
-
-        # Merge Category onto Melted Labels
-        logging.info("Merging categories onto labels...")
-        analysis_df = pd.merge(melted_labels, category_map, on=['Question ID', 'Tag'], how='left')
+        logging.info(f"  Loaded {len(thought_tags_df)} tag instances and {len(tag_dictionary_df)} dictionary entries.")
+
+        # Store participant/question IDs as integer codes; every later merge is a left join
+        # onto the tag instances, so their IDs are the only ones that need a code
+        dimensions = build_dimension_tables(get_dimensions_dir(gd_number, output_base_dir), [thought_tags_df])
+        encode_dimension_columns(thought_tags_df, dimensions)
+        participant_code_columns = {'Participant Id': 'participants', 'Question ID': 'questions'}
+
+        # 2. Attach tag text and category from the dictionary, and sentiment from the labels file.
+        #    Text columns are categoricals so the report groupbys work on integer codes.
+        tag_text_df = tag_dictionary_df[['tag_id', 'Tag', 'Category']].astype({'Tag': 'category', 'Category': 'category'})
+        analysis_df = thought_tags_df.merge(tag_text_df, on='tag_id', how='left')
+        analysis_df.drop(columns='tag_id', inplace=True)
         missing_cats = analysis_df['Category'].isnull().sum()
         if missing_cats > 0:
             logging.warning(f"{missing_cats} tag instances could not be mapped to a category. Check consistency between labels and categories files.")
-            analysis_df['Category'].fillna('Uncategorized', inplace=True)
-            logging.info(f"  Merge complete. Current rows: {len(analysis_df)}")
+            if 'Uncategorized' not in analysis_df['Category'].cat.categories:
+                analysis_df['Category'] = analysis_df['Category'].cat.add_categories(['Uncategorized'])
+            analysis_df['Category'] = analysis_df['Category'].fillna('Uncategorized')
+
+        logging.info(f"Loading sentiment from {dataset.path('thought_labels')}...")
+        sentiment_df = dataset.table('thought_labels', columns=['Question ID', 'Participant ID', 'Sentiment'])
+        encode_dimension_columns(sentiment_df, dimensions)
+        sentiment_df['Sentiment'] = sentiment_df['Sentiment'].astype('category')
+        analysis_df = pd.merge(analysis_df, sentiment_df, on=['Question ID', 'Participant ID'], how='left')
+        logging.info(f"  Merge complete. Current rows: {len(analysis_df)}")
+        memory_checkpoint("tags: merged tag text and sentiment")
 
         # 3. Load Participants Data for Segments
-        logging.info(f"Loading {paths['participants']}...")
-        # --- Load participants.csv (assuming header is now on line 1) ---
-        participants_file_path = paths['participants']
+        participants_file_path = dataset.path('participants')
+        logging.info(f"Loading {participants_file_path}...")
+        # --- Load participants.csv (assuming header is now on line 1; column names come cleaned) ---
         try:
-            # Now read with default header=0
-            participants_df = pd.read_csv(participants_file_path, encoding='utf-8-sig', low_memory=False)
-            participants_df.columns = participants_df.columns.str.replace('^\\ufeff', '', regex=True).str.strip()
+            participants_df = dataset.participants
 
             # Basic validation for expected columns
             participant_id_col = 'Participant Id'
@@ -264,13 +95,11 @@ def load_and_prep_data(gd_number, data_dir):
         logging.info(f"  Loaded {len(participants_df)} rows.")
 
         # Identify Segment Columns - Use Discussion Guide
-        logging.info(f"Loading {paths['discussion_guide']} to identify segment questions...")
-        # --- Load discussion_guide.csv (assuming header is now on line 1) ---
-        guide_file_path = paths['discussion_guide']
+        guide_file_path = dataset.path('discussion_guide')
+        logging.info(f"Loading {guide_file_path} to identify segment questions...")
+        # --- Load discussion_guide.csv (assuming header is now on line 1; bad lines are skipped with a warning) ---
         try:
-            # Now read with default header=0 and handle potential bad lines
-            guide_df = pd.read_csv(guide_file_path, encoding='utf-8-sig', on_bad_lines='warn')
-            guide_df.columns = guide_df.columns.str.replace('^\\ufeff', '', regex=True).str.strip()
+            guide_df = dataset.discussion_guide
             logging.info(f"Discussion guide loaded (cleaned). Columns: {guide_df.columns.tolist()[:10]}...")
 
             # --- Basic validation for guide cols ---
@@ -338,14 +167,14 @@ def load_and_prep_data(gd_number, data_dir):
         logging.info("Merging participant segments onto analysis data...")
         # Rename participant ID column for merge
         analysis_df.rename(columns={'Participant ID': 'Participant Id'}, inplace=True)
+        encode_dimension_columns(participants_segments, dimensions, columns=participant_code_columns)
         analysis_df = pd.merge(analysis_df, participants_segments, on='Participant Id', how='left')
         logging.info(f"  Merge complete. Current rows: {len(analysis_df)}")
+        memory_checkpoint("tags: merged participant segments")
 
 
         # 4. Load Standardized Aggregate for Agreement Scores & Question Text
-        logging.info(f"Loading {paths['aggregate']}...")
-        agg_df = pd.read_csv(paths['aggregate'], encoding='utf-8', low_memory=False) # Assume preprocess_aggregate handles BOM
-        logging.info(f"  Loaded {len(agg_df)} rows.")
+        agg_df = dataset.aggregate
         # Keep only relevant columns: QID, PID (author), Question Text, Agreement (All)
         # Find the 'All' agreement column (might have varying N)
         # Adjusted pattern to primarily find 'All', but allow 'All (N)' as fallback
@@ -388,6 +217,8 @@ def load_and_prep_data(gd_number, data_dir):
         agg_subset.rename(columns={'Question': 'Question Text',
                                    'Participant ID': 'Participant Id', # Match name for merge
                                    all_agreement_col: 'Agreement Score'}, inplace=True)
+        encode_dimension_columns(agg_subset, dimensions, columns=participant_code_columns)
+        agg_subset['Question Text'] = agg_subset['Question Text'].astype('category')
 
         # Parse agreement score
         # Use the helper function defined in analyze_dialogues.py or replicate it here
@@ -413,6 +244,7 @@ def load_and_prep_data(gd_number, data_dir):
              # (e.g., maybe only Ask Opinion?) - check assumptions if this occurs.
              logging.warning(f"{missing_agg} tag instances could not be mapped to an agreement score.")
         logging.info(f"  Merge complete. Final rows for analysis: {len(analysis_df)}")
+        memory_checkpoint("tags: merged agreement scores")
 
         # Keep only necessary final columns before analysis
         final_cols = ['Question ID', 'Question Text', 'Category', 'Tag', 'Participant Id', 'Sentiment'] + segment_cols_to_keep + ['Agreement Score']
@@ -436,6 +268,42 @@ def load_and_prep_data(gd_number, data_dir):
         return None
 
 
+# Grouping keys for one row of the tag report
+REPORT_GROUP_COLS = ['Question ID', 'Question Text', 'Category', 'Tag']
+
+
+def calculate_base_metrics(df):
+    """
+    Calculates per-tag response counts, agreement and sentiment metrics.
+
+    Sentiment proportions are computed as means of precomputed indicator columns
+    (NaN where sentiment is missing, so the denominator is the number of responses
+    with a sentiment), letting every metric use a native groupby reduction in a
+    single agg call instead of Python lambdas.
+    """
+    has_sentiment = df['Sentiment'].notna()
+    metrics_input = df[REPORT_GROUP_COLS + ['Participant Id', 'Agreement Score']].assign(
+        **{
+            'Is Positive': (df['Sentiment'] == 'Positive').astype(float).where(has_sentiment),
+            'Is Negative': (df['Sentiment'] == 'Negative').astype(float).where(has_sentiment),
+        }
+    )
+
+    grouped = metrics_input.groupby(REPORT_GROUP_COLS, observed=True, dropna=False)
+    metrics_df = grouped.agg(**{
+        'N Responses': ('Participant Id', 'nunique'), # Count unique participants for N Responses
+        'Avg Agreement (All)': ('Agreement Score', 'mean'),
+        'Median Agreement (All)': ('Agreement Score', 'median'),
+        'Proportion Positive Sentiment': ('Is Positive', 'mean'),
+        'Proportion Negative Sentiment': ('Is Negative', 'mean'),
+    })
+
+    # Tags without any sentiment values get a proportion of 0
+    sentiment_cols = ['Proportion Positive Sentiment', 'Proportion Negative Sentiment']
+    metrics_df[sentiment_cols] = metrics_df[sentiment_cols].fillna(0)
+    return metrics_df
+
+
 def calculate_unified_report(df, segment_columns, output_path):
     """Calculates aggregated metrics and segment frequencies into a single wide report."""
     logging.info("Calculating unified tag analysis report...")
@@ -443,88 +311,61 @@ def calculate_unified_report(df, segment_columns, output_path):
         logging.warning("Input DataFrame is empty, cannot generate report.")
         return
 
-    # Define aggregation functions for metrics
-    agg_funcs = {
-        'Participant Id': lambda x: x.nunique(), # Count unique participants for N Responses
-        'Agreement Score': ['mean', 'median'],
-        'Sentiment': [
-            lambda x: (x == 'Positive').sum() / x.count() if x.count() > 0 else 0,
-            lambda x: (x == 'Negative').sum() / x.count() if x.count() > 0 else 0
-        ]
-    }
-
     # Group by QID, Text, Category, Tag to get base metrics
     logging.info("Calculating base metrics (agreement, sentiment)...")
-    grouped = df.groupby(['Question ID', 'Question Text', 'Category', 'Tag'], observed=True, dropna=False)
-    metrics_df = grouped.agg(agg_funcs)
-
-    # Flatten MultiIndex columns and rename
-    metrics_df.columns = ['_'.join(col).strip() for col in metrics_df.columns.values]
-    metrics_df.rename(columns={
-        'Participant Id_<lambda>': 'N Responses',
-        'Agreement Score_mean': 'Avg Agreement (All)',
-        'Agreement Score_median': 'Median Agreement (All)',
-        'Sentiment_<lambda_0>': 'Proportion Positive Sentiment',
-        'Sentiment_<lambda_1>': 'Proportion Negative Sentiment'
-    }, inplace=True)
+    metrics_df = calculate_base_metrics(df)
     logging.info(f"Calculated base metrics for {len(metrics_df)} QID-Tag combinations.")
 
     # --- Calculate Segment Frequencies ---
     logging.info("Calculating segment frequencies...")
-    all_frequency_dfs = [metrics_df] # Start with metrics
 
     # Calculate total frequency ('All (Frequency)') - same as 'N Responses'
     metrics_df['All (Frequency)'] = metrics_df['N Responses']
 
-    # Calculate frequency for each segment column
+    # Calculate frequencies for all segment columns in one pass: melt the segment
+    # columns to (Segment, Segment Value) rows, count unique participants per
+    # QID/Tag/segment value, then unstack to one "Segment: Value (Frequency)" column each
+    segment_freq_df = None
     if segment_columns:
-        for seg_col in segment_columns:
-            logging.info(f"  Calculating frequencies for segment: {seg_col}")
-            # Group by QID, Tag AND the segment value column
-            # Use observed=True to handle categorical data efficiently if present
-            freq_grouped = df.groupby(['Question ID', 'Tag', seg_col], observed=True, dropna=False)
-            # Count unique Participant Ids within each group
-            segment_freq = freq_grouped['Participant Id'].nunique().reset_index()
-            segment_freq.rename(columns={'Participant Id': 'Frequency'}, inplace=True)
-
-            # Pivot to wide format: QID, Tag as index, Segment Values as columns
-            try:
-                # Construct new column names like "Segment Name: Value (Frequency)"
-                # Need to handle potential non-string segment values if any exist
-                segment_freq['Segment Header'] = segment_freq[seg_col].apply(
-                    lambda x: f"{seg_col}: {str(x)} (Frequency)"
-                )
-                pivot_df = segment_freq.pivot_table(index=['Question ID', 'Tag'],
-                                                   columns='Segment Header',
-                                                   values='Frequency',
-                                                   fill_value=0) # Fill missing segment values with 0 count
-                all_frequency_dfs.append(pivot_df)
-                logging.info(f"    Pivoted frequencies for {seg_col}.")
-            except Exception as e:
-                 logging.error(f"    Error pivoting frequencies for segment '{seg_col}': {e}. Skipping this segment.", exc_info=True)
+        logging.info(f"  Calculating frequencies for {len(segment_columns)} segments: {segment_columns}")
+        melted_segments = df[['Question ID', 'Tag', 'Participant Id'] + segment_columns].melt(
+            id_vars=['Question ID', 'Tag', 'Participant Id'],
+            value_vars=segment_columns,
+            var_name='Segment',
+            value_name='Segment Value')
+        segment_freq = melted_segments.groupby(['Question ID', 'Tag', 'Segment', 'Segment Value'],
+                                               observed=True, dropna=False)['Participant Id'].nunique()
+
+        # Construct column names like "Segment Name: Value (Frequency)" from the (small) grouped index
+        segment_freq = segment_freq.reset_index(name='Frequency')
+        segment_freq['Segment Header'] = (segment_freq['Segment'] + ': ' +
+                                          segment_freq['Segment Value'].astype(str) + ' (Frequency)')
+        segment_freq_df = segment_freq.set_index(['Question ID', 'Tag', 'Segment Header'])['Frequency'].unstack(fill_value=0)
+        logging.info(f"    Computed {segment_freq_df.shape[1]} segment frequency columns.")
     else:
         logging.warning("No segment columns identified; skipping segment frequency calculation.")
 
 
     # --- Merge Metrics and Frequencies ---
-    logging.info("Merging all metrics and frequencies...")
+    logging.info("Merging metrics and frequencies...")
     try:
-        # Start with metrics_df (which includes 'All (Frequency)')
+        # Start with metrics_df (which includes 'All (Frequency)') and join all segment frequencies at once
         final_report_df = metrics_df
-        # Sequentially merge pivoted frequency tables
-        for freq_df in all_frequency_dfs[1:]: # Skip the first element (metrics_df itself)
-             # Ensure indices match before merging
-            final_report_df = final_report_df.merge(freq_df, left_index=True, right_index=True, how='left')
+        if segment_freq_df is not None:
+            final_report_df = final_report_df.merge(segment_freq_df, left_index=True, right_index=True, how='left')
 
         # Fill NaN values in frequency columns with 0 (if any slipped through)
         freq_cols = [col for col in final_report_df.columns if '(Frequency)' in col]
         final_report_df[freq_cols] = final_report_df[freq_cols].fillna(0).astype(int)
 
-        # Reset index to bring QID, Tag etc. back as columns
+        # Reset index to bring QID, Tag etc. back as columns, ordered by their text
+        # (categorical columns would otherwise sort in code order)
         final_report_df.reset_index(inplace=True)
+        final_report_df[REPORT_GROUP_COLS] = final_report_df[REPORT_GROUP_COLS].astype(object)
+        final_report_df.sort_values(REPORT_GROUP_COLS, kind='stable', ignore_index=True, inplace=True)
 
         # Reorder columns for clarity
-        id_cols = ['Question ID', 'Question Text', 'Category', 'Tag']
+        id_cols = REPORT_GROUP_COLS
         metric_cols = ['N Responses', 'Avg Agreement (All)', 'Median Agreement (All)',
                        'Proportion Positive Sentiment', 'Proportion Negative Sentiment']
         # Dynamically get all frequency columns, sort them alphabetically
@@ -547,29 +388,50 @@ def calculate_unified_report(df, segment_columns, output_path):
         logging.error(f"Error merging/saving the final report: {e}", exc_info=True)
 
 
-def main(args):
-    """Main execution flow."""
-    data_dir = Path("./Data") # Assumes script is run from workspace root
-    output_base_dir = Path("./analysis_output")
-    output_dir = output_base_dir / f"GD{args.gd_number}" / "tags"
+def run_tag_analysis(gd_number, data_dir=Path("./Data"), output_base_dir=Path("./analysis_output"), dataset=None):
+    """
+    Runs the tag analysis for a GD and writes tag_analysis_report.csv.
+
+    Args:
+        gd_number (int): Global Dialogue cadence number.
+        data_dir (Path): Base data directory (containing GD<N>/).
+        output_base_dir (Path): Base output directory (containing GD<N>/).
+        dataset (GDDataset, optional): Dataset to take the input tables from (shared with other analyses).
+
+    Returns:
+        Path: Path of the report, or None if data loading failed.
+    """
+    output_dir = output_base_dir / f"GD{gd_number}" / "tags"
     output_dir.mkdir(parents=True, exist_ok=True) # Ensure output directory exists
 
-    logging.info(f"Starting tag analysis for GD{args.gd_number}")
+    logging.info(f"Starting tag analysis for GD{gd_number}")
     logging.info(f"Data Directory: {data_dir.resolve()}")
     logging.info(f"Output Directory: {output_dir.resolve()}")
 
     # 1. Load and Prepare Data
-    prepared_data, segment_columns = load_and_prep_data(args.gd_number, data_dir)
+    with trace_span("tags: load and prep", category="tags") as span:
+        prepared = load_and_prep_data(gd_number, data_dir, output_base_dir, dataset=dataset)
+        if prepared is not None:
+            span['rows'] = len(prepared[0])
 
-    if prepared_data is None:
+    if prepared is None:
         logging.error("Data loading failed. Exiting.")
-        return
+        return None
+    prepared_data, segment_columns = prepared
 
     # 2. Calculate Unified Report
     report_path = output_dir / "tag_analysis_report.csv"
-    calculate_unified_report(prepared_data, segment_columns, report_path)
+    with trace_span("tags: unified report", category="tags", rows=len(prepared_data)):
+        calculate_unified_report(prepared_data, segment_columns, report_path)
 
-    logging.info(f"Tag analysis for GD{args.gd_number} completed.")
+    logging.info(f"Tag analysis for GD{gd_number} completed.")
+    return report_path
+
+
+def main(args):
+    """Main execution flow."""
+    # Paths are relative to the workspace root
+    run_tag_analysis(args.gd_number, Path("./Data"), Path("./analysis_output"))
 
 
 if __name__ == "__main__":
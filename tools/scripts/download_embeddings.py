@@ -14,6 +14,10 @@ from urllib.parse import urlparse
 import re
 import hashlib
 import time
+import shutil
+from lib.analysis_utils import lazy_import
+
+np = lazy_import('numpy') # Only needed to convert downloaded embeddings
 
 # File URLs - Update these when hosting changes
 # Format: GD number -> (file_size_bytes, direct_download_url, gdrive_url)
@@ -40,6 +44,10 @@ def get_embedding_path(gd_number):
     """Generate file path for a specific GD embedding file."""
     return os.path.join("Data", f"GD{gd_number}", f"GD{gd_number}_embeddings.json")
 
+def get_embedding_matrix_path(gd_number):
+    """Generate file path for the .npy matrix extracted from a GD embedding file."""
+    return os.path.join("Data", f"GD{gd_number}", f"GD{gd_number}_embeddings.npy")
+
 # Progress bar for downloads
 def show_progress(block_num, block_size, total_size):
     """Display download progress."""
@@ -149,13 +157,14 @@ def try_download_with_curl(url, output_path):
         print(f"Error trying curl download: {e}")
         return False
 
-def download_embedding(gd_number, force=False):
+def download_embedding(gd_number, force=False, export_matrix=False):
     """
     Download embeddings file for the specified Global Dialogue number.
     
     Args:
         gd_number (int): Global Dialogue number (1, 2, or 3)
         force (bool): Force download even if file exists
+        export_matrix (bool): Also write the embedding matrix as .npy while validating
         
     Returns:
         bool: True if download successful, False otherwise
@@ -166,6 +175,7 @@ def download_embedding(gd_number, force=False):
     
     file_size, direct_url, gdrive_url = EMBEDDING_FILES[gd_number]
     file_path = get_embedding_path(gd_number)
+    matrix_path = get_embedding_matrix_path(gd_number) if export_matrix else None
     
     # Check if directory exists
     directory = os.path.dirname(file_path)
@@ -205,7 +215,7 @@ def download_embedding(gd_number, force=False):
         print("Download with curl successful!")
         if validate_file(file_path, file_size):
             print(f"Size validation successful!")
-            is_json = validate_embeddings_json(file_path)
+            is_json = validate_embeddings_json(file_path, matrix_path=matrix_path)
             if is_json:
                 print("JSON validation successful!")
                 return True
@@ -270,7 +280,7 @@ def download_embedding(gd_number, force=False):
         if validate_file(file_path, file_size):
             print(f"Size validation successful!")
             # Check if it's a valid JSON
-            is_json = validate_embeddings_json(file_path)
+            is_json = validate_embeddings_json(file_path, matrix_path=matrix_path)
             if is_json:
                 print("JSON validation successful!")
                 return True
@@ -329,7 +339,7 @@ def download_embedding(gd_number, force=False):
             if validate_file(file_path, file_size):
                 print(f"Size validation successful!")
                 # Check if it's a valid JSON
-                is_json = validate_embeddings_json(file_path)
+                is_json = validate_embeddings_json(file_path, matrix_path=matrix_path)
                 if is_json:
                     print("JSON validation successful!")
                     return True
@@ -361,54 +371,337 @@ def download_embedding(gd_number, force=False):
     
     return False
 
-def validate_embeddings_json(file_path, verbose=False):
+# Tokens the streaming scanner needs to recognise outside of embedding vectors
+JSON_STRING_RE = re.compile(r'"(?:[^"\\]|\\.)*"', re.DOTALL)
+JSON_SCALAR_RE = re.compile(r'-?(?:\d+\.?\d*(?:[eE][+-]?\d+)?|Infinity)|true|false|null|NaN')
+# Characters that can continue a number token (a match followed only by these up to the
+# end of the buffer may be cut by the chunk boundary, e.g. '1.5' + 'e10')
+JSON_NUMBER_TAIL_RE = re.compile(r'[0-9eE+\-.]*')
+JSON_WHITESPACE = ' \t\r\n'
+STREAM_CHUNK_SIZE = 1024 * 1024  # 1MB of text per read
+
+
+class EmbeddingsJSONError(ValueError):
+    """Raised when the embeddings file is not structurally valid JSON."""
+
+
+class _NpyRowWriter:
+    """
+    Writes float32 rows to a .npy file without holding the matrix in memory.
+
+    Rows are appended to a temporary file; the .npy header (which needs the final
+    row count) is written on close and the rows are copied in after it.
+    """
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.tmp_path = f"{output_path}.rows.tmp"
+        self.tmp_file = open(self.tmp_path, 'wb')
+        self.dim = None
+        self.rows = 0
+
+    def write(self, vector):
+        if self.dim is None:
+            self.dim = len(vector)
+        if len(vector) != self.dim:
+            # Keep row alignment with the source records even when a vector is unusable
+            vector = np.full(self.dim, np.nan)
+        self.tmp_file.write(np.asarray(vector, dtype='<f4').tobytes())
+        self.rows += 1
+
+    def close(self):
+        self.tmp_file.close()
+        header = {'descr': '<f4', 'fortran_order': False, 'shape': (self.rows, self.dim or 0)}
+        with open(self.output_path, 'wb') as out_file, open(self.tmp_path, 'rb') as rows_file:
+            np.lib.format.write_array_header_1_0(out_file, header)
+            shutil.copyfileobj(rows_file, out_file)
+        os.remove(self.tmp_path)
+
+    def abort(self):
+        self.tmp_file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def scan_embeddings_json(file_path, matrix_path=None, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Stream through an embeddings JSON file once, in constant memory.
+
+    The file must be a JSON list. Every numeric array found beneath an 'embedding'
+    key (either a single vector per record or a column of vectors) is checked for
+    dimension and finiteness without materialising the document.
+
+    Args:
+        file_path (str): Path to the embeddings JSON file
+        matrix_path (str): Optional .npy path; if given, every vector is written as a
+            float32 row in file order (rows with a mismatched dimension are NaN-filled)
+        chunk_size (int): Number of characters to read per chunk
+
+    Returns:
+        dict: Scan statistics (items, vectors, dimension, dimension_mismatches,
+              non_finite_vectors, zero_vectors, min_norm, max_norm, bytes)
+
+    Raises:
+        EmbeddingsJSONError: If the file is not well-formed or not a JSON list
+    """
+    stats = {
+        'items': 0,
+        'vectors': 0,
+        'dimension': None,
+        'dimension_mismatches': 0,
+        'non_finite_vectors': 0,
+        'zero_vectors': 0,
+        'min_norm': None,
+        'max_norm': None,
+        'bytes': os.path.getsize(file_path),
+    }
+    writer = _NpyRowWriter(matrix_path) if matrix_path else None
+
+    def record_vector(vector):
+        if stats['dimension'] is None:
+            stats['dimension'] = len(vector)
+        elif len(vector) != stats['dimension']:
+            stats['dimension_mismatches'] += 1
+        stats['vectors'] += 1
+
+        if not np.all(np.isfinite(vector)):
+            stats['non_finite_vectors'] += 1
+        else:
+            norm = float(np.linalg.norm(vector))
+            if norm == 0:
+                stats['zero_vectors'] += 1
+            stats['min_norm'] = norm if stats['min_norm'] is None else min(stats['min_norm'], norm)
+            stats['max_norm'] = norm if stats['max_norm'] is None else max(stats['max_norm'], norm)
+
+        if writer is not None:
+            writer.write(vector)
+
+    # Each stack entry is [container_type, under_embedding_key, pending_key]
+    stack = []
+    expect = 'value'  # value | key | colon | separator
+    just_opened = False  # True right after '[' or '{', where a closer is allowed
+    done = False
+    buf = ''
+    pos = 0
+    eof = False
+
+    def begin_value():
+        """Account for a value about to be consumed at the current nesting level."""
+        if len(stack) == 1:
+            stats['items'] += 1
+        if stack and stack[-1][0] == 'object':
+            stack[-1][2] = None
+
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            def fill():
+                """Append the next chunk to the unconsumed tail of the buffer."""
+                nonlocal buf, pos, eof
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    eof = True
+                    return False
+                buf = buf[pos:] + chunk
+                pos = 0
+                return True
+
+            fill()
+            while True:
+                # Skip whitespace
+                while pos < len(buf) and buf[pos] in JSON_WHITESPACE:
+                    pos += 1
+                if pos >= len(buf):
+                    if not fill():
+                        break
+                    continue
+
+                char = buf[pos]
+
+                if done:
+                    raise EmbeddingsJSONError(f"Unexpected data after end of top-level list: {buf[pos:pos + 20]!r}")
+
+                if not stack and char != '[':
+                    raise EmbeddingsJSONError("File does not contain a JSON list.")
+
+                if expect == 'separator':
+                    container = stack[-1]
+                    closer = ']' if container[0] == 'array' else '}'
+                    if char == ',':
+                        expect = 'value' if container[0] == 'array' else 'key'
+                        pos += 1
+                    elif char == closer:
+                        stack.pop()
+                        pos += 1
+                        expect = 'separator'
+                        if not stack:
+                            done = True
+                    else:
+                        raise EmbeddingsJSONError(f"Expected ',' or '{closer}' but found {char!r}")
+                    continue
+
+                if expect == 'colon':
+                    if char != ':':
+                        raise EmbeddingsJSONError(f"Expected ':' but found {char!r}")
+                    pos += 1
+                    expect = 'value'
+                    continue
+
+                if expect == 'key':
+                    if char == '}' and just_opened:
+                        stack.pop()
+                        pos += 1
+                        expect = 'separator'
+                        just_opened = False
+                        if not stack:
+                            done = True
+                        continue
+                    if char != '"':
+                        raise EmbeddingsJSONError(f"Expected object key but found {char!r}")
+                    match = JSON_STRING_RE.match(buf, pos)
+                    if match is None:
+                        if not fill():
+                            raise EmbeddingsJSONError("Unterminated string at end of file.")
+                        continue
+                    stack[-1][2] = json.loads(match.group(0))
+                    pos = match.end()
+                    expect = 'colon'
+                    just_opened = False
+                    continue
+
+                # expect == 'value'
+                parent = stack[-1] if stack else None
+                under_embedding = parent is not None and (parent[1] or parent[2] == 'embedding')
+
+                if char == '[' and under_embedding:
+                    # Fast path: a flat numeric vector is parsed in one go
+                    end = buf.find(']', pos + 1)
+                    while end == -1:
+                        if not fill():
+                            raise EmbeddingsJSONError("Unterminated embedding array at end of file.")
+                        end = buf.find(']', pos + 1)
+                    body = buf[pos + 1:end]
+                    if '[' not in body and '{' not in body and '"' not in body:
+                        body = body.strip()
+                        try:
+                            vector = np.array(body.split(','), dtype=np.float64) if body else np.empty(0)
+                        except ValueError:
+                            raise EmbeddingsJSONError(f"Non-numeric value in embedding vector near: {body[:40]!r}")
+                        begin_value()
+                        record_vector(vector)
+                        pos = end + 1
+                        expect = 'separator'
+                        just_opened = False
+                        continue
+
+                if char == '[':
+                    begin_value()
+                    stack.append(['array', under_embedding, None])
+                    pos += 1
+                    expect = 'value'
+                    just_opened = True
+                    continue
+                elif char == '{':
+                    begin_value()
+                    stack.append(['object', under_embedding, None])
+                    pos += 1
+                    expect = 'key'
+                    just_opened = True
+                    continue
+                elif char == ']' and just_opened:
+                    stack.pop()
+                    pos += 1
+                    expect = 'separator'
+                    just_opened = False
+                    if not stack:
+                        done = True
+                else:
+                    regex = JSON_STRING_RE if char == '"' else JSON_SCALAR_RE
+                    match = regex.match(buf, pos)
+                    # A token that reaches the end of the buffer, possibly followed by a partial
+                    # exponent or fraction the regex left out, may continue in the next chunk
+                    if match is None or (not eof and JSON_NUMBER_TAIL_RE.match(buf, match.end()).end() == len(buf)):
+                        if fill():
+                            continue
+                        if match is None:
+                            raise EmbeddingsJSONError(f"Invalid JSON value starting with {buf[pos:pos + 20]!r}")
+                    begin_value()
+                    pos = match.end()
+                    expect = 'separator'
+                    just_opened = False
+
+        if not done:
+            raise EmbeddingsJSONError("Unexpected end of file (truncated download?).")
+
+        if writer is not None:
+            writer.close()
+            writer = None
+    finally:
+        if writer is not None:
+            writer.abort()
+
+    return stats
+
+
+def validate_embeddings_json(file_path, verbose=False, matrix_path=None, expected_dim=None):
     """
     Validate that the downloaded JSON file has the expected format.
+
+    Streams the file once (see scan_embeddings_json) so peak memory stays flat
+    regardless of file size. Optionally writes the embedding matrix to a .npy file
+    in the same pass.
+
     Returns True if valid, False otherwise.
     """
     print(f"Validating JSON format of {file_path}...")
+    start_time = time.time()
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
-        if not isinstance(data, list):
-            print("Error: File does not contain a JSON list.")
-            return False
-        
-        if len(data) == 0:
-            print("Error: JSON list is empty.")
-            return False
-        
-        if verbose:
-            print(f"JSON contains {len(data)} items")
-            
-            # Check first item for expected structure
-            first_item = data[0]
-            if not isinstance(first_item, dict):
-                print("Error: First item is not a dictionary.")
-                return False
-                
-            if 'embedding' not in first_item:
-                print("Error: No 'embedding' field found in first item.")
-                return False
-                
-            if not isinstance(first_item['embedding'], list):
-                print("Error: 'embedding' is not a list.")
-                return False
-                
-            embedding_dim = len(first_item['embedding'])
-            print(f"Embedding dimension: {embedding_dim}")
-        
-        print(f"JSON validation successful!")
-        return True
-    
-    except json.JSONDecodeError:
-        print("Error: The file is not valid JSON.")
+        stats = scan_embeddings_json(file_path, matrix_path=matrix_path)
+    except EmbeddingsJSONError as e:
+        print(f"Error: The file is not valid JSON. {e}")
+        return False
+    except UnicodeDecodeError:
+        print("Error: The file is not valid UTF-8 text.")
         return False
     except Exception as e:
         print(f"Error validating file: {e}")
         return False
 
+    if stats['items'] == 0:
+        print("Error: JSON list is empty.")
+        return False
+
+    if stats['vectors'] == 0:
+        print("Error: No 'embedding' vectors found in file.")
+        return False
+
+    if stats['dimension_mismatches']:
+        print(f"Error: {stats['dimension_mismatches']} embeddings do not match dimension {stats['dimension']}.")
+        return False
+
+    if expected_dim is not None and stats['dimension'] != expected_dim:
+        print(f"Error: Embedding dimension {stats['dimension']} does not match expected {expected_dim}.")
+        return False
+
+    if stats['non_finite_vectors']:
+        print(f"Warning: {stats['non_finite_vectors']} embeddings contain NaN or Inf values.")
+    if stats['zero_vectors']:
+        print(f"Warning: {stats['zero_vectors']} embeddings are all zeros.")
+
+    if verbose:
+        elapsed = time.time() - start_time
+        print(f"JSON contains {stats['items']} items")
+        print(f"Embedding vectors: {stats['vectors']}")
+        print(f"Embedding dimension: {stats['dimension']}")
+        if stats['min_norm'] is not None:
+            print(f"Vector norm range: {stats['min_norm']:.4f} - {stats['max_norm']:.4f}")
+        print(f"Scanned {stats['bytes'] / 1024 / 1024:.1f} MB in {elapsed:.1f} seconds")
+
+    if matrix_path:
+        print(f"Embedding matrix saved to {matrix_path}")
+
+    print(f"JSON validation successful!")
+    return True
+
 def list_available_embeddings():
     """List available embedding files and their status."""
     print("\nAvailable Embedding Files:")
@@ -456,6 +749,9 @@ Examples:
   
   # List available embedding files and their status
   python download_embeddings.py --list
+  
+  # Validate downloaded files and extract a .npy embedding matrix
+  python download_embeddings.py --validate --export-matrix
 """
     )
     
@@ -469,6 +765,8 @@ Examples:
                       help='List available embedding files and their status')
     parser.add_argument('--validate', action='store_true',
                       help='Validate JSON format of already downloaded files')
+    parser.add_argument('--export-matrix', action='store_true',
+                      help='While validating, also write embeddings to Data/GD<N>/GD<N>_embeddings.npy')
     
     args = parser.parse_args()
     
@@ -493,13 +791,14 @@ Examples:
         for gd_num in EMBEDDING_FILES.keys():
             file_path = get_embedding_path(gd_num)
             if os.path.exists(file_path):
-                validate_embeddings_json(file_path, verbose=True)
+                matrix_path = get_embedding_matrix_path(gd_num) if args.export_matrix else None
+                validate_embeddings_json(file_path, verbose=True, matrix_path=matrix_path)
         return
     
     # Download each requested embedding file
     for gd_num in gd_numbers:
         print(f"\nProcessing GD{gd_num} embeddings...")
-        success = download_embedding(gd_num, force=args.force)
+        success = download_embedding(gd_num, force=args.force, export_matrix=args.export_matrix)
         
         if success and args.validate:
             validate_embeddings_json(get_embedding_path(gd_num))
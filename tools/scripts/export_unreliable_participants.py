@@ -19,12 +19,15 @@ Output:
     CSV file with unreliable participant IDs, PRI scores, and all open-ended responses
 """
 
-import pandas as pd
-import numpy as np
 import argparse
 import sys
 import os
 from pathlib import Path
+from lib.dataset import GDDataset
+from lib.analysis_utils import build_dimension_tables, encode_dimension_columns, get_dimensions_dir, lazy_import
+
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
 
 
 def parse_args():
@@ -45,6 +48,7 @@ def get_config(gd_number):
     base_dir = Path(__file__).parent.parent.parent
     data_dir = base_dir / "Data" / f"GD{gd_number}"
     output_dir = base_dir / "analysis_output" / f"GD{gd_number}" / "pri"
+    dimensions_dir = get_dimensions_dir(gd_number, base_dir / "analysis_output")
     
     # Verify directories exist
     if not data_dir.exists():
@@ -58,6 +62,7 @@ def get_config(gd_number):
         'PRI_SCORES_PATH': str(output_dir / f"GD{gd_number}_pri_scores.csv"),
         'VERBATIM_MAP_PATH': str(data_dir / f"GD{gd_number}_verbatim_map.csv"),
         'DISCUSSION_GUIDE_PATH': str(data_dir / f"GD{gd_number}_discussion_guide.csv"),
+        'DIMENSIONS_DIR': str(dimensions_dir),
     }
     
     # Verify required files exist
@@ -148,7 +153,7 @@ def extract_open_ended_responses(verbatim_map_df, discussion_guide_df, participa
     question_mapping = dict(zip(responses_df['Question ID'], responses_df['Question Text']))
     
     # Group by participant and question, concatenate multiple thoughts if any
-    grouped_responses = responses_df.groupby(['Participant ID', 'Question ID'])['Thought Text'].agg(
+    grouped_responses = responses_df.groupby(['Participant ID', 'Question ID'], observed=True)['Thought Text'].agg(
         lambda x: ' | '.join(x.astype(str)) if len(x) > 1 else x.iloc[0] if len(x) == 1 else ''
     ).reset_index()
     
@@ -158,12 +163,12 @@ def extract_open_ended_responses(verbatim_map_df, discussion_guide_df, participa
     # Rename columns to use question text instead of question ID
     pivoted_df.columns = [question_mapping.get(col, col) for col in pivoted_df.columns]
     
-    # Reset index to make Participant ID a regular column
-    pivoted_df = pivoted_df.reset_index()
-    
     # Fill NaN values with empty strings
     pivoted_df = pivoted_df.fillna('')
     
+    # Reset index to make Participant ID a regular column
+    pivoted_df = pivoted_df.reset_index()
+    
     if debug:
         print(f"Extracted responses for {len(pivoted_df)} participants across {len(pivoted_df.columns)-1} questions")
     
@@ -273,6 +278,8 @@ def main():
         print(f"Error in configuration: {e}")
         sys.exit(1)
     
+    dataset = GDDataset(gd_number, data_dir=os.path.dirname(config['DATA_DIR']))
+    
     # 1. Load existing PRI scores
     try:
         print(f"Loading PRI scores from {config['PRI_SCORES_PATH']}...")
@@ -285,17 +292,21 @@ def main():
     # 2. Load verbatim map data
     try:
         print(f"Loading verbatim responses from {config['VERBATIM_MAP_PATH']}...")
-        verbatim_map_df = pd.read_csv(config['VERBATIM_MAP_PATH'], quotechar='"', engine='python')
+        verbatim_map_df = dataset.verbatim_map
         print(f"Loaded verbatim map data with shape: {verbatim_map_df.shape}")
     except Exception as e:
         print(f"Error loading verbatim map data: {e}")
         sys.exit(1)
     
+    # Join PRI scores and responses on integer-coded participant/question IDs
+    dimensions = build_dimension_tables(config['DIMENSIONS_DIR'], [pri_scores_df, verbatim_map_df])
+    encode_dimension_columns(pri_scores_df, dimensions)
+    encode_dimension_columns(verbatim_map_df, dimensions)
+    
     # 3. Load discussion guide
     try:
         print(f"Loading discussion guide from {config['DISCUSSION_GUIDE_PATH']}...")
-        discussion_guide_df = pd.read_csv(config['DISCUSSION_GUIDE_PATH'], encoding='utf-8-sig', quotechar='"', 
-                                        engine='python', on_bad_lines='skip')
+        discussion_guide_df = dataset.discussion_guide
         print(f"Loaded discussion guide with {len(discussion_guide_df)} questions")
     except Exception as e:
         print(f"Error loading discussion guide: {e}")
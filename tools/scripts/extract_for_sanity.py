@@ -1,7 +1,9 @@
-import pandas as pd
 import argparse
 import os
 import re
+from lib.analysis_utils import lazy_import
+
+pd = lazy_import('pandas')
 
 def extract_sanity_data(gd_number):
     """
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+gd-sql: ad-hoc SQL over one GD's data
+
+Runs SQL against the GD's aggregate (long format), segment counts, votes, verbatim map, tags
+and PRI scores without writing a script. Tables are converted once into a cache under
+analysis_output/GD<N>/sql/ and reused until their source files change: Parquet files queried
+by duckdb (columnar) if it is installed, else a SQLite database (a row store, not columnar). See lib/sql.py for the tables and their columns.
+
+Usage:
+    python tools/scripts/gd_sql.py --gd_number <N> "SELECT ..."      # one query
+    python tools/scripts/gd_sql.py --gd_number <N> --tables          # list tables and columns
+    python tools/scripts/gd_sql.py --gd_number <N> < query.sql       # queries from a file
+    python tools/scripts/gd_sql.py --gd_number <N>                   # interactive prompt
+"""
+
+import argparse
+import logging
+import sys
+from lib.sql import GDSQL, available_engines, ENGINES
+
+def split_statements(text):
+    """Splits SQL text into statements on semicolons outside quotes."""
+    statements, current, quote = [], [], None
+    for char in text:
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ("'", '"'):
+            quote = char
+        elif char == ';':
+            statements.append(''.join(current))
+            current = []
+            continue
+        current.append(char)
+    statements.append(''.join(current))
+    return [statement.strip() for statement in statements if statement.strip()]
+
+def print_result(df, output_format, max_rows):
+    if output_format == 'csv':
+        df.to_csv(sys.stdout, index=False)
+    elif output_format == 'json':
+        print(df.to_json(orient='records', indent=2, date_format='iso'))
+    elif df.empty:
+        print(f"(no rows; columns: {', '.join(df.columns)})")
+    else:
+        print(df.to_string(index=False, max_rows=max_rows))
+        if max_rows and len(df) > max_rows:
+            print(f"({len(df)} rows, {max_rows} shown; use --max_rows 0 for all)")
+
+def run_statements(db, text, output_format, max_rows):
+    """Runs each statement in text, printing its result. Returns False if one failed."""
+    ok = True
+    for statement in split_statements(text):
+        try:
+            print_result(db.query(statement), output_format, max_rows)
+        except Exception as e:
+            print(f"Error: {e}", file=sys.stderr)
+            ok = False
+    return ok
+
+def print_tables(db):
+    for table in db.tables:
+        print(f"{table}: {', '.join(db.columns(table))}")
+
+def interactive(db, output_format, max_rows):
+    """Reads statements ending in ';' from the prompt until EOF or \\q."""
+    print(f"GD{db.gd_number} ({db.engine}). Tables: {', '.join(db.tables)}")
+    print("End statements with ';'. \\d lists columns, \\q quits.")
+    buffer = []
+    while True:
+        try:
+            line = input('gd-sql> ' if not buffer else '   ...> ')
+        except EOFError:
+            print()
+            break
+        command = line.strip()
+        if not buffer and command in ('\\q', 'exit', 'quit'):
+            break
+        if not buffer and command == '\\d':
+            print_tables(db)
+            continue
+        buffer.append(line)
+        if command.endswith(';'):
+            run_statements(db, '\n'.join(buffer), output_format, max_rows)
+            buffer = []
+
+def main():
+    parser = argparse.ArgumentParser(description="Run SQL over a GD's aggregate, votes, verbatim map, tags and PRI scores.")
+    parser.add_argument("--gd_number", type=int, required=True, help="Global Dialogue cadence number (e.g., 1, 2, 3).")
+    parser.add_argument("sql", nargs='?', help="SQL to run (several statements separated by ';'). "
+                                               "Read from stdin if omitted, or an interactive prompt on a terminal.")
+    parser.add_argument("--tables", action='store_true', help="List the tables and their columns, then exit.")
+    parser.add_argument("--engine", choices=ENGINES, default=None,
+                        help="SQL engine (default: duckdb if installed, else sqlite).")
+    parser.add_argument("--format", choices=['table', 'csv', 'json'], default='table', help="Output format (default: table).")
+    parser.add_argument("--max_rows", type=int, default=50, help="Rows shown in table format; 0 for all (default: 50).")
+    parser.add_argument("--rebuild", action='store_true', help="Rebuild the cached tables even if their sources are unchanged.")
+    parser.add_argument("--data_dir", default="Data", help="Base data directory containing GD<N>/ (default: Data).")
+    parser.add_argument("--output_dir", default="analysis_output", help="Base output directory holding the cache (default: analysis_output).")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', stream=sys.stderr)
+    if args.engine and args.engine not in available_engines():
+        parser.error(f"{args.engine} is not installed (pip install {args.engine})")
+
+    try:
+        db = GDSQL(args.gd_number, data_dir=args.data_dir, output_base_dir=args.output_dir,
+                   engine=args.engine, rebuild=args.rebuild)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    with db:
+        if args.tables:
+            print_tables(db)
+        elif args.sql:
+            sys.exit(0 if run_statements(db, args.sql, args.format, args.max_rows or None) else 1)
+        elif sys.stdin.isatty():
+            interactive(db, args.format, args.max_rows or None)
+        else:
+            sys.exit(0 if run_statements(db, sys.stdin.read(), args.format, args.max_rows or None) else 1)
+
+if __name__ == "__main__":
+    main()
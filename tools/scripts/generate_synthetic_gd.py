@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+"""
+Generates a synthetic Global Dialogue in the Remesh export format, for load testing.
+
+Writes Data/GD<N>/ with the raw GD<N>_aggregate.csv (metadata rows, then one header per
+question block with 'Name (N)' segment columns), GD<N>_binary.csv, GD<N>_preference.csv,
+GD<N>_verbatim_map.csv, GD<N>_participants.csv, GD<N>_discussion_guide.csv, and per-question
+tag exports (<QuestionID>_Tag_Categories.csv / _Thought_Labels.csv) in tag_codes_raw/.
+The output goes through the normal preprocessing (preprocess_aggregate.py,
+preprocess_tag_files.py) and into calculate_pri.py as is. Data is deterministic for a seed.
+
+Usage:
+    python tools/scripts/generate_synthetic_gd.py --gd_number 99 --participants 100000
+    python tools/scripts/generate_synthetic_gd.py --gd_number 99 --participants 20000 --ask_questions 8 \\
+        --regions 12 --votes_per_participant 40 --export_metadata
+"""
+
+import argparse
+import csv
+import logging
+import sys
+import uuid
+from pathlib import Path
+
+from lib.analysis_utils import lazy_import
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Onboarding questions that define the O-coded segments: (content, options, weights)
+ONBOARDING_QUESTIONS = [
+    ("Please select your preferred language:", ["English", "Spanish", "French", "Arabic"], [0.55, 0.2, 0.15, 0.1]),
+    ("How old are you?", ["18-25", "26-35", "36-45", "46-55", "56-65", "65+"], [0.25, 0.3, 0.2, 0.12, 0.08, 0.05]),
+    ("What is your gender?", ["Male", "Female", "Non-binary"], [0.48, 0.49, 0.03]),
+    ("What best describes where you live?", ["Rural", "Suburban", "Urban"], [0.25, 0.3, 0.45]),
+    ("Overall, would you say the increased use of AI in daily life makes you feel:",
+     ["More excited than concerned", "More concerned than excited", "Equally concerned and excited"], [0.35, 0.3, 0.35]),
+]
+# Region segments (no O-code in the aggregate headers)
+REGION_NAMES = ["Africa", "Asia", "Europe", "North America", "South America", "Oceania", "Eastern Asia",
+                "Western Europe", "Northern Africa", "Central America", "Eastern Europe", "Western Asia"]
+POLL_OPTIONS = ["Strongly agree", "Somewhat agree", "Neutral", "Somewhat disagree", "Strongly disagree"]
+TAG_CATEGORIES = {
+    "Quality": ["Uninformative answer", "Off topic"],
+    "Benefits": ["Productivity", "Healthcare", "Education", "Accessibility"],
+    "Risks": ["Job loss", "Misinformation", "Privacy", "Loss of human connection"],
+    "Governance": ["Regulation", "Transparency", "Accountability"],
+}
+SENTIMENTS = ["Positive", "Neutral", "Negative"]
+RESPONSE_OPENERS = ["I think", "In my opinion", "Honestly,", "I believe", "For me,", "I worry that", "I hope"]
+RESPONSE_TOPICS = ["AI should help doctors diagnose diseases earlier", "AI could replace many jobs in my town",
+                   "AI can make education available to everyone", "people need to know when they talk to an AI",
+                   "governments must regulate AI companies", "AI helps me plan my day", "it depends",
+                   "AI tools should protect our private data", "AI makes misinformation easier to spread"]
+TIMESTAMP_FORMAT = '%B %d, %Y at %I:%M %p (GMT)'
+GUIDE_COLUMNS = (["Notes", "Section", "Cross Conversation Tag - Polls and Opinions only (Optional)",
+                  "Item type (dropdown)", "Content", "Duration in minutes (dropdown)", "",
+                  "Randomize options or categories for each participant", "Add 'Other' as an option",
+                  "Add 'None of the above' as an option"]
+                 + [f"Poll or Category Option {i}" for i in range(1, 21)])
+
+
+def _uuids(rng, n):
+    """Returns n random UUID strings drawn from rng (deterministic for a seed)."""
+    raw = rng.bytes(16 * n)
+    return [str(uuid.UUID(bytes=raw[i:i + 16], version=4)) for i in range(0, 16 * n, 16)]
+
+
+def _percent_strings(values):
+    """Formats agreement rates (0-1) as Remesh percentage strings like '42%'."""
+    return np.char.add(np.rint(values * 100).astype(int).astype(str), '%')
+
+
+def _decaying_weights(n):
+    """Uneven segment sizes: weights proportional to 1, 0.8, 0.64, ... normalized to 1."""
+    weights = 0.8 ** np.arange(n)
+    return weights / weights.sum()
+
+
+def _per_participant_counts(rng, participants, mean):
+    """Number of events per participant: Poisson around the mean, at least 1 (0 if the mean is 0)."""
+    if mean <= 0:
+        return np.zeros(participants, dtype=int)
+    return np.maximum(rng.poisson(mean, participants), 1)
+
+
+def _session_offsets(rng, counts, min_gap=10, max_gap=60):
+    """Seconds since each participant's session start for their events, min_gap-max_gap seconds apart."""
+    gaps = rng.integers(min_gap, max_gap, counts.sum())
+    elapsed = gaps.cumsum()
+    first = np.cumsum(counts) - counts # Index of each participant's first event
+    return elapsed - np.repeat(elapsed[first[counts > 0]] - gaps[first[counts > 0]], counts[counts > 0])
+
+
+def _write_csv(df, path, metadata_rows=None, header=True, encoding='utf-8'):
+    """Writes df, optionally preceded by Remesh-style metadata rows (as raw exports have)."""
+    with open(path, 'w', encoding=encoding, newline='') as f:
+        if metadata_rows:
+            csv.writer(f).writerows(metadata_rows)
+        df.to_csv(f, index=False, header=header)
+
+
+def write_synthetic_gd(data_dir, gd_number, participants, ask_questions=4, poll_questions=3,
+                       onboarding_questions=3, regions=5, votes_per_participant=20,
+                       preferences_per_participant=5, response_rate=0.9, agreement_alpha=2.0,
+                       agreement_beta=2.0, segment_noise=0.08, max_tags=3, export_metadata=False, seed=0):
+    """
+    Writes a synthetic GD<N> data set under data_dir.
+
+    Args:
+        data_dir (Path): Base data directory; files go to data_dir/GD<N>/.
+        gd_number (int): Cadence number used in file names.
+        participants (int): Number of participants.
+        ask_questions (int): Number of Ask Opinion questions (each gets authored thoughts and tags).
+        poll_questions (int): Number of Poll Single Select questions.
+        onboarding_questions (int): Number of onboarding questions; each option is an O-coded segment.
+        regions (int): Number of region segments.
+        votes_per_participant (float): Mean binary agree/disagree votes per participant.
+        preferences_per_participant (float): Mean pairwise preference judgments per participant.
+        response_rate (float): Share of participants answering each Ask Opinion question.
+        agreement_alpha, agreement_beta (float): Beta distribution of each thought's overall agreement rate.
+        segment_noise (float): Std. dev. of a segment's agreement around the overall rate.
+        max_tags (int): Most tags applied to one response (uniform from 0 to max_tags).
+        export_metadata (bool): Precede the headers of the participants, guide, binary, preference
+            and verbatim map files with metadata rows, like raw exports (removed by
+            preprocess_cleanup_metadata.py). calculate_pri.py needs them removed first.
+        seed (int): Random seed.
+
+    Returns:
+        dict: Row counts of the generated files (participants, aggregate_rows, thoughts,
+              binary_votes, preference_judgments, tag_instances, tag_files).
+    """
+    rng = np.random.default_rng(seed)
+    gd = f"GD{gd_number}"
+    gd_dir = Path(data_dir) / gd
+    raw_tags_dir = gd_dir / "tag_codes_raw"
+    raw_tags_dir.mkdir(parents=True, exist_ok=True)
+    title = f"Global Dialogue {gd_number} (synthetic)"
+    # No blank line: preprocess_cleanup_metadata.py locates the header with pandas, which skips blank lines
+    metadata_rows = [["Conversation Title", title], ["Exported", "January 1, 2026"]] if export_metadata else None
+
+    participant_ids = np.array(_uuids(rng, participants), dtype=object)
+    sample_ids = np.array([f"S{i:07d}" for i in range(participants)], dtype=object)
+
+    # --- Segment membership: one option per onboarding question, plus a region ---
+    onboarding = [] # (content, options, chosen option index per participant)
+    for i in range(onboarding_questions):
+        if i < len(ONBOARDING_QUESTIONS):
+            content, options, weights = ONBOARDING_QUESTIONS[i]
+        else:
+            content = f"Synthetic onboarding question {i + 1}:"
+            options = [f"Option {chr(65 + k)}" for k in range(4)]
+            weights = _decaying_weights(len(options))
+        onboarding.append((content, options, rng.choice(len(options), participants, p=weights)))
+    region_names = [REGION_NAMES[i] if i < len(REGION_NAMES) else f"Region {i + 1}" for i in range(regions)]
+    region = rng.choice(regions, participants, p=_decaying_weights(regions)) if regions else None
+
+    segment_members = [("All", np.ones(participants, dtype=bool))]
+    for o_code, (content, options, chosen) in enumerate(onboarding, start=1):
+        segment_members += [(f"O{o_code}: {option}", chosen == i) for i, option in enumerate(options)]
+    segment_members += [(name, region == i) for i, name in enumerate(region_names)]
+    segment_headers = [f"{name} ({int(mask.sum())})" for name, mask in segment_members]
+    n_segments = len(segment_members)
+
+    # --- Questions ---
+    ask_ids = _uuids(rng, ask_questions)
+    poll_ids = _uuids(rng, poll_questions)
+    ask_texts = [f"Synthetic opinion question {i + 1}: what should AI be used for?" for i in range(ask_questions)]
+    poll_texts = [f"Synthetic poll {i + 1}: AI will improve daily life." for i in range(poll_questions)]
+
+    # --- Authored thoughts (one per responding participant per Ask Opinion question) ---
+    thought_frames = []
+    for qid, qtext in zip(ask_ids, ask_texts):
+        authors = np.flatnonzero(rng.random(participants) < response_rate)
+        thought_frames.append(pd.DataFrame({
+            'Question ID': qid,
+            'Question Text': qtext,
+            'Participant ID': participant_ids[authors],
+            'Sample ID': sample_ids[authors],
+            'Thought ID': _uuids(rng, len(authors)),
+        }))
+    thoughts = pd.concat(thought_frames, ignore_index=True)
+    n_thoughts = len(thoughts)
+    thoughts['Thought Text'] = (np.array(RESPONSE_OPENERS, dtype=object)[rng.integers(0, len(RESPONSE_OPENERS), n_thoughts)]
+                                + ' ' + np.array(RESPONSE_TOPICS, dtype=object)[rng.integers(0, len(RESPONSE_TOPICS), n_thoughts)])
+    thoughts['Sentiment'] = np.array(SENTIMENTS)[rng.integers(0, len(SENTIMENTS), n_thoughts)]
+    agreement = rng.beta(agreement_alpha, agreement_beta, n_thoughts)
+
+    # --- Raw aggregate: metadata rows, then one header + block per question ---
+    aggregate_path = gd_dir / f"{gd}_aggregate.csv"
+    with open(aggregate_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerows([["Conversation Title", title], ["Date", "January 1, 2026"], []])
+        for qid, qtext in zip(poll_ids, poll_texts):
+            writer.writerow(["Question ID", "Question Type", "Question", "Responses"] + segment_headers)
+            shares = rng.dirichlet(np.ones(len(POLL_OPTIONS)), n_segments).T
+            for option, option_shares in zip(POLL_OPTIONS, shares):
+                writer.writerow([qid, "Poll Single Select", qtext, option] + list(_percent_strings(option_shares)))
+            writer.writerow([])
+        ask_header = (["Question ID", "Question Type", "Question", "English Responses", "Original Responses",
+                       "Star", "Sentiment"] + segment_headers
+                      + ["Submitted By", "Language", "Sample ID", "Participant ID"])
+        for qid, block in thoughts.groupby('Question ID', sort=False):
+            writer.writerow(ask_header)
+            # Each segment's agreement is the thought's overall agreement plus segment noise
+            noise = rng.normal(0, segment_noise, (len(block), n_segments))
+            noise[:, 0] = 0
+            percents = _percent_strings(np.clip(agreement[block.index][:, None] + noise, 0, 1))
+            for i, row in enumerate(block[['Question Text', 'Thought Text', 'Sentiment', 'Sample ID',
+                                           'Participant ID']].itertuples(index=False)):
+                writer.writerow([qid, "Ask Opinion", row[0], row[1], row[1], "", row[2]]
+                                + list(percents[i]) + ["Participant", "en", row[3], row[4]])
+            writer.writerow([])
+    aggregate_rows = poll_questions * len(POLL_OPTIONS) + n_thoughts
+
+    # --- Verbatim map ---
+    _write_csv(thoughts[['Question ID', 'Question Text', 'Participant ID', 'Thought ID', 'Thought Text']],
+               gd_dir / f"{gd}_verbatim_map.csv", metadata_rows)
+
+    # --- Binary votes: random thoughts, agreed with at the thought's agreement rate ---
+    start = pd.Timestamp("2026-01-01 12:00")
+    session_start = rng.integers(0, 6 * 3600, participants)
+    vote_counts = _per_participant_counts(rng, participants, votes_per_participant)
+    n_votes = int(vote_counts.sum())
+    voters = np.repeat(np.arange(participants), vote_counts)
+    voted = rng.integers(0, n_thoughts, n_votes)
+    votes = np.where(rng.random(n_votes) < agreement[voted], 'agree', 'disagree')
+    votes[rng.random(n_votes) < 0.05] = 'neutral'
+    vote_times = start + pd.to_timedelta(session_start[voters] + _session_offsets(rng, vote_counts), unit='s')
+    _write_csv(pd.DataFrame({
+        'Question ID': thoughts['Question ID'].to_numpy()[voted],
+        'Participant ID': participant_ids[voters],
+        'Thought ID': thoughts['Thought ID'].to_numpy()[voted],
+        'Vote': votes,
+        'Timestamp': vote_times.strftime(TIMESTAMP_FORMAT),
+    }), gd_dir / f"{gd}_binary.csv", metadata_rows)
+
+    # --- Preference judgments: pairs of thoughts from the same question ---
+    pref_counts = _per_participant_counts(rng, participants, preferences_per_participant)
+    n_prefs = int(pref_counts.sum())
+    pref_voters = np.repeat(np.arange(participants), pref_counts)
+    first = rng.integers(0, n_thoughts, n_prefs)
+    question_position = thoughts.groupby('Question ID', sort=False).cumcount().to_numpy()
+    question_size = thoughts.groupby('Question ID', sort=False)['Thought ID'].transform('size').to_numpy()
+    second = first - question_position[first] + rng.integers(0, question_size[first])
+    pref_times = start + pd.to_timedelta(session_start[pref_voters] + _session_offsets(rng, pref_counts), unit='s')
+    preference_votes = ["Thought A", "Thought B", "I agree with both", "I disagree with both"]
+    _write_csv(pd.DataFrame({
+        'Question ID': thoughts['Question ID'].to_numpy()[first],
+        'Participant ID': participant_ids[pref_voters],
+        'Thought A ID': thoughts['Thought ID'].to_numpy()[first],
+        'Thought B ID': thoughts['Thought ID'].to_numpy()[second],
+        'Vote': np.array(preference_votes)[rng.choice(4, n_prefs, p=[0.4, 0.4, 0.1, 0.1])],
+        'Timestamp': pref_times.strftime(TIMESTAMP_FORMAT),
+    }), gd_dir / f"{gd}_preference.csv", metadata_rows)
+
+    # --- Participants: one column per onboarding / poll question holding the answer ---
+    participants_df = pd.DataFrame({'Participant Id': participant_ids, 'Sample Provider Id': sample_ids})
+    for content, options, chosen in onboarding:
+        participants_df[content] = np.array(options)[chosen]
+    for qtext in poll_texts:
+        participants_df[qtext] = np.array(POLL_OPTIONS)[rng.integers(0, len(POLL_OPTIONS), participants)]
+    _write_csv(participants_df, gd_dir / f"{gd}_participants.csv", metadata_rows)
+
+    # --- Discussion guide ---
+    guide_rows = []
+    def guide_row(merge_tag, item_type, content, options=()):
+        row = dict.fromkeys(GUIDE_COLUMNS, "")
+        row.update({GUIDE_COLUMNS[2]: merge_tag, "Item type (dropdown)": item_type, "Content": content})
+        row.update({f"Poll or Category Option {i}": option for i, option in enumerate(options, start=1)})
+        guide_rows.append(row)
+    for i, (content, options, _) in enumerate(onboarding):
+        guide_row(f"Merge {100 + i}", "onboarding single select", content, options)
+    for i, qtext in enumerate(poll_texts):
+        guide_row(f"Merge {200 + i}", "poll single select", qtext, POLL_OPTIONS)
+    for i, qtext in enumerate(ask_texts):
+        guide_row(f"Merge {300 + i}", "ask opinion", qtext)
+    _write_csv(pd.DataFrame(guide_rows, columns=GUIDE_COLUMNS), gd_dir / f"{gd}_discussion_guide.csv", metadata_rows)
+
+    # --- Per-question tag exports (as downloaded via Auto Code > Export Codes) ---
+    tag_names = np.array([tag for tags in TAG_CATEGORIES.values() for tag in tags], dtype=object)
+    n_tags = rng.integers(0, max_tags + 1, n_thoughts)
+    tag_choice = tag_names[rng.integers(0, len(tag_names), (n_thoughts, max_tags))]
+    tag_cells = np.where(np.arange(max_tags) < n_tags[:, None], tag_choice, None)
+    width = max(len(tags) for tags in TAG_CATEGORIES.values())
+    categories_df = pd.DataFrame([[category] + tags + [None] * (width - len(tags))
+                                  for category, tags in TAG_CATEGORIES.items()])
+    for qid, qtext in zip(ask_ids, ask_texts):
+        export_metadata_rows = [["Conversation Title", title], ["Question IDs", qid], ["Question", qtext], []]
+        _write_csv(categories_df, raw_tags_dir / f"{qid}_Tag_Categories.csv", export_metadata_rows,
+                   header=["Category"] + ["Tag"] * width, encoding='utf-8-sig')
+        in_question = (thoughts['Question ID'] == qid).to_numpy()
+        labels_df = pd.concat([
+            thoughts.loc[in_question, ['Participant ID', 'Thought ID', 'Thought Text', 'Sentiment']].reset_index(drop=True),
+            pd.DataFrame(tag_cells[in_question]),
+        ], axis=1)
+        _write_csv(labels_df, raw_tags_dir / f"{qid}_Thought_Labels.csv", export_metadata_rows,
+                   header=["Participant ID", "Thought ID", "Thought Text", "Sentiment"] + ["Tag"] * max_tags,
+                   encoding='utf-8-sig')
+
+    return {
+        'participants': participants,
+        'aggregate_rows': aggregate_rows,
+        'thoughts': n_thoughts,
+        'binary_votes': n_votes,
+        'preference_judgments': n_prefs,
+        'tag_instances': int(n_tags.sum()),
+        'tag_files': 2 * ask_questions,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Global Dialogue in the Remesh export format for load testing.")
+    parser.add_argument("--gd_number", type=int, required=True, help="Cadence number for the generated files (Data/GD<N>/GD<N>_*.csv).")
+    parser.add_argument("--data_dir", type=Path, default=Path("Data"), help="Base data directory (default: Data).")
+    parser.add_argument("--participants", type=int, default=10_000, help="Number of participants (default: 10000).")
+    parser.add_argument("--ask_questions", type=int, default=4, help="Number of Ask Opinion questions (default: 4).")
+    parser.add_argument("--poll_questions", type=int, default=3, help="Number of Poll Single Select questions (default: 3).")
+    parser.add_argument("--onboarding_questions", type=int, default=3,
+                        help="Onboarding questions; each option becomes an O-coded segment (default: 3).")
+    parser.add_argument("--regions", type=int, default=5, help="Number of region segments (default: 5).")
+    parser.add_argument("--votes_per_participant", type=float, default=20, help="Mean binary votes per participant (default: 20).")
+    parser.add_argument("--preferences_per_participant", type=float, default=5,
+                        help="Mean preference judgments per participant (default: 5).")
+    parser.add_argument("--response_rate", type=float, default=0.9,
+                        help="Share of participants answering each Ask Opinion question (default: 0.9).")
+    parser.add_argument("--agreement_alpha", type=float, default=2.0, help="Alpha of the Beta distribution of agreement rates (default: 2).")
+    parser.add_argument("--agreement_beta", type=float, default=2.0, help="Beta of the Beta distribution of agreement rates (default: 2).")
+    parser.add_argument("--segment_noise", type=float, default=0.08,
+                        help="Std. dev. of segment agreement around the overall rate (default: 0.08).")
+    parser.add_argument("--max_tags", type=int, default=3, help="Most tags applied to one response (default: 3).")
+    parser.add_argument("--export_metadata", action="store_true",
+                        help="Add metadata rows above the headers of the participants, guide, binary, preference and verbatim map "
+                             "files, like raw exports (run preprocess_cleanup_metadata.py before calculate_pri.py).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0).")
+    parser.add_argument("--force", action="store_true", help="Write into Data/GD<N>/ even if it already contains files.")
+    args = parser.parse_args()
+    if args.participants < 1 or args.ask_questions < 1:
+        parser.error("--participants and --ask_questions must be at least 1")
+
+    gd_dir = args.data_dir / f"GD{args.gd_number}"
+    if gd_dir.exists() and any(gd_dir.iterdir()) and not args.force:
+        logging.error(f"{gd_dir} already contains files. Choose an unused --gd_number or pass --force to overwrite.")
+        sys.exit(1)
+
+    logging.info(f"Generating synthetic GD{args.gd_number} with {args.participants:,} participants in {gd_dir}...")
+    counts = write_synthetic_gd(
+        args.data_dir, args.gd_number, args.participants,
+        ask_questions=args.ask_questions, poll_questions=args.poll_questions,
+        onboarding_questions=args.onboarding_questions, regions=args.regions,
+        votes_per_participant=args.votes_per_participant,
+        preferences_per_participant=args.preferences_per_participant,
+        response_rate=args.response_rate, agreement_alpha=args.agreement_alpha,
+        agreement_beta=args.agreement_beta, segment_noise=args.segment_noise,
+        max_tags=args.max_tags, export_metadata=args.export_metadata, seed=args.seed,
+    )
+    for name, value in counts.items():
+        logging.info(f"  {name}: {value:,}")
+    logging.info(f"Done. Next: make preprocess GD={args.gd_number} && make preprocess-tags GD={args.gd_number}")
+
+
+if __name__ == "__main__":
+    main()
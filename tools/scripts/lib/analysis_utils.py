@@ -1,13 +1,79 @@
 # Placeholder for shared analysis utility functions
-import pandas as pd
+import hashlib
+import importlib
+import json
 import logging
 import re # For parsing segment columns
-import numpy as np
 import os # For commonprefix in segment parsing helper
+import gc
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+import types
+from contextlib import contextmanager
+from datetime import datetime
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# --- Lazy imports (keep script startup and --help fast) ---
+
+class LazyModule(types.ModuleType):
+    """
+    Stand-in for a module that is imported on first attribute access (see lazy_import).
+    Once imported, the module's attributes are copied onto the stand-in, so later
+    accesses cost the same as on the real module.
+    """
+
+    def __init__(self, name, setup=None):
+        super().__init__(name)
+        self.__dict__['_lazy_setup'] = setup
+        self.__dict__['_lazy_module'] = None
+
+    def __getattr__(self, attr):
+        # Only reached for attributes not copied (yet): before the import, or
+        # submodules the real module gained later
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            setup = self.__dict__['_lazy_setup']
+            if setup is not None:
+                setup()
+            module = importlib.import_module(self.__name__)
+            self.__dict__.update(module.__dict__)
+            self.__dict__['_lazy_module'] = module
+        return getattr(module, attr)
+
+    def __repr__(self):
+        state = 'imported' if self.__dict__['_lazy_module'] is not None else 'not imported yet'
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+def lazy_import(name, setup=None):
+    """
+    Returns a module object that imports ``name`` on first use, for heavy or
+    optional dependencies that many runs (e.g. ``--help``, runs without charts or
+    the LLM judge) never need. ``setup`` is called once right before the import
+    (e.g. to select the matplotlib backend). A missing optional dependency raises
+    ImportError at first use instead of at startup.
+
+    Example:
+        pd = lazy_import('pandas')
+        plt = lazy_import('matplotlib.pyplot')
+    """
+    if setup is None and name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name, setup)
+
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+
+def ignore_performance_warnings():
+    """Suppresses pandas' PerformanceWarning (DataFrame fragmentation) for this process."""
+    import warnings
+    from pandas.errors import PerformanceWarning
+    warnings.filterwarnings('ignore', category=PerformanceWarning)
+
 # TODO: Define utility functions (e.g., load_data, parse_percentage, etc.)
 
 def load_standardized_data(csv_path):
@@ -202,4 +268,542 @@ def get_segment_columns(header_row):
     # Return list of unique core names, and the details dict mapped by original full name
     return sorted_core_segment_names, segment_details, start_index
 
-# Removed placeholder print 
\ No newline at end of file
+# --- Long-format tag tables ---
+
+THOUGHT_TAGS_FILENAME = 'all_thought_tags.csv'
+TAG_DICTIONARY_FILENAME = 'tag_dictionary.csv'
+TAG_COL_PATTERN = re.compile(r'^Tag \d+$')
+
+def _tag_cells(wide_df, id_cols):
+    """
+    Collects the non-empty 'Tag N' cells of a wide tag table as long rows of
+    id_cols + 'Tag', one column at a time so the sparse padding is never materialized.
+    """
+    tag_cols = [col for col in wide_df.columns if TAG_COL_PATTERN.match(col)]
+    pieces = []
+    for col in tag_cols:
+        tags = wide_df[col].dropna().astype(str).str.strip()
+        tags = tags[tags != '']
+        pieces.append(wide_df.loc[tags.index, id_cols].assign(Tag=tags))
+    if not pieces:
+        return pd.DataFrame(columns=id_cols + ['Tag'])
+    return pd.concat(pieces, ignore_index=True)
+
+def build_long_tag_tables(labels_df, categories_df):
+    """
+    Converts the wide combined tag files into long format.
+
+    Args:
+        labels_df (pd.DataFrame): all_thought_labels.csv contents (wide 'Tag 1..Tag N' layout).
+        categories_df (pd.DataFrame): all_tag_categories.csv contents (wide layout).
+
+    Returns:
+        tuple: (thought_tags_df, tag_dictionary_df)
+               - thought_tags_df: one row per applied tag with columns
+                 'Question ID', 'Participant ID', 'tag_id'.
+               - tag_dictionary_df: one row per (Question ID, Tag) with columns
+                 'tag_id', 'Question ID', 'Tag', 'Category' (empty if the tag has no category).
+                 A tag listed under several categories of its question keeps the first one
+                 found (scanning Tag 1, then Tag 2, ...); the other (tag, category) pairs
+                 are logged and dropped.
+    """
+    label_cells = _tag_cells(labels_df, ['Question ID', 'Participant ID'])
+    category_cells = _tag_cells(categories_df, ['Question ID', 'Category']).drop_duplicates()
+    extra_categories = category_cells.duplicated(subset=['Question ID', 'Tag'])
+    if extra_categories.any():
+        dropped = category_cells[extra_categories]
+        logging.warning(f"{len(dropped)} (tag, category) pairs dropped: these tags are listed under several "
+                        f"categories and keep only their first one. First few: "
+                        f"{dropped[['Question ID', 'Tag', 'Category']].head(5).to_dict('records')}")
+    category_cells = category_cells[~extra_categories]
+
+    # Tags are scoped to their question; ids are assigned in sorted order so rebuilds are stable
+    tag_dictionary_df = pd.concat([category_cells[['Question ID', 'Tag']], label_cells[['Question ID', 'Tag']]])
+    tag_dictionary_df = tag_dictionary_df.drop_duplicates().sort_values(['Question ID', 'Tag'], ignore_index=True)
+    tag_dictionary_df.insert(0, 'tag_id', np.arange(len(tag_dictionary_df), dtype=np.int32))
+    tag_dictionary_df = tag_dictionary_df.merge(category_cells, on=['Question ID', 'Tag'], how='left')
+
+    thought_tags_df = label_cells.merge(tag_dictionary_df[['Question ID', 'Tag', 'tag_id']],
+                                        on=['Question ID', 'Tag'], how='left')
+    thought_tags_df = thought_tags_df[['Question ID', 'Participant ID', 'tag_id']]
+    return thought_tags_df, tag_dictionary_df
+
+def load_long_tag_tables(tags_dir):
+    """
+    Loads the long-format tag tables written by preprocess_tag_files.py.
+
+    Falls back to building them in memory from the wide combined files when the
+    long-format files have not been generated yet (older tag directories).
+
+    Returns:
+        tuple: (thought_tags_df, tag_dictionary_df), or (None, None) if no tag files are found.
+    """
+    thought_tags_path = os.path.join(tags_dir, THOUGHT_TAGS_FILENAME)
+    dictionary_path = os.path.join(tags_dir, TAG_DICTIONARY_FILENAME)
+    id_dtypes = {'Question ID': str, 'Participant ID': str, 'tag_id': np.int32}
+
+    if os.path.exists(thought_tags_path) and os.path.exists(dictionary_path):
+        logging.info(f"Loading long-format tags from {thought_tags_path}")
+        thought_tags_df = pd.read_csv(thought_tags_path, encoding='utf-8-sig', dtype=id_dtypes)
+        tag_dictionary_df = pd.read_csv(dictionary_path, encoding='utf-8-sig',
+                                        dtype=dict(id_dtypes, Tag=str, Category=str))
+        return thought_tags_df, tag_dictionary_df
+
+    labels_path = os.path.join(tags_dir, 'all_thought_labels.csv')
+    categories_path = os.path.join(tags_dir, 'all_tag_categories.csv')
+    if not (os.path.exists(labels_path) and os.path.exists(categories_path)):
+        logging.error(f"No long-format or combined tag files found in {tags_dir}")
+        return None, None
+
+    logging.warning(f"Long-format tag files not found in {tags_dir}; building them from the wide combined files. "
+                    f"Rerun preprocess_tag_files.py to generate them.")
+    labels_df = pd.read_csv(labels_path, encoding='utf-8-sig', dtype=str)
+    categories_df = pd.read_csv(categories_path, encoding='utf-8-sig', dtype=str)
+    return build_long_tag_tables(labels_df, categories_df)
+
+# --- Dimension tables (dense integer codes for IDs) ---
+
+# Dimension name -> ID column it encodes in fact tables
+DIMENSION_COLUMNS = {
+    'participants': 'Participant ID',
+    'questions': 'Question ID',
+    'thoughts': 'Thought ID',
+    'segments': 'Segment',
+}
+
+def get_dimensions_dir(gd_number, output_base_dir='analysis_output'):
+    """Returns the directory holding the persisted dimension tables for a GD."""
+    return os.path.join(output_base_dir, f"GD{gd_number}", "dimensions")
+
+def load_dimension_tables(dimensions_dir):
+    """
+    Loads the persisted dimension tables for a GD.
+
+    Each table is stored as <dimension>.csv with columns 'code' and the ID column;
+    the returned Index holds the IDs in code order, so an ID's code is its position.
+
+    Returns:
+        dict: Dimension name -> pd.Index of IDs (empty if the table doesn't exist yet).
+    """
+    dimensions = {}
+    for name, id_col in DIMENSION_COLUMNS.items():
+        path = os.path.join(dimensions_dir, f"{name}.csv")
+        if os.path.exists(path):
+            table = pd.read_csv(path, dtype={id_col: str}, keep_default_na=False).sort_values('code')
+            dimensions[name] = pd.Index(table[id_col], dtype=object)
+        else:
+            dimensions[name] = pd.Index([], dtype=object)
+    return dimensions
+
+def save_dimension_tables(dimensions_dir, dimensions):
+    """Writes each dimension table as <dimension>.csv (code, ID)."""
+    os.makedirs(dimensions_dir, exist_ok=True)
+    for name, ids in dimensions.items():
+        id_col = DIMENSION_COLUMNS[name]
+        table = pd.DataFrame({'code': np.arange(len(ids), dtype=np.int32), id_col: ids})
+        table.to_csv(os.path.join(dimensions_dir, f"{name}.csv"), index=False)
+
+def extend_dimension(ids, values):
+    """Appends unseen values to a dimension, keeping existing codes stable."""
+    values = pd.Series(values, dtype=object).dropna().astype(str)
+    new_ids = pd.Index(values.unique(), dtype=object).difference(ids, sort=False)
+    return ids.append(new_ids) if len(new_ids) else ids
+
+def build_dimension_tables(dimensions_dir, frames, segments=None):
+    """
+    Assigns codes to every participant, question and thought ID found in the given
+    fact tables (and to the given segment names), then persists the mapping.
+
+    Codes already assigned in a previous run are kept; new IDs get the next free codes.
+
+    Args:
+        dimensions_dir (str): Directory for the dimension tables (see get_dimensions_dir).
+        frames (list): Fact tables (DataFrames) carrying any of the ID columns.
+        segments (list, optional): Segment names to register.
+
+    Returns:
+        dict: Dimension name -> pd.Index of IDs (see load_dimension_tables).
+    """
+    dimensions = load_dimension_tables(dimensions_dir)
+    sizes = {name: len(ids) for name, ids in dimensions.items()}
+    for name, id_col in DIMENSION_COLUMNS.items():
+        for df in frames:
+            if df is not None and id_col in df.columns:
+                dimensions[name] = extend_dimension(dimensions[name], df[id_col])
+    if segments is not None:
+        dimensions['segments'] = extend_dimension(dimensions['segments'], segments)
+
+    added = {name: len(ids) - sizes[name] for name, ids in dimensions.items() if len(ids) != sizes[name]}
+    if added or not os.path.isdir(dimensions_dir):
+        save_dimension_tables(dimensions_dir, dimensions)
+        logging.info(f"Saved dimension tables to {dimensions_dir} (new codes: {added})")
+    return dimensions
+
+def encode_dimension_columns(df, dimensions, columns=None):
+    """
+    Stores ID columns as categoricals whose categories are the dimension tables, so
+    each ID is held once per GD and rows carry only its integer code. Joins and
+    groupbys between tables encoded against the same dimensions run on the codes,
+    while values still compare equal to the original ID strings.
+
+    Args:
+        df (pd.DataFrame): Fact table, modified in place.
+        dimensions (dict): Output of build_dimension_tables / load_dimension_tables.
+        columns (dict, optional): Column name -> dimension name, for tables that use a
+            different column name (e.g. {'Participant Id': 'participants'}).
+            Defaults to DIMENSION_COLUMNS.
+
+    Returns:
+        pd.DataFrame: The same DataFrame, for chaining.
+    """
+    if columns is None:
+        columns = {id_col: name for name, id_col in DIMENSION_COLUMNS.items()}
+    for col, name in columns.items():
+        if col in df.columns:
+            values = df[col].astype(str).where(df[col].notna())
+            df[col] = pd.Categorical(values, categories=dimensions[name])
+    return df
+
+# --- File fingerprints (for incremental rebuilds) ---
+
+def file_sha256(file_path):
+    """Computes the SHA-256 hex digest of a file, reading it in 1MB blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def file_fingerprint(file_path, previous=None):
+    """
+    Returns {'sha256', 'size', 'mtime'} for a file. The hash is reused from
+    ``previous`` when size and mtime are unchanged, so unchanged files are not read.
+    """
+    stat = os.stat(file_path)
+    if previous and previous.get('size') == stat.st_size and previous.get('mtime') == stat.st_mtime:
+        sha256 = previous['sha256']
+    else:
+        sha256 = file_sha256(file_path)
+    return {'sha256': sha256, 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+# --- Chart cache (skip redrawing PNGs whose inputs are unchanged) ---
+
+CHART_MANIFEST_SUFFIX = '.chart.json' # Sidecar next to each PNG: <name>.png.chart.json
+
+def chart_hash(data, params):
+    """
+    Hashes everything that determines a chart: its input data and plotting parameters.
+
+    Args:
+        data: DataFrame, Series or array-like plotted by the chart.
+        params (dict): JSON-serializable plotting parameters (title, labels, dpi, ...).
+
+    Returns:
+        str: SHA-256 hex digest.
+    """
+    digest = hashlib.sha256()
+    if isinstance(data, pd.Series):
+        data = data.to_frame()
+    if isinstance(data, pd.DataFrame):
+        digest.update(json.dumps([str(col) for col in data.columns]).encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    elif data is not None:
+        digest.update(np.ascontiguousarray(data).tobytes())
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+def chart_is_current(png_path, digest):
+    """True if the PNG exists and its sidecar manifest records the same hash."""
+    manifest_path = str(png_path) + CHART_MANIFEST_SUFFIX
+    if not (os.path.exists(png_path) and os.path.exists(manifest_path)):
+        return False
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('hash') == digest
+    except (OSError, ValueError):
+        return False
+
+def record_chart(png_path, digest):
+    """Writes the sidecar manifest for a freshly rendered PNG."""
+    with open(str(png_path) + CHART_MANIFEST_SUFFIX, 'w', encoding='utf-8') as f:
+        json.dump({'hash': digest, 'chart': os.path.basename(png_path)}, f, indent=2)
+
+# --- Tracing (nested timing spans, Chrome/Perfetto trace export) ---
+
+TRACE_DIRNAME = 'traces' # analysis_output/GD<N>/traces/
+MEMORY_TOP_FRAMES = 5 # DataFrames listed per memory checkpoint
+
+_active_trace = None
+_trace_lock = threading.Lock()
+_span_stack = threading.local() # Open spans of the current thread, innermost last
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far, in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024 # bytes on macOS, KiB elsewhere
+
+def current_rss_mb():
+    """Current resident memory of this process in MiB (the peak where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return peak_rss_mb()
+
+def start_trace(name, memory=False):
+    """
+    Starts recording trace_span timings for this process (replacing any active trace).
+    Until then, and after stop_trace, trace_span is a no-op.
+
+    With ``memory``, each span also records the process RSS and the peak of Python
+    allocations (tracemalloc) while it was open, and memory_checkpoint lists the
+    largest DataFrames. tracemalloc slows allocation-heavy code down 2-3x, so use
+    this to attribute memory, not for timings.
+    """
+    global _active_trace
+    _active_trace = {'name': name, 'start': time.perf_counter(), 'events': [], 'threads': {},
+                     'memory': memory, 'open': [], 'checkpoints': [], 'counters': []}
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _active_trace['stop_tracemalloc'] = True
+
+def _fold_traced_peak(trace):
+    """
+    Credits the tracemalloc peak since the last reset to every open span, then
+    resets it. Called (under _trace_lock) whenever a span opens or closes, so each
+    span's peak covers exactly the time it was open.
+    """
+    current, peak = tracemalloc.get_traced_memory()
+    for span in trace['open']:
+        span['traced_peak'] = max(span['traced_peak'], peak)
+    tracemalloc.reset_peak()
+    trace['counters'].append({'name': 'memory', 'ph': 'C', 'pid': os.getpid(), 'tid': 0,
+                              'ts': (time.perf_counter() - trace['start']) * 1e6,
+                              'args': {'rss_mb': round(current_rss_mb(), 1), 'traced_mb': round(current / 2**20, 1)}})
+    return current
+
+@contextmanager
+def trace_span(name, category='analysis', **args):
+    """
+    Times the enclosed block as a span of the active trace. Spans nest per thread;
+    the time not spent in child spans is the span's self time.
+
+    Yields a dict of span arguments; set span['rows'] to the number of rows the block
+    processed to get a rows/s figure in the summary. Other keys are shown in the
+    trace viewer.
+
+    Example:
+        with trace_span("load binary", category="load") as span:
+            df = pd.read_csv(path)
+            span['rows'] = len(df)
+    """
+    trace = _active_trace
+    if trace is None:
+        yield dict(args)
+        return
+    stack = getattr(_span_stack, 'spans', None)
+    if stack is None:
+        stack = _span_stack.spans = []
+    span = {'name': name, 'args': dict(args), 'children_s': 0.0}
+    if trace['memory']:
+        with _trace_lock:
+            span['traced_start'] = _fold_traced_peak(trace)
+            span['traced_peak'] = span['traced_start']
+            span['peak_rss_start'] = peak_rss_mb()
+            trace['open'].append(span)
+    stack.append(span)
+    start = time.perf_counter()
+    try:
+        yield span['args']
+    finally:
+        elapsed = time.perf_counter() - start
+        stack.pop()
+        if stack:
+            stack[-1]['children_s'] += elapsed
+        thread = threading.current_thread()
+        with _trace_lock:
+            tid = trace['threads'].setdefault(thread.ident, (len(trace['threads']) + 1, thread.name))[0]
+            event = {
+                'name': name, 'cat': category, 'ph': 'X', 'pid': os.getpid(), 'tid': tid,
+                'ts': (start - trace['start']) * 1e6, 'dur': elapsed * 1e6,
+                'args': {key: value if isinstance(value, (int, float, str, bool)) or value is None else str(value)
+                         for key, value in span['args'].items()},
+                'self_s': elapsed - span['children_s'],
+            }
+            if trace['memory']:
+                traced_end = _fold_traced_peak(trace)
+                trace['open'].remove(span)
+                peak_rss = peak_rss_mb()
+                event['memory'] = {
+                    'rss_mb': current_rss_mb(),
+                    'peak_rss_mb': peak_rss,
+                    'peak_rss_increase_mb': peak_rss - span['peak_rss_start'],
+                    'traced_peak_mb': span['traced_peak'] / 2**20,
+                    'traced_growth_mb': (traced_end - span['traced_start']) / 2**20,
+                }
+            trace['events'].append(event)
+
+def _add_dataframe_names(names, variables, prefix=''):
+    """Adds id() -> name for the DataFrames (or tuples/lists of them) in a dict of variables."""
+    for var_name, value in variables.items():
+        var_name = f"{prefix}{var_name}"
+        if isinstance(value, pd.DataFrame):
+            names.setdefault(id(value), var_name)
+        elif isinstance(value, (tuple, list)):
+            for i, item in enumerate(value):
+                if isinstance(item, pd.DataFrame):
+                    names.setdefault(id(item), f"{var_name}[{i}]")
+
+def _dict_key_of(obj):
+    """String key under which a dict refers to ``obj``, or None."""
+    for referrer in gc.get_referrers(obj):
+        if isinstance(referrer, dict):
+            for key, value in referrer.items():
+                if value is obj and isinstance(key, str):
+                    return key
+    return None
+
+def _referrer_name(df):
+    """
+    Name of a DataFrame held in a dict (e.g. a SharedInputs cache): its key, or '<unnamed>'.
+    A DataFrame inside a tuple or list stored in a dict (e.g. a GDDataset's
+    name -> (DataFrame, columns) cache) is named after that dict key.
+    """
+    key = _dict_key_of(df)
+    if key is not None:
+        return key
+    for referrer in gc.get_referrers(df):
+        if isinstance(referrer, (tuple, list)):
+            key = _dict_key_of(referrer)
+            if key is not None:
+                return key
+    return '<unnamed>'
+
+def memory_checkpoint(label, names=None, top_n=MEMORY_TOP_FRAMES):
+    """
+    Records the process RSS and the ``top_n`` largest live DataFrames (by
+    memory_usage(deep=True)) in the active memory trace; a no-op otherwise.
+
+    DataFrames are named after the keys of ``names`` (a dict of name -> object,
+    e.g. a stage's artifacts), the local variables holding them in the calling
+    functions, or the key of a dict holding them. DataFrames sharing data are each
+    counted in full.
+    """
+    trace = _active_trace
+    if trace is None or not trace['memory']:
+        return
+    with trace_span("memory checkpoint", category="profiler", label=label):
+        frame_names = {}
+        _add_dataframe_names(frame_names, names or {})
+        frame = sys._getframe(1)
+        while frame is not None:
+            _add_dataframe_names(frame_names, frame.f_locals, prefix=f"{frame.f_code.co_name}.")
+            frame = frame.f_back
+        frames = [obj for obj in gc.get_objects() if isinstance(obj, pd.DataFrame)]
+        sizes = sorted(((int(df.memory_usage(deep=True).sum()), df) for df in frames), key=lambda item: item[0], reverse=True)
+    stack = getattr(_span_stack, 'spans', None) or []
+    checkpoint = {
+        'label': label,
+        'span': stack[-1]['name'] if stack else None,
+        'time_s': round(time.perf_counter() - trace['start'], 3),
+        'rss_mb': round(current_rss_mb(), 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'traced_mb': round(tracemalloc.get_traced_memory()[0] / 2**20, 1),
+        'dataframes_mb': round(sum(size for size, _ in sizes) / 2**20, 1),
+        'top_dataframes': [{'name': frame_names.get(id(df)) or _referrer_name(df), 'rows': len(df), 'columns': len(df.columns),
+                            'memory_mb': round(size / 2**20, 1)} for size, df in sizes[:top_n]],
+    }
+    del frames, sizes
+    with _trace_lock:
+        trace['checkpoints'].append(checkpoint)
+    largest = checkpoint['top_dataframes'][0] if checkpoint['top_dataframes'] else None
+    logging.info(f"[memory] {label}: RSS {checkpoint['rss_mb']:,.0f} MiB, DataFrames {checkpoint['dataframes_mb']:,.0f} MiB"
+                 + (f", largest {largest['name']} {largest['memory_mb']:,.0f} MiB" if largest else ""))
+
+def summarize_trace(events):
+    """
+    Aggregates trace events by span name: call count, total and self seconds, mean
+    seconds per call, and rows and rows/s for spans that record a row count.
+    Sorted by self time, so the top rows are where the time actually went.
+
+    For memory traces, adds the largest process peak RSS and tracemalloc peak seen
+    at the end of / during the span, and how much the span raised the process peak
+    RSS (the spans with the largest increase are the ones that set the peak).
+    """
+    rows = [{'span': event['name'], 'category': event['cat'], 'total_s': event['dur'] / 1e6,
+             'self_s': event['self_s'], 'rows': event['args'].get('rows'), **event.get('memory', {})}
+            for event in events]
+    columns = ['span', 'category', 'calls', 'total_s', 'self_s', 'mean_s', 'rows', 'rows_per_s']
+    if not rows:
+        return pd.DataFrame(columns=columns)
+    df = pd.DataFrame(rows)
+    df['rows'] = pd.to_numeric(df['rows'], errors='coerce')
+    aggregations = dict(calls=('total_s', 'size'), total_s=('total_s', 'sum'), self_s=('self_s', 'sum'),
+                        rows=('rows', lambda rows: rows.sum(min_count=1)))
+    if 'peak_rss_mb' in df.columns:
+        aggregations.update(peak_rss_mb=('peak_rss_mb', 'max'), peak_rss_increase_mb=('peak_rss_increase_mb', 'sum'),
+                            traced_peak_mb=('traced_peak_mb', 'max'), traced_growth_mb=('traced_growth_mb', 'sum'))
+        columns += ['peak_rss_mb', 'peak_rss_increase_mb', 'traced_peak_mb', 'traced_growth_mb']
+    summary = df.groupby(['span', 'category'], sort=False).agg(**aggregations).reset_index()
+    summary['mean_s'] = summary['total_s'] / summary['calls']
+    summary['rows_per_s'] = (summary['rows'] / summary['total_s']).where(summary['total_s'] > 0)
+    return summary[columns].sort_values('self_s', ascending=False, ignore_index=True)
+
+def stop_trace(output_dir):
+    """
+    Ends the active trace and writes it to ``output_dir``:
+      - <name>_<timestamp>.trace.json: Chrome trace event format; open it in
+        https://ui.perfetto.dev or chrome://tracing
+      - <name>_<timestamp>_summary.csv: per-span totals (see summarize_trace)
+      - <name>_<timestamp>_memory.json: for memory traces, the memory checkpoints
+    and prints the summary table.
+
+    Returns:
+        tuple: (trace JSON path, summary CSV path), or None if no trace was active.
+    """
+    global _active_trace
+    trace, _active_trace = _active_trace, None
+    if trace is None:
+        return None
+    if trace.get('stop_tracemalloc'):
+        tracemalloc.stop()
+    os.makedirs(output_dir, exist_ok=True)
+    base_path = os.path.join(output_dir, f"{trace['name']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+    trace_path, summary_path = base_path + '.trace.json', base_path + '_summary.csv'
+
+    pid = os.getpid()
+    metadata = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': trace['name']}}]
+    metadata += [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': thread_name}}
+                 for tid, thread_name in trace['threads'].values()]
+    events = [{**{key: value for key, value in event.items() if key not in ('self_s', 'memory')},
+               'args': {**event['args'], **{key: round(value, 1) for key, value in event.get('memory', {}).items()}}}
+              for event in trace['events']]
+    with open(trace_path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': metadata + events + trace['counters'], 'displayTimeUnit': 'ms'}, f)
+
+    summary = summarize_trace(trace['events'])
+    summary.to_csv(summary_path, index=False, float_format='%.4f')
+    wall_s = time.perf_counter() - trace['start']
+    print(f"\n--- Trace summary: {trace['name']} ({wall_s:.2f}s wall) ---")
+    if summary.empty:
+        print("No spans recorded.")
+    else:
+        print(summary.to_string(index=False, na_rep='-', float_format=lambda value: f"{value:,.3f}",
+                                formatters={'rows': lambda value: f"{value:,.0f}",
+                                            'rows_per_s': lambda value: f"{value:,.0f}"}))
+    print(f"Trace written to {trace_path} (open in https://ui.perfetto.dev)")
+    logging.info(f"Trace summary written to {summary_path}")
+
+    if trace['memory']:
+        memory_path = base_path + '_memory.json'
+        with open(memory_path, 'w', encoding='utf-8') as f:
+            json.dump({'name': trace['name'], 'peak_rss_mb': round(peak_rss_mb(), 1),
+                       'checkpoints': trace['checkpoints']}, f, indent=2)
+        print(f"\n--- Memory checkpoints (process peak RSS {peak_rss_mb():,.0f} MiB) ---")
+        for checkpoint in trace['checkpoints']:
+            print(f"{checkpoint['label']}: RSS {checkpoint['rss_mb']:,.0f} MiB, "
+                  f"DataFrames {checkpoint['dataframes_mb']:,.0f} MiB")
+            for frame in checkpoint['top_dataframes']:
+                print(f"    {frame['memory_mb']:>10,.1f} MiB  {frame['name']} ({frame['rows']:,} x {frame['columns']})")
+        print(f"Memory checkpoints written to {memory_path}")
+    return trace_path, summary_path
@@ -0,0 +1,328 @@
+import importlib.util
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from lib.analysis_utils import load_long_tag_tables, trace_span, lazy_import, THOUGHT_TAGS_FILENAME, TAG_DICTIONARY_FILENAME
+
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+pa = lazy_import('pyarrow')
+pa_csv = lazy_import('pyarrow.csv')
+
+# --- Lazily loaded, memoized GD input tables ---
+
+REMESH_TIMESTAMP_FORMAT = '%B %d, %Y at %I:%M %p (GMT)'
+
+# Table name -> how to read it. 'path' is relative to Data/GD<N>/ ({gd} is the GD number);
+# 'read_csv' holds the reader's keyword arguments, 'timestamps' the Remesh timestamp columns
+# to parse, and 'clean_columns' strips stray BOMs and whitespace from the header. 'arrow'
+# marks plain CSVs the Arrow reader can read (see GDDataset's csv_reader).
+TABLES = {
+    'aggregate': {'path': 'GD{gd}_aggregate_standardized.csv', 'read_csv': {'low_memory': False}, 'arrow': True},
+    'segment_counts': {'path': 'GD{gd}_segment_counts_by_question.csv', 'read_csv': {}, 'arrow': True},
+    'binary_votes': {'path': 'GD{gd}_binary.csv', 'read_csv': {'quotechar': '"', 'low_memory': False},
+                     'timestamps': ['Timestamp'], 'arrow': True},
+    'preference_votes': {'path': 'GD{gd}_preference.csv', 'read_csv': {'quotechar': '"', 'low_memory': False},
+                         'timestamps': ['Timestamp'], 'arrow': True},
+    'verbatim_map': {'path': 'GD{gd}_verbatim_map.csv', 'read_csv': {'quotechar': '"', 'engine': 'python'},
+                     'arrow': True},
+    'thought_labels': {'path': os.path.join('tags', 'all_thought_labels.csv'),
+                       'read_csv': {'encoding': 'utf-8-sig', 'dtype': str}, 'arrow': True},
+    'participants': {'path': 'GD{gd}_participants.csv', 'read_csv': {'encoding': 'utf-8-sig', 'low_memory': False},
+                     'clean_columns': True},
+    'discussion_guide': {'path': 'GD{gd}_discussion_guide.csv',
+                         'read_csv': {'encoding': 'utf-8-sig', 'on_bad_lines': 'warn'}, 'clean_columns': True},
+    # JSON list of record lists (see download_embeddings.py); always parsed whole
+    'embeddings': {'path': 'GD{gd}_embeddings.json'},
+    # Long-format tags, read together by load_long_tag_tables (which can also build them
+    # from the wide combined files when these don't exist yet)
+    'thought_tags': {'path': os.path.join('tags', THOUGHT_TAGS_FILENAME)},
+    'tag_dictionary': {'path': os.path.join('tags', TAG_DICTIONARY_FILENAME)},
+}
+TAG_TABLES = ('thought_tags', 'tag_dictionary')
+CSV_READERS = ('arrow', 'pandas')
+
+def arrow_csv_available():
+    """Whether pyarrow is installed, for the multithreaded Arrow CSV reader."""
+    return importlib.util.find_spec('pyarrow') is not None
+
+def _clean_column_name(name):
+    return str(name).lstrip('\ufeff').strip()
+
+def _table_property(name):
+    return property(lambda self: self.table(name),
+                    doc=f"The {name} table, read on first access (see GDDataset.table).")
+
+class GDDataset:
+    """
+    One GD's input tables, each read from disk on first use and then kept in memory.
+
+    Scripts take a dataset instead of reading the CSVs themselves, so a notebook session
+    or a pipeline run parses each file once however many analyses use it:
+
+        ds = GDDataset(3)
+        ds.binary_votes                                            # whole table
+        ds.table('thought_labels', columns=['Question ID', 'Participant ID'])
+        ds.evict('binary_votes')                                   # free it
+        ds.preload(['binary_votes', 'verbatim_map'])               # read several files at once
+
+    Args:
+        gd_number (int): Global Dialogue cadence number (may be None if every table used
+            has an explicit path).
+        data_dir (str): Base data directory containing GD<N>/.
+        paths (dict, optional): Table name -> file path, overriding the default location.
+        columns (dict, optional): Table name -> columns to load when no columns are asked
+            for, so properties load only those (e.g. {'binary_votes': ['Participant ID', 'Vote']}).
+        csv_reader (str, optional): 'arrow' reads the plain CSVs with pyarrow's multithreaded
+            reader, which releases the GIL, so preload() reads files truly in parallel;
+            'pandas' uses pandas' own parsers. Defaults to 'arrow' if pyarrow is installed.
+            A file the Arrow reader fails on is read with pandas instead.
+
+    Tables are shared between callers: each call returns a shallow copy, so adding or
+    replacing columns is safe, but copy() before modifying values in place. Tables are
+    loaded thread-safely, each at most once until evicted.
+    """
+    aggregate = _table_property('aggregate')
+    segment_counts = _table_property('segment_counts')
+    binary_votes = _table_property('binary_votes')
+    preference_votes = _table_property('preference_votes')
+    verbatim_map = _table_property('verbatim_map')
+    thought_labels = _table_property('thought_labels')
+    thought_tags = _table_property('thought_tags')
+    tag_dictionary = _table_property('tag_dictionary')
+    participants = _table_property('participants')
+    discussion_guide = _table_property('discussion_guide')
+    embeddings = _table_property('embeddings')
+
+    def __init__(self, gd_number=None, data_dir="Data", paths=None, columns=None, csv_reader=None):
+        if csv_reader is None:
+            csv_reader = 'arrow' if arrow_csv_available() else 'pandas'
+        elif csv_reader not in CSV_READERS:
+            raise ValueError(f"Unknown CSV reader {csv_reader!r}; expected one of {CSV_READERS}")
+        elif csv_reader == 'arrow' and not arrow_csv_available():
+            raise ValueError("The arrow CSV reader needs pyarrow (pip install pyarrow)")
+        self.gd_number = gd_number
+        self.csv_reader = csv_reader
+        self.data_dir = str(data_dir)
+        self._paths = {name: str(path) for name, path in (paths or {}).items()}
+        self._default_columns = dict(columns or {})
+        unknown = (set(self._paths) | set(self._default_columns)) - set(TABLES)
+        if unknown:
+            raise ValueError(f"Unknown GD tables: {sorted(unknown)}")
+        self._tables = {} # name -> (DataFrame, loaded columns or None for all)
+        self._file_stats = {} # name -> (size, mtime_ns) of its file when loaded
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"GDDataset(gd_number={self.gd_number!r}, cached={sorted(self._tables)})"
+
+    def path(self, name):
+        """Path of a table's file."""
+        if name not in TABLES:
+            raise ValueError(f"Unknown GD table {name!r}; expected one of {sorted(TABLES)}")
+        if name in self._paths:
+            return self._paths[name]
+        if self.gd_number is None:
+            raise ValueError(f"No GD number or explicit path for the {name} table")
+        return os.path.join(self.data_dir, f"GD{self.gd_number}", TABLES[name]['path'].format(gd=self.gd_number))
+
+    def exists(self, name):
+        return os.path.exists(self.path(name))
+
+    def table(self, name, columns=None):
+        """
+        Returns a table, reading its file on first use.
+
+        Args:
+            name (str): Table name (one of TABLES).
+            columns (list, optional): Columns to load and return. Defaults to the columns
+                given for this table to the constructor, else all. Asking later for columns
+                that were not loaded re-reads the file for all of them at once.
+
+        Returns:
+            pd.DataFrame: Shallow copy of the cached table (see the class docstring).
+
+        Raises:
+            FileNotFoundError: If the table's file does not exist.
+        """
+        if columns is None:
+            columns = self._default_columns.get(name)
+        columns = list(columns) if columns is not None else None
+        lock_name = 'tags' if name in TAG_TABLES else name
+        with self._lock:
+            lock = self._locks.setdefault(lock_name, threading.Lock())
+        with lock:
+            cached = self._tables.get(name)
+            if cached is None or not self._covers(cached[1], columns):
+                to_load = columns
+                if cached is not None and cached[1] is not None and columns is not None:
+                    to_load = cached[1] + [col for col in columns if col not in cached[1]]
+                self._load(name, to_load)
+            df = self._tables[name][0]
+        if columns is not None:
+            missing = [col for col in columns if col not in df.columns]
+            if missing:
+                raise KeyError(f"Columns {missing} not found in the {name} table ({self.path(name)})")
+            return df[columns]
+        return df.copy(deep=False)
+
+    def preload(self, tables=None, workers=None):
+        """
+        Reads several tables at once on a thread pool, so their files are parsed
+        concurrently rather than one after another. Tables already cached are skipped.
+
+        Args:
+            tables (list or dict, optional): Table names, or table name -> columns to load
+                (None for the default columns). Defaults to every table whose file exists.
+            workers (int, optional): Threads to use. Defaults to one per table.
+
+        Returns:
+            dict: Table name -> exception, for the tables that failed to load. Failures are
+                not raised here: accessing the table afterwards retries the read and raises.
+        """
+        if tables is None:
+            tables = [name for name in TABLES if self.exists(name)]
+        if not isinstance(tables, dict):
+            tables = dict.fromkeys(tables)
+        # The tag tables are read together, so one task loads both
+        pending = {}
+        for name, columns in tables.items():
+            key = 'tags' if name in TAG_TABLES else name
+            if key not in pending:
+                pending[key] = (name, columns)
+        if not pending:
+            return {}
+
+        failures = {}
+        with trace_span("preload tables", category="io", tables=len(pending)):
+            with ThreadPoolExecutor(max_workers=workers or len(pending), thread_name_prefix='gd-load') as executor:
+                futures = {name: executor.submit(self.table, name, columns) for name, columns in pending.values()}
+            for name, future in futures.items():
+                error = future.exception()
+                if error is not None:
+                    logging.debug(f"Preloading {name} failed: {error}")
+                    failures[name] = error
+        return failures
+
+    @staticmethod
+    def _covers(loaded, requested):
+        if loaded is None:
+            return True
+        return requested is not None and all(col in loaded for col in requested)
+
+    def _load(self, name, columns):
+        path = self.path(name)
+        if name in TAG_TABLES:
+            self._load_tag_tables()
+            return
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{name} file not found: {path}")
+        with trace_span(f"read {name}", category="io") as span:
+            if name == 'embeddings':
+                df = self._read_embeddings(path)
+            else:
+                df = self._read_csv(name, path, columns)
+            span['rows'] = len(df)
+        self._tables[name] = (df, None if name == 'embeddings' else columns)
+        self._file_stats[name] = self._stat(name)
+        logging.info(f"Loaded {name} from {path}: {df.shape[0]} rows, {df.shape[1]} columns")
+
+    def _load_tag_tables(self):
+        tags_dir = os.path.dirname(self.path('thought_tags'))
+        with trace_span("read tag tables", category="io") as span:
+            tables = load_long_tag_tables(tags_dir)
+            if tables[0] is None:
+                raise FileNotFoundError(f"No tag tables found in {tags_dir}")
+            span['rows'] = len(tables[0])
+        for name, df in zip(TAG_TABLES, tables):
+            self._tables[name] = (df, None)
+            self._file_stats[name] = self._stat(name)
+
+    def _stat(self, name):
+        try:
+            stat = os.stat(self.path(name))
+            return (stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            return None
+
+    def _read_csv(self, name, path, columns):
+        spec = TABLES[name]
+        df = None
+        if self.csv_reader == 'arrow' and spec.get('arrow'):
+            try:
+                df = self._read_csv_arrow(spec, path, columns)
+            except Exception as e:
+                logging.warning(f"Arrow CSV reader failed on {path} ({e}); reading it with pandas")
+        if df is None:
+            kwargs = dict(spec['read_csv'])
+            if columns is not None:
+                wanted = set(columns)
+                kwargs['usecols'] = lambda col: _clean_column_name(col) in wanted
+            df = pd.read_csv(path, **kwargs)
+        if spec.get('clean_columns'):
+            df.columns = [_clean_column_name(col) for col in df.columns]
+        for col in spec.get('timestamps', []):
+            if col in df.columns:
+                df[col] = pd.to_datetime(df[col], format=REMESH_TIMESTAMP_FORMAT, errors='coerce')
+        return df
+
+    @staticmethod
+    def _read_csv_arrow(spec, path, columns):
+        """
+        Reads a CSV with pyarrow's multithreaded reader and converts it to the DataFrame
+        pandas.read_csv would return: all-empty columns as float NaN, missing strings as NaN.
+        """
+        convert_options = {'strings_can_be_null': True}
+        if columns is not None:
+            convert_options['include_columns'] = list(columns)
+        if spec['read_csv'].get('dtype') is str:
+            header = pa_csv.open_csv(path).schema.names
+            convert_options['column_types'] = {col: pa.string() for col in header}
+        table = pa_csv.read_csv(path, parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+                                convert_options=pa_csv.ConvertOptions(**convert_options))
+        if len(set(table.column_names)) != len(table.column_names):
+            raise ValueError("duplicate column names") # pandas renames these ('X.1'); let it
+        table = table.cast(pa.schema([field.with_type(pa.float64()) if pa.types.is_null(field.type) else field
+                                      for field in table.schema]))
+        # split_blocks/self_destruct hand each Arrow buffer to pandas without a consolidating copy
+        df = table.to_pandas(split_blocks=True, self_destruct=True)
+        for col in df.columns[df.dtypes == object]:
+            missing = df[col].isna()
+            if missing.any():
+                df[col] = df[col].where(~missing, np.nan)
+        return df
+
+    @staticmethod
+    def _read_embeddings(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            list_of_data = json.load(f)
+        if not isinstance(list_of_data, list) or not list_of_data:
+            raise ValueError(f"Expected a non-empty list in JSON file {path}")
+        parts = []
+        for i, data_item in enumerate(list_of_data):
+            try:
+                parts.append(pd.DataFrame(data_item))
+            except ValueError as e:
+                logging.warning(f"Could not convert item {i} of {path} into a DataFrame: {e}")
+        if not parts:
+            raise ValueError(f"No valid DataFrames could be created from {path}")
+        return pd.concat(parts, ignore_index=True)
+
+    def cached(self):
+        """Table name -> (rows, columns) of every table currently in memory."""
+        return {name: df.shape for name, (df, _) in self._tables.items()}
+
+    def stale_tables(self):
+        """Names of the cached tables whose file changed on disk since it was read."""
+        return [name for name, loaded_stat in list(self._file_stats.items()) if self._stat(name) != loaded_stat]
+
+    def evict(self, *names):
+        """Drops the given tables (all if none are given) from memory; they are re-read on next use."""
+        with self._lock:
+            for name in names or list(self._tables):
+                for evicted in (TAG_TABLES if name in TAG_TABLES else (name,)):
+                    self._tables.pop(evicted, None)
+                    self._file_stats.pop(evicted, None)
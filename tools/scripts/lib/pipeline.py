@@ -0,0 +1,318 @@
+import json
+import logging
+import os
+import threading
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from lib.analysis_utils import file_fingerprint, file_sha256, trace_span, memory_checkpoint
+
+# --- In-process DAG runner for the analysis pipeline ---
+
+PIPELINE_MANIFEST_FILENAME = 'pipeline_manifest.json'
+PIPELINE_MANIFEST_VERSION = 1
+
+class Stage:
+    """
+    One step of the pipeline.
+
+    Args:
+        name (str): Stage name used in log messages and the manifest.
+        func (callable): Called with one keyword argument per input artifact; returns a
+            dict holding its output artifacts (or None if it declares no outputs).
+        inputs (list): Names of the artifacts the stage reads.
+        outputs (list): Names of the artifacts the stage produces.
+        input_files (list): Names of input artifacts holding a file path (or a list of
+            paths) whose contents determine the stage's results.
+        output_files (list): Files or directories the stage writes.
+        params (dict): Parameters the stage runs with.
+        sources (list): Source files implementing the stage (its "script version").
+
+    A stage with any of input_files/output_files/sources is fingerprinted: it is
+    skipped when its input files, sources and params match the last successful run
+    and its output files still exist.
+    """
+    def __init__(self, name, func, inputs=(), outputs=(), input_files=(), output_files=(), params=None, sources=()):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.input_files = list(input_files)
+        self.output_files = [str(path) for path in output_files]
+        self.params = params or {}
+        self.sources = [str(path) for path in sources]
+
+    @property
+    def fingerprinted(self):
+        return bool(self.input_files or self.output_files or self.sources)
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, inputs={self.inputs}, outputs={self.outputs})"
+
+class SharedInputs:
+    """Loads each shared input at most once, even when several stages ask for it concurrently."""
+    def __init__(self):
+        self._values = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, loader):
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in self._values:
+                self._values[key] = loader()
+            return self._values[key]
+
+def _check_dag(stages, available):
+    """
+    Raises ValueError if an input is never produced, an output is produced twice, or
+    stages form a cycle. Returns the stages in a valid execution order.
+    """
+    producers = {}
+    for stage in stages:
+        for name in stage.outputs:
+            if name in producers or name in available:
+                raise ValueError(f"Artifact '{name}' is produced by more than one stage ({stage.name})")
+            producers[name] = stage.name
+    for stage in stages:
+        missing = [name for name in stage.inputs if name not in producers and name not in available]
+        if missing:
+            raise ValueError(f"Stage '{stage.name}' needs {missing}, which no stage produces")
+        not_inputs = [name for name in stage.input_files if name not in stage.inputs]
+        if not_inputs:
+            raise ValueError(f"Stage '{stage.name}' fingerprints {not_inputs}, which are not among its inputs")
+
+    # Kahn's algorithm: every stage must become runnable at some point
+    done = set(available)
+    remaining = list(stages)
+    order = []
+    while remaining:
+        ready = [stage for stage in remaining if all(name in done for name in stage.inputs)]
+        if not ready:
+            raise ValueError(f"Pipeline has a dependency cycle between: {[stage.name for stage in remaining]}")
+        for stage in ready:
+            done.update(stage.outputs)
+            remaining.remove(stage)
+            order.append(stage)
+    return order
+
+# --- Fingerprint manifest ---
+
+def load_pipeline_manifest(manifest_path):
+    """Loads the per-stage fingerprint records, or {} if missing, unreadable or outdated."""
+    if not manifest_path or not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Could not read pipeline manifest {manifest_path}: {e}")
+        return {}
+    if manifest.get('version') != PIPELINE_MANIFEST_VERSION:
+        return {}
+    return manifest.get('stages', {})
+
+def save_pipeline_manifest(manifest_path, records):
+    """Writes the per-stage fingerprint records."""
+    os.makedirs(os.path.dirname(manifest_path) or '.', exist_ok=True)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': PIPELINE_MANIFEST_VERSION, 'stages': records}, f, indent=2, sort_keys=True)
+
+def _file_paths(value):
+    if value is None:
+        return []
+    if isinstance(value, (str, os.PathLike)):
+        return [str(value)]
+    return [str(path) for path in value]
+
+def stage_fingerprint(stage, artifacts, previous=None):
+    """
+    Fingerprints a stage's input files, sources and params.
+
+    File hashes are reused from ``previous`` (the stage's last manifest record) when a
+    file's size and mtime are unchanged.
+
+    Returns:
+        dict: {'fingerprint', 'files', 'sources', 'params'}; missing files map to None.
+    """
+    previous_files = (previous or {}).get('files', {})
+    files = {}
+    for name in stage.input_files:
+        for path in _file_paths(artifacts.get(name)):
+            files[path] = file_fingerprint(path, previous_files.get(path)) if os.path.isfile(path) else None
+    sources = {path: file_sha256(path) for path in stage.sources}
+    params = json.loads(json.dumps(stage.params, sort_keys=True, default=str))
+
+    digest = hashlib.sha256()
+    digest.update(json.dumps({
+        'files': {path: fp['sha256'] if fp else None for path, fp in files.items()},
+        'sources': sources,
+        'params': params,
+    }, sort_keys=True).encode('utf-8'))
+    return {'fingerprint': digest.hexdigest(), 'files': files, 'sources': sources, 'params': params}
+
+def rerun_reasons(stage, record, previous):
+    """Explains why a stage must rerun; an empty list means it is up to date."""
+    if not previous:
+        return ["no previous run recorded"]
+    reasons = []
+    previous_files = previous.get('files', {})
+    for path, fp in record['files'].items():
+        # Optional inputs may be absent; only a change in presence or content counts
+        sha = fp['sha256'] if fp else None
+        previous_sha = (previous_files.get(path) or {}).get('sha256')
+        if path not in previous_files:
+            reasons.append(f"new input: {path}")
+        elif sha != previous_sha:
+            reasons.append(f"input {'removed' if sha is None else 'added' if previous_sha is None else 'changed'}: {path}")
+    reasons += [f"input no longer used: {path}" for path in previous_files if path not in record['files']]
+    previous_sources = previous.get('sources', {})
+    reasons += [f"script changed: {path}" for path, sha in record['sources'].items() if previous_sources.get(path) != sha]
+    previous_params = previous.get('params', {})
+    for key in sorted(set(record['params']) | set(previous_params)):
+        if record['params'].get(key) != previous_params.get(key):
+            reasons.append(f"parameter changed: {key} ({previous_params.get(key)!r} -> {record['params'].get(key)!r})")
+    reasons += [f"output missing: {path}" for path in stage.output_files if not os.path.exists(path)]
+    return reasons
+
+def _recordable(value):
+    """Artifact values kept in the manifest (so a skipped stage can still publish them)."""
+    if isinstance(value, os.PathLike):
+        value = str(value)
+    return value if isinstance(value, (str, int, float, bool)) or value is None else None
+
+def _execute(stage, kwargs, artifacts, previous, force):
+    """Runs one stage (in a worker thread), unless its fingerprint shows it is up to date."""
+    start = time.perf_counter()
+    record, reasons = None, []
+    if stage.fingerprinted:
+        record = stage_fingerprint(stage, artifacts, previous)
+        reasons = ["forced"] if force else rerun_reasons(stage, record, previous)
+        if not reasons:
+            return 'skipped', dict(previous.get('artifacts', {})), 0.0, record, reasons
+    with trace_span(stage.name, category='stage'):
+        result = stage.func(**kwargs)
+    elapsed = time.perf_counter() - start
+    memory_checkpoint(f"after stage {stage.name}", names={**kwargs, **(result or {})})
+    return 'ran', result, elapsed, record, reasons
+
+# --- Runner ---
+
+def run_pipeline(stages, artifacts=None, max_workers=4, manifest_path=None, force=False):
+    """
+    Runs the stages as soon as their inputs are available, up to ``max_workers`` at a
+    time, in threads of this process. Artifacts (DataFrames, paths, ...) are passed
+    between stages in memory; stages must not modify the inputs they are given.
+
+    Fingerprinted stages (see Stage) are skipped when nothing they depend on changed
+    since their last successful run recorded in ``manifest_path``; ``force`` reruns
+    everything. A skipped stage publishes the artifacts recorded for it in the
+    manifest (plain values such as paths), and None for the rest.
+
+    When a stage fails, no new stages are started; stages already running finish.
+
+    Args:
+        stages (list): Stage objects, in any order.
+        artifacts (dict, optional): Artifacts available before the first stage runs.
+        max_workers (int): Maximum number of stages running concurrently.
+        manifest_path (str, optional): Fingerprint manifest (None disables skipping).
+        force (bool): Rerun every stage regardless of fingerprints.
+
+    Returns:
+        tuple: (artifacts dict, list of failed stage names)
+    """
+    artifacts = dict(artifacts or {})
+    _check_dag(stages, artifacts)
+    records = load_pipeline_manifest(manifest_path)
+    if manifest_path is None:
+        force = True
+
+    pending = list(stages)
+    running = {}
+    failed = []
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='stage') as executor:
+        while pending or running:
+            if not failed:
+                for stage in [s for s in pending if all(name in artifacts for name in s.inputs)]:
+                    kwargs = {name: artifacts[name] for name in stage.inputs}
+                    future = executor.submit(_execute, stage, kwargs, dict(artifacts), records.get(stage.name), force)
+                    running[future] = stage
+                    pending.remove(stage)
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage = running.pop(future)
+                try:
+                    status, result, elapsed, record, reasons = future.result()
+                except Exception as e:
+                    logging.error(f"--- Stage {stage.name} failed: {e} ---", exc_info=True)
+                    failed.append(stage.name)
+                    continue
+                result = result or {}
+                if status == 'skipped':
+                    artifacts.update({name: result.get(name) for name in stage.outputs})
+                    logging.info(f"--- Stage {stage.name} up to date, skipped ---")
+                    continue
+
+                missing = [name for name in stage.outputs if name not in result]
+                if missing:
+                    logging.error(f"--- Stage {stage.name} did not produce {missing} ---")
+                    failed.append(stage.name)
+                    continue
+                artifacts.update({name: result[name] for name in stage.outputs})
+                why = f" ({'; '.join(reasons)})" if reasons else ""
+                logging.info(f"--- Stage {stage.name} completed in {elapsed:.1f}s{why} ---")
+
+                if record is not None and manifest_path:
+                    record['artifacts'] = {name: _recordable(result[name]) for name in stage.outputs}
+                    record['outputs'] = stage.output_files
+                    record['completed_at'] = datetime.now().isoformat(timespec='seconds')
+                    records[stage.name] = record
+                    save_pipeline_manifest(manifest_path, records)
+
+    if pending:
+        logging.warning(f"Skipped stages after failure: {[stage.name for stage in pending]}")
+    return artifacts, failed
+
+def explain_pipeline(stages, artifacts=None, manifest_path=None, force=False):
+    """
+    Dry run: reports which stages would run and why, without running anything.
+
+    Downstream stages are compared against the files as they are now; a stage whose
+    upstream would rerun is reported as possibly rerunning, since its inputs may change.
+
+    Returns:
+        list: (stage name, will_run (True/False/None for "may"), list of reasons) tuples.
+    """
+    artifacts = dict(artifacts or {})
+    order = _check_dag(stages, artifacts)
+    records = load_pipeline_manifest(manifest_path)
+    producers = {name: stage.name for stage in stages for name in stage.outputs}
+
+    plan = []
+    rerunning = set()
+    for stage in order:
+        previous = records.get(stage.name)
+        # Values of upstream outputs as recorded by their last run (e.g. file paths)
+        for name in stage.inputs:
+            if name not in artifacts and name in producers:
+                artifacts[name] = records.get(producers[name], {}).get('artifacts', {}).get(name)
+
+        if force or manifest_path is None:
+            reasons, will_run = ["forced"], True
+        elif not stage.fingerprinted:
+            reasons, will_run = ["not fingerprinted, always runs"], True
+        else:
+            reasons = rerun_reasons(stage, stage_fingerprint(stage, artifacts, previous), previous)
+            will_run = bool(reasons)
+            upstream = sorted({producers[name] for name in stage.inputs if producers.get(name) in rerunning})
+            if upstream and not will_run:
+                reasons, will_run = [f"upstream reruns: {', '.join(upstream)} (inputs may change)"], None
+        if will_run is not False:
+            rerunning.add(stage.name)
+        plan.append((stage.name, will_run, reasons))
+    return plan
@@ -0,0 +1,224 @@
+import importlib.util
+import json
+import logging
+import os
+import re
+import sqlite3
+from lib.analysis_utils import file_fingerprint, trace_span, lazy_import
+from lib.dataset import GDDataset
+
+pd = lazy_import('pandas')
+duckdb = lazy_import('duckdb')
+
+# --- Embedded SQL over cached GD tables ---
+
+SQL_DIRNAME = 'sql' # analysis_output/GD<N>/sql/<engine>/
+SQL_MANIFEST_FILENAME = 'manifest.json'
+SQL_MANIFEST_VERSION = 1
+ENGINES = ('duckdb', 'sqlite')
+
+# Aggregate columns that describe a response; every other column is a segment's agreement
+# rate (same split as calculate_consensus.py)
+AGGREGATE_BASE_COLUMNS = ["Question ID", "Question Type", "Question", "Response", "OriginalResponse",
+                          "Star", "Categories", "Sentiment", "Submitted By", "Language", "Sample ID", "Participant ID"]
+AGGREGATE_LONG_COLUMNS = ["Question ID", "Question Type", "Question", "Response", "Participant ID"]
+
+# Joins each applied tag to its text and category
+TAGS_VIEW = """
+CREATE VIEW tags AS
+SELECT t.question_id, t.participant_id, t.tag_id, d.tag, d.category
+FROM thought_tags t JOIN tag_dictionary d ON t.tag_id = d.tag_id
+"""
+
+def sql_name(column):
+    """Column name as used in SQL: 'Question ID' -> question_id, 'PRI_Score' -> pri_score."""
+    return re.sub(r'[^0-9a-zA-Z]+', '_', str(column)).strip('_').lower()
+
+def parse_percentages(values):
+    """Vectorized parse_percentage: 'X%' -> X/100, bare numbers in (1, 100] -> /100, '-'/empty -> NaN."""
+    text = values.astype(str).str.strip()
+    numbers = pd.to_numeric(text.str.rstrip('%'), errors='coerce')
+    scaled = text.str.endswith('%') | ((numbers > 1) & (numbers <= 100))
+    numbers = numbers.where(~scaled, numbers / 100.0)
+    return numbers.where((numbers >= 0) & (numbers <= 1))
+
+def _long_aggregate(dataset):
+    df = dataset.aggregate
+    segments = [col for col in df.columns if col not in AGGREGATE_BASE_COLUMNS]
+    id_cols = [col for col in AGGREGATE_LONG_COLUMNS if col in df.columns]
+    long_df = df[id_cols + segments].melt(id_vars=id_cols, var_name='Segment', value_name='Agreement')
+    long_df['Agreement'] = parse_percentages(long_df['Agreement'])
+    return long_df.dropna(subset=['Agreement']).reset_index(drop=True)
+
+def _long_segment_counts(dataset):
+    df = dataset.segment_counts
+    segments = [col for col in df.columns if col not in ('Question ID', 'Question Text')]
+    long_df = df[['Question ID'] + segments].melt(id_vars=['Question ID'], var_name='Segment', value_name='Participants')
+    long_df['Participants'] = pd.to_numeric(long_df['Participants'], errors='coerce')
+    return long_df.dropna(subset=['Participants']).astype({'Participants': 'int64'}).reset_index(drop=True)
+
+def _pri_scores_path(gd_number, output_base_dir):
+    return os.path.join(output_base_dir, f"GD{gd_number}", "pri", f"GD{gd_number}_pri_scores.csv")
+
+# SQL table name -> (source files, builder). Sources are GDDataset table names, or a callable
+# (gd_number, output_base_dir) -> path for analysis outputs; the builder gets the dataset and
+# the source paths and returns the DataFrame to cache.
+SQL_TABLES = {
+    'aggregate': (['aggregate'], lambda ds, paths: _long_aggregate(ds)),
+    'segment_counts': (['segment_counts'], lambda ds, paths: _long_segment_counts(ds)),
+    'binary_votes': (['binary_votes'], lambda ds, paths: ds.binary_votes),
+    'preference_votes': (['preference_votes'], lambda ds, paths: ds.preference_votes),
+    'verbatim_map': (['verbatim_map'], lambda ds, paths: ds.verbatim_map),
+    'thought_tags': (['thought_tags'], lambda ds, paths: ds.thought_tags),
+    'tag_dictionary': (['tag_dictionary'], lambda ds, paths: ds.tag_dictionary),
+    'pri_scores': ([_pri_scores_path], lambda ds, paths: pd.read_csv(paths[0])),
+}
+
+def available_engines():
+    """SQL engines usable here, preferred first (duckdb only if installed)."""
+    return [engine for engine in ENGINES if engine != 'duckdb' or importlib.util.find_spec('duckdb')]
+
+class GDSQL:
+    """
+    SQL over one GD's tables, for ad-hoc questions that don't merit a script:
+
+        with GDSQL(3) as db:
+            db.query(\"\"\"
+                SELECT segment, AVG(agreement) AS agreement FROM aggregate
+                WHERE question_type = 'Ask Opinion' AND response LIKE '%jobs%'
+                  AND segment IN ('O3: Female', 'O3: Male')
+                GROUP BY segment\"\"\")
+
+    Each table is converted once into a cache under analysis_output/GD<N>/sql/<engine>/ and
+    queries run against the cache, not against DataFrames: with duckdb the tables are views
+    over Parquet files (columnar, vectorized, out-of-core); without it they live in a SQLite
+    file (Python standard library), a row store whose results are read back with pandas, so
+    that fallback is not columnar. A table is rebuilt when one of its source files changes.
+
+    Tables (column names in snake_case, e.g. question_id): aggregate (long format: one row
+    per response and segment, with agreement as 0-1), segment_counts (long format),
+    binary_votes, preference_votes, verbatim_map, thought_tags, tag_dictionary, the tags view
+    (tags joined to their text and category) and pri_scores (once calculate_pri.py has run).
+    Tables whose source files don't exist are skipped.
+
+    Args:
+        gd_number (int): Global Dialogue cadence number.
+        data_dir (str): Base data directory containing GD<N>/.
+        output_base_dir (str): Base output directory; the cache goes in GD<N>/sql/.
+        engine (str, optional): 'duckdb' or 'sqlite'. Defaults to duckdb if installed.
+        rebuild (bool): Rebuild every cached table even if its sources are unchanged.
+    """
+
+    def __init__(self, gd_number, data_dir="Data", output_base_dir="analysis_output", engine=None, rebuild=False):
+        if engine is None:
+            engine = available_engines()[0]
+            if engine != 'duckdb':
+                logging.info("duckdb is not installed; using SQLite, a row store (pip install duckdb for columnar queries)")
+        elif engine not in available_engines():
+            raise ValueError(f"SQL engine {engine!r} is not available; expected one of {available_engines()}")
+        self.gd_number = gd_number
+        self.engine = engine
+        self.output_base_dir = output_base_dir
+        self.dataset = GDDataset(gd_number, data_dir=data_dir)
+        self.cache_dir = os.path.join(output_base_dir, f"GD{gd_number}", SQL_DIRNAME, engine)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if engine == 'duckdb':
+            self.con = duckdb.connect()
+        else:
+            self.con = sqlite3.connect(os.path.join(self.cache_dir, f"GD{gd_number}.sqlite"))
+        self.tables = self._sync(rebuild)
+        self.dataset.evict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __repr__(self):
+        return f"GDSQL(gd_number={self.gd_number!r}, engine={self.engine!r}, tables={self.tables})"
+
+    def close(self):
+        self.con.close()
+
+    def query(self, sql):
+        """Runs a SQL statement and returns its result as a DataFrame."""
+        with trace_span("sql query", category="io") as span:
+            if self.engine == 'duckdb':
+                df = self.con.execute(sql).df()
+            else:
+                df = pd.read_sql_query(sql, self.con)
+            span['rows'] = len(df)
+        return df
+
+    def columns(self, table):
+        """Column names of a table or view."""
+        return list(self.query(f"SELECT * FROM {table} LIMIT 0").columns)
+
+    def _source_paths(self, sources):
+        return [source(self.gd_number, self.output_base_dir) if callable(source) else self.dataset.path(source)
+                for source in sources]
+
+    def _sync(self, rebuild):
+        """Brings every cached table up to date with its source files and registers it."""
+        manifest_path = os.path.join(self.cache_dir, SQL_MANIFEST_FILENAME)
+        manifest = {}
+        if os.path.exists(manifest_path) and not rebuild:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') != SQL_MANIFEST_VERSION:
+                manifest = {}
+        previous = manifest.get('tables', {})
+
+        tables = {}
+        for name, (sources, build) in SQL_TABLES.items():
+            paths = self._source_paths(sources)
+            if not all(os.path.exists(path) for path in paths):
+                logging.info(f"Skipping SQL table {name}: {', '.join(p for p in paths if not os.path.exists(p))} not found")
+                continue
+            entry = previous.get(name, {})
+            fingerprints = {path: file_fingerprint(path, entry.get('sources', {}).get(path)) for path in paths}
+            current = entry.get('sources') == fingerprints and self._is_cached(name)
+            if not current:
+                with trace_span(f"cache {name}", category="io") as span:
+                    df = build(self.dataset, paths)
+                    df = df.rename(columns=sql_name)
+                    self._store(name, df)
+                    span['rows'] = len(df)
+                logging.info(f"Cached SQL table {name} ({len(df)} rows) in {self.cache_dir}")
+                entry = {'sources': fingerprints, 'rows': len(df)}
+            self._register(name)
+            tables[name] = entry
+        if 'thought_tags' in tables and 'tag_dictionary' in tables:
+            if self.engine == 'sqlite':
+                self.con.execute("DROP VIEW IF EXISTS tags")
+            self.con.execute(TAGS_VIEW)
+
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': SQL_MANIFEST_VERSION, 'tables': tables}, f, indent=2)
+        return sorted(tables) + (['tags'] if 'thought_tags' in tables and 'tag_dictionary' in tables else [])
+
+    def _parquet_path(self, name):
+        return os.path.join(self.cache_dir, f"{name}.parquet")
+
+    def _is_cached(self, name):
+        if self.engine == 'duckdb':
+            return os.path.exists(self._parquet_path(name))
+        found = self.con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone()
+        return found is not None
+
+    def _store(self, name, df):
+        if self.engine == 'duckdb':
+            self.con.register('_gd_table', df)
+            path = self._parquet_path(name).replace("'", "''")
+            self.con.execute(f"COPY (SELECT * FROM _gd_table) TO '{path}' (FORMAT PARQUET)")
+            self.con.unregister('_gd_table')
+        else:
+            df.to_sql(name, self.con, if_exists='replace', index=False, chunksize=50000)
+            self.con.commit()
+
+    def _register(self, name):
+        # SQLite tables live in the cache file itself; duckdb reads each Parquet file through a view
+        if self.engine == 'duckdb':
+            path = self._parquet_path(name).replace("'", "''")
+            self.con.execute(f"CREATE OR REPLACE VIEW {name} AS SELECT * FROM read_parquet('{path}')")
@@ -4,8 +4,9 @@ import os
 import logging
 import re
 from collections import OrderedDict # To preserve segment order somewhat
-from lib.analysis_utils import get_segment_columns # Import the updated function
-import pandas as pd
+from lib.analysis_utils import get_segment_columns, trace_span, lazy_import # Import the updated function
+
+pd = lazy_import('pandas')
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -164,7 +165,8 @@ def standardize_aggregate_csv(input_csv_path, output_csv_path, segment_counts_ou
         return
 
     # --- Pass 1: Get all unique *core* segment columns ---
-    all_core_segment_names = collect_all_segment_columns(input_csv_path)
+    with trace_span("standardize: collect segment columns", category="preprocess"):
+        all_core_segment_names = collect_all_segment_columns(input_csv_path)
     if all_core_segment_names is None:
         logging.error("Failed to collect segment columns. Aborting standardization.")
         return
@@ -203,7 +205,8 @@ def standardize_aggregate_csv(input_csv_path, output_csv_path, segment_counts_ou
              os.makedirs(output_dir_counts, exist_ok=True)
 
     try:
-        with open(input_csv_path, 'r', encoding='utf-8') as infile, \
+        with trace_span("standardize: write rows", category="preprocess") as span, \
+             open(input_csv_path, 'r', encoding='utf-8') as infile, \
              open(output_csv_path, 'w', encoding='utf-8', newline='') as outfile_std:
 
             reader = csv.reader(infile)
@@ -315,6 +318,7 @@ def standardize_aggregate_csv(input_csv_path, output_csv_path, segment_counts_ou
                     writer_std.writerow(output_row_dict)
                     rows_written_std += 1
                     rows_processed_data += 1
+            span['rows'] = rows_processed_data
 
         # --- Final Checks and Summary for Standardized Output ---
         if headers_encountered == 0:
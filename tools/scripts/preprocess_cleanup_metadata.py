@@ -1,9 +1,11 @@
 import argparse
 import logging
 from pathlib import Path
-import pandas as pd
 import csv # For more granular reading if needed
 import shutil # For replacing the file
+from lib.analysis_utils import lazy_import
+
+pd = lazy_import('pandas')
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -44,7 +46,7 @@ def find_header_row(file_path, expected_markers):
                             try:
                                 # Try reading just this line as header to validate columns
                                 df_header_test = pd.read_csv(file_path, header=i, nrows=0, encoding=enc)
-                                df_header_test.columns = df_header_test.columns.str.replace('^\\ufeff', '', regex=True).str.strip() # Clean potential BOM
+                                df_header_test.columns = df_header_test.columns.str.lstrip('\ufeff').str.strip() # Clean potential BOM
                                 if all(marker in df_header_test.columns for marker in expected_markers):
                                     logging.info(f"Confirmed header on line {i+1} (index {i}) in {file_path} using encoding '{enc}'. Markers: {expected_markers}")
                                     header_row_index = i
@@ -229,7 +231,7 @@ def clean_summary_csv(file_path):
         # Use header1_line to check if it *looks* like the target header
         # This check is imperfect but better than just checking header1_idx == 0
         if header1_idx == 0 and "ID" in header1_line and "Type" in header1_line and "Text" in header1_line and "Summary" in header1_line:
-            df_check.columns = df_check.columns.str.replace('^\\ufeff', '', regex=True).str.strip()
+            df_check.columns = df_check.columns.str.lstrip('\ufeff').str.strip()
             if list(df_check.columns) == target_cols:
                 logging.info(f"{file_path} already appears to be cleaned to the target 4-column format. Skipping.")
                 return True
@@ -359,7 +361,7 @@ def main(args):
                     # We need a quick check here without full find_header_row logic
                     try:
                         df_check = pd.read_csv(file_path, nrows=1, encoding='utf-8-sig') # Read first line + header
-                        df_check.columns = df_check.columns.str.replace('^\\ufeff', '', regex=True).str.strip()
+                        df_check.columns = df_check.columns.str.lstrip('\ufeff').str.strip()
                         if all(marker in df_check.columns for marker in markers):
                             logging.info(f"Header check confirms header is already at line 1 for {filename} (hardcoded case). No cleanup needed.")
                             header_idx = 0 # Mark as found at 0
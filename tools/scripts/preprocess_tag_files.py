@@ -1,60 +1,80 @@
 import os
-import pandas as pd
 import argparse
 import re
 import glob
 import csv
 import traceback # Added for better error reporting
+import json
+from concurrent.futures import ProcessPoolExecutor
+from lib.analysis_utils import build_long_tag_tables, file_fingerprint, THOUGHT_TAGS_FILENAME, TAG_DICTIONARY_FILENAME, lazy_import
 
-def extract_metadata_and_find_header(file_path):
+pd = lazy_import('pandas')
+
+def _is_tag_header_row(row):
+    """Returns True if a CSV row looks like the data header of a categories or labels export."""
+    expected_headers_cat_keys = ["category", "tag"]
+    expected_headers_labels_keys = ["participant id", "sentiment"]
+    optional_response_keys = ["response", "thought text"]
+
+    row_lower_stripped = [str(h).lower().strip() for h in row]
+
+    # Check Categories header
+    is_cat_header = all(eh in row_lower_stripped for eh in expected_headers_cat_keys)
+
+    # Check Labels header (updated logic)
+    has_required_label_keys = all(eh in row_lower_stripped for eh in expected_headers_labels_keys)
+    has_optional_response_key = any(resp_key in row_lower_stripped for resp_key in optional_response_keys)
+    is_labels_header = has_required_label_keys and has_optional_response_key
+
+    return is_cat_header or is_labels_header
+
+def read_raw_tag_file(file_path):
     """
-    Reads the start of a Remesh CSV export to find metadata (like Question ID)
-    and the actual header row content and its index.
+    Reads a Remesh CSV export in a single pass: metadata (like Question ID) from the
+    rows before the header, the data header row itself, and every data row after it.
 
     Args:
         file_path (str): Path to the CSV file.
 
     Returns:
-        tuple: (metadata_dict, header_content, header_row_num) or (None, None, None) if fails.
+        tuple: (metadata_dict, header_content, header_row_num, data_rows) or (None, None, None, None) if fails.
                metadata_dict contains extracted key-value pairs.
                header_content is the list of strings in the header row.
                header_row_num is the 0-based index of the data header row.
+               data_rows is the list of rows after the header, padded/truncated to the header length.
     """
     metadata = {}
     header_content = None
     header_row_num = None
-    expected_headers_cat_keys = ["category", "tag"]
-    expected_headers_labels_keys = ["participant id", "sentiment"]
-    optional_response_keys = ["response", "thought text"]
+    data_rows = []
 
     try:
         with open(file_path, 'r', encoding='utf-8-sig') as f:
             reader = csv.reader(f)
             for i, row in enumerate(reader):
+                if header_content is not None:
+                    # Ensure row has at least as many columns as header 
+                    # (Pad shorter rows, truncate longer ones to match header length)
+                    # This helps handle rows with extra/fewer commas potentially
+                    row_len = len(row)
+                    header_len = len(header_content)
+                    if row_len < header_len:
+                        row.extend([None] * (header_len - row_len)) # Pad with None
+                    elif row_len > header_len:
+                        print(f"  Warning: Row {i+1} in {os.path.basename(file_path)} has {row_len} fields (expected {header_len}). Truncating.")
+                        row = row[:header_len] # Truncate
+                    data_rows.append(row)
                 # Check for metadata rows (Key, Value) - usually before the header
-                if len(row) == 2 and row[0] and row[1] and header_content is None:
+                elif len(row) == 2 and row[0] and row[1]:
                     key = row[0].strip()
                     value = row[1].strip()
                     metadata[key] = value
                 # Check for potential data header
-                elif len(row) > 1:
-                    row_lower_stripped = [str(h).lower().strip() for h in row]
-                    
-                    # Check Categories header
-                    is_cat_header = all(eh in row_lower_stripped for eh in expected_headers_cat_keys)
-                    
-                    # Check Labels header (updated logic)
-                    has_required_label_keys = all(eh in row_lower_stripped for eh in expected_headers_labels_keys)
-                    has_optional_response_key = any(resp_key in row_lower_stripped for resp_key in optional_response_keys)
-                    is_labels_header = has_required_label_keys and has_optional_response_key
-
-                    if is_cat_header or is_labels_header:
-                        header_row_num = i
-                        header_content = [str(h).strip() for h in row]
-                        # print(f"Debug: Found header at row {i}: {header_content}")
-                        # Stop searching once header is found
-                        break 
-                
+                elif len(row) > 1 and _is_tag_header_row(row):
+                    header_row_num = i
+                    header_content = [str(h).strip() for h in row]
+                    continue
+
                 # Optimization: Stop searching for header after too many rows
                 if i > 30 and header_content is None: 
                     print(f"Warning: Could not definitively locate data header in {file_path} within first 30 lines.")
@@ -63,25 +83,25 @@ def extract_metadata_and_find_header(file_path):
         # Validation after reading whole file (or stopping early)
         if "Question IDs" not in metadata:
             print(f"Warning: 'Question IDs' not found in metadata for {file_path}. Cannot process.")
-            return None, None, None
+            return None, None, None, None
         if header_content is None:
              print(f"Warning: Data header row not found for {file_path}. Cannot process.")
-             return None, None, None
+             return None, None, None, None
 
-        return metadata, header_content, header_row_num
+        return metadata, header_content, header_row_num, data_rows
 
     except Exception as e:
-        print(f"Error reading or parsing metadata/header for {file_path}: {e}")
-        return None, None, None
+        print(f"Error reading or parsing {file_path}: {e}")
+        return None, None, None, None
 
 def process_raw_file(file_path, output_dir):
     """
-    Processes a single raw Remesh tag CSV file using manual CSV reading,
+    Processes a single raw Remesh tag CSV file (read once with read_raw_tag_file),
     saves a cleaned version.
     Returns the Question ID and file type if successful.
     """
     print(f"Processing raw file: {os.path.basename(file_path)}")
-    metadata, header, header_idx = extract_metadata_and_find_header(file_path)
+    metadata, header, header_idx, data_rows = read_raw_tag_file(file_path)
 
     if metadata is None or header is None or header_idx is None:
         return None, None
@@ -92,28 +112,6 @@ def process_raw_file(file_path, output_dir):
     if not re.match(r'^[0-9a-fA-F]{8}-([0-9a-fA-F]{4}-){3}[0-9a-fA-F]{12}$', qid):
          print(f"Warning: Extracted Question ID '{qid}' invalid format..."); return None, None
 
-    # --- Manual Data Reading --- 
-    data_rows = []
-    try:
-        with open(file_path, 'r', encoding='utf-8-sig') as f:
-            reader = csv.reader(f)
-            for i, row in enumerate(reader):
-                if i > header_idx: # Only read rows after the header
-                    # Ensure row has at least as many columns as header 
-                    # (Pad shorter rows, truncate longer ones to match header length)
-                    # This helps handle rows with extra/fewer commas potentially
-                    row_len = len(row)
-                    header_len = len(header)
-                    if row_len < header_len:
-                        row.extend([None] * (header_len - row_len)) # Pad with None
-                    elif row_len > header_len:
-                        print(f"  Warning: Row {i+1} in {os.path.basename(file_path)} has {row_len} fields (expected {header_len}). Truncating.")
-                        row = row[:header_len] # Truncate
-                    data_rows.append(row)
-    except Exception as e:
-        print(f"Error reading data rows for {file_path}: {e}")
-        return None, None
-        
     if not data_rows:
         print(f"Warning: No data rows found after header in {file_path}. Skipping.")
         return None, None
@@ -224,180 +222,446 @@ def process_raw_file(file_path, output_dir):
         return None, None
 
 
-def rebuild_combined_files(output_dir):
+# Settings for the two kinds of combined tag files
+COMBINED_FILE_SPECS = {
+    'labels': {
+        'suffix': '_thought_labels.csv',
+        'combined': 'all_thought_labels.csv',
+        # Leading columns of the combined file, in order (tag columns follow)
+        'lead_cols': ["Question ID", "Participant ID", "Thought ID", "ResponseText", "Sentiment"],
+    },
+    'categories': {
+        'suffix': '_tag_categories.csv',
+        'combined': 'all_tag_categories.csv',
+        'lead_cols': ["Question ID", "Category"],
+    },
+}
+MANIFEST_FILENAME = 'tags_manifest.json'
+MANIFEST_VERSION = 1
+
+
+def _tag_number(col):
+    """Returns N for a 'Tag N' column name."""
+    return int(col.split(' ')[1])
+
+def _max_tag_number(columns):
+    """Returns the largest N among 'Tag N' columns (0 if there are none)."""
+    return max((_tag_number(col) for col in columns if col.startswith('Tag ')), default=0)
+
+def find_processed_files(output_dir, kind):
     """
-    Scans the output directory for processed individual files and rebuilds
-    the combined all_tag_categories.csv and all_thought_labels.csv files.
-    """
-    print("\nRebuilding combined files...")
+    Finds the processed per-question files of one kind in the output directory.
 
-    # --- Rebuild Labels ---
-    all_labels_dfs = []
-    label_files = glob.glob(os.path.join(output_dir, '*_thought_labels.csv'))
-    print(f"\nFound {len(label_files)} processed label files.")
-    for file_path in label_files:
+    Returns:
+        dict: Question ID -> file path, skipping the combined file itself.
+    """
+    spec = COMBINED_FILE_SPECS[kind]
+    files = {}
+    for file_path in sorted(glob.glob(os.path.join(output_dir, f"*{spec['suffix']}"))):
         filename = os.path.basename(file_path)
         # Skip the combined file itself
-        if filename == 'all_thought_labels.csv': continue 
-        match = re.match(r'([0-9a-fA-F\-]+)_thought_labels\.csv', filename)
+        if filename == spec['combined']: continue
+        match = re.match(r'([0-9a-fA-F\-]+)' + re.escape(spec['suffix']) + '$', filename)
         if match:
-            qid = match.group(1)
+            files[match.group(1)] = file_path
+        else: print(f"  Warning: Could not extract QID from {kind} filename {filename}")
+    return files
+
+def read_processed_file(file_path, qid, kind):
+    """
+    Reads one processed per-question file, adds its Question ID and checks the
+    essential columns. Returns the DataFrame, or None if it should be skipped.
+    """
+    filename = os.path.basename(file_path)
+    try:
+        df = pd.read_csv(file_path)
+    except Exception as e:
+        print(f"  Error reading processed {kind} file {file_path}: {e}")
+        return None
+    df["Question ID"] = qid
+    if kind == 'labels':
+        # Individual files have standardized 'ResponseText' and 'Tag N' columns
+        for col in ["Participant ID", "ResponseText", "Sentiment"]:
+            if col not in df.columns:
+                print(f"Warning: Skipping {filename} during rebuild - missing {col} column.")
+                return None
+    elif "Category" not in df.columns:
+        print(f"Warning: Skipping {filename} during rebuild - missing Category column.")
+        return None
+    return df
+
+def combine_processed_frames(dfs, kind):
+    """
+    Pads every frame to the same 'Tag 1..Tag N' width, concatenates them and
+    orders the columns (lead columns first, then tags sorted numerically).
+    """
+    # Find max tag number N across all dataframes based on "Tag N" format
+    max_tag_num = 0
+    for df_inner in dfs:
+        tag_cols = [col for col in df_inner.columns if col.startswith('Tag ')]
+        if tag_cols:
             try:
-                df = pd.read_csv(file_path)
-                df["Question ID"] = qid
-                # Basic check for essential columns before appending
-                # Assuming individual files now have correct 'ResponseText' and 'Tag N' columns
-                essential_cols = ["Question ID", "Participant ID", "ResponseText", "Sentiment"]
-                if not all(ec in df.columns for ec in essential_cols[:2]): # Check QID, PartID
-                    print(f"Warning: Skipping {filename} during rebuild - missing Question ID or Participant ID.")
-                    continue
-                if "ResponseText" not in df.columns: # Check ResponseText explicitly
-                     print(f"Warning: Skipping {filename} during rebuild - missing ResponseText column.")
-                     continue
-                if "Sentiment" not in df.columns: # Check Sentiment explicitly
-                     print(f"Warning: Skipping {filename} during rebuild - missing Sentiment column.")
-                     continue
-
-                all_labels_dfs.append(df) # Append the whole df, selection happens after concat
-            except Exception as e: print(f"  Error reading processed label file {file_path}: {e}")
-        else: print(f"  Warning: Could not extract QID from label filename {filename}")
-
-    if all_labels_dfs:
-        # --- Standardize Columns Across All Label DFs ---
-        # Find max tag number N across all dataframes based on "Tag N" format
-        max_tag_num = 0
-        for df_inner in all_labels_dfs:
-            tag_cols = [col for col in df_inner.columns if col.startswith('Tag ')]
-            if tag_cols:
-                try:
-                    # Extract numbers and find the maximum N
-                    max_n_in_df = max(int(col.split(' ')[1]) for col in tag_cols)
-                    max_tag_num = max(max_tag_num, max_n_in_df)
-                except (ValueError, IndexError):
-                    print(f"  Warning: Could not parse tag number from columns {tag_cols} in one of the label files. Skipping for max tag calculation.")
-
-
-        standard_tag_cols = [f'Tag {i+1}' for i in range(max_tag_num)] # e.g., ['Tag 1', 'Tag 2', ..., 'Tag N']
-
-        processed_labels_dfs = []
-        for df_inner in all_labels_dfs:
-             existing_cols = df_inner.columns.tolist()
-             # Identify standard tag columns missing from this df
-             cols_to_add = [t for t in standard_tag_cols if t not in existing_cols]
-             # Reindex *only if necessary*, adding missing tags as NA
-             if cols_to_add:
-                 new_df = df_inner.reindex(columns=existing_cols + cols_to_add, fill_value=pd.NA)
-             else:
-                 new_df = df_inner # No tags to add
-             processed_labels_dfs.append(new_df)
-
-        if processed_labels_dfs:
-            # Concatenate all potentially reindexed dataframes
-            combined_labels_df = pd.concat(processed_labels_dfs, ignore_index=True)
-
-            # --- Define Final Column Order ---
-            id_cols = ["Question ID"]
-            # Check for Participant ID and Thought ID *after* concat
-            if "Participant ID" in combined_labels_df.columns: id_cols.append("Participant ID")
-            if "Thought ID" in combined_labels_df.columns: id_cols.append("Thought ID")
-
-            text_sentiment_cols = []
-            if "ResponseText" in combined_labels_df.columns: text_sentiment_cols.append("ResponseText")
-            if "Sentiment" in combined_labels_df.columns: text_sentiment_cols.append("Sentiment")
-
-            # Get all tag columns present after concat and standardization
-            tag_cols = [col for col in combined_labels_df.columns if col.startswith("Tag ")]
-            # Sort tags NUMERICALLY based on the number N
-            tag_cols.sort(key=lambda x: int(x.split(' ')[1]))
+                max_tag_num = max(max_tag_num, max(_tag_number(col) for col in tag_cols))
+            except (ValueError, IndexError):
+                print(f"  Warning: Could not parse tag number from columns {tag_cols} in one of the {kind} files. Skipping for max tag calculation.")
+
+    standard_tag_cols = [f'Tag {i+1}' for i in range(max_tag_num)] # e.g., ['Tag 1', 'Tag 2', ..., 'Tag N']
+
+    processed_dfs = []
+    for df_inner in dfs:
+        existing_cols = df_inner.columns.tolist()
+        # Reindex *only if necessary*, adding missing tags as NA
+        cols_to_add = [t for t in standard_tag_cols if t not in existing_cols]
+        if cols_to_add:
+            df_inner = df_inner.reindex(columns=existing_cols + cols_to_add, fill_value=pd.NA)
+        processed_dfs.append(df_inner)
+
+    combined_df = pd.concat(processed_dfs, ignore_index=True)
+    return combined_df[combined_column_order(combined_df.columns, kind)]
+
+def combined_column_order(columns, kind):
+    """Returns the final column order for a combined file of the given kind."""
+    lead_cols = [col for col in COMBINED_FILE_SPECS[kind]['lead_cols'] if col in columns]
+    tag_cols = sorted([col for col in columns if col.startswith("Tag ")], key=_tag_number)
+    return lead_cols + tag_cols
+
+def load_manifest(output_dir):
+    """Loads the combined-file manifest, or returns None if missing or unreadable."""
+    manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"  Warning: Could not read manifest {manifest_path}: {e}")
+        return None
+    if manifest.get('version') != MANIFEST_VERSION:
+        return None
+    return manifest
+
+def save_manifest(output_dir, manifest):
+    """Writes the combined-file manifest."""
+    manifest['version'] = MANIFEST_VERSION
+    manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+def _manifest_entry(output_dir, kind, files, dfs, combined_df):
+    """
+    Builds the manifest section for one kind: a fingerprint, row count and tag width
+    for every per-question file that went into the combined file, plus the combined file itself.
+    """
+    combined_path = os.path.join(output_dir, COMBINED_FILE_SPECS[kind]['combined'])
+    return {
+        'combined': file_fingerprint(combined_path),
+        'columns': list(combined_df.columns),
+        'files': {
+            qid: dict(file_fingerprint(files[qid]), rows=len(df), tags=_max_tag_number(df.columns))
+            for qid, df in dfs.items()
+        },
+    }
+
+def _write_combined(output_dir, kind, combined_df):
+    """Writes a combined file. Returns True on success."""
+    output_path = os.path.join(output_dir, COMBINED_FILE_SPECS[kind]['combined'])
+    try:
+        combined_df.to_csv(output_path, index=False, encoding='utf-8-sig')
+        print(f"Saved combined {kind} file: {output_path}")
+        return True
+    except Exception as e:
+        print(f"  Error saving combined {kind} file: {e}")
+        return False
 
-            # Construct final list, ensuring columns actually exist
-            final_cols = id_cols + text_sentiment_cols + tag_cols
-            final_cols = [col for col in final_cols if col in combined_labels_df.columns]
 
-            combined_labels_df = combined_labels_df[final_cols] # Reorder columns
-            output_path = os.path.join(output_dir, 'all_thought_labels.csv')
-            try:
-                combined_labels_df.to_csv(output_path, index=False, encoding='utf-8-sig')
-                print(f"Saved combined labels file: {output_path}")
-            except Exception as e: print(f"  Error saving combined labels file: {e}")
-        else: print("Processed labels list was empty after standardization or initial read.")
-    else: print("No processed label files found to combine.")
-
-
-    # --- Rebuild Categories ---
-    all_categories_dfs = []
-    category_files = glob.glob(os.path.join(output_dir, '*_tag_categories.csv'))
-    print(f"\nFound {len(category_files)} processed category files.")
-    for file_path in category_files:
-        filename = os.path.basename(file_path)
-        # Skip the combined file itself
-        if filename == 'all_tag_categories.csv': continue 
-        match = re.match(r'([0-9a-fA-F\-]+)_tag_categories\.csv', filename)
-        if match:
-            qid = match.group(1)
-            try:
-                df = pd.read_csv(file_path)
-                df["Question ID"] = qid
-                # Basic check
-                if "Category" not in df.columns:
-                    print(f"Warning: Skipping {filename} during rebuild - missing Category column.")
-                    continue
-                all_categories_dfs.append(df)
-            except Exception as e: print(f"  Error reading processed category file {file_path}: {e}")
-        else: print(f"  Warning: Could not extract QID from category filename {filename}")
-
-    if all_categories_dfs:
-        # --- Standardize Columns Across All Category DFs ---
-        max_cat_tag_num = 0
-        for df_inner in all_categories_dfs:
-            tag_cols = [col for col in df_inner.columns if col.startswith('Tag ')]
-            if tag_cols:
-                try:
-                    max_n_in_df = max(int(col.split(' ')[1]) for col in tag_cols)
-                    max_cat_tag_num = max(max_cat_tag_num, max_n_in_df)
-                except (ValueError, IndexError):
-                     print(f"  Warning: Could not parse tag number from columns {tag_cols} in one of the category files. Skipping for max tag calculation.")
-
-        standard_cat_tag_cols = [f'Tag {i+1}' for i in range(max_cat_tag_num)]
-
-        processed_categories_dfs = []
-        for df_inner in all_categories_dfs:
-             existing_cols = df_inner.columns.tolist()
-             cols_to_add = [t for t in standard_cat_tag_cols if t not in existing_cols]
-             if cols_to_add:
-                 new_df = df_inner.reindex(columns=existing_cols + cols_to_add, fill_value=pd.NA)
-             else:
-                 new_df = df_inner
-             processed_categories_dfs.append(new_df)
-
-        if processed_categories_dfs:
-            combined_categories_df = pd.concat(processed_categories_dfs, ignore_index=True)
-
-            # --- Define Final Column Order ---
-            id_cols = ["Question ID"]
-            cat_col = ["Category"] if "Category" in combined_categories_df.columns else []
-            
-            # Get tag columns and sort numerically
-            tag_cols = [col for col in combined_categories_df.columns if col.startswith("Tag ")]
-            tag_cols.sort(key=lambda x: int(x.split(' ')[1])) # Sort numerically
+def rebuild_combined_files(output_dir, raw_manifest=None):
+    """
+    Scans the output directory for processed individual files and rebuilds
+    the combined all_tag_categories.csv and all_thought_labels.csv files
+    from scratch. Also records a manifest for later incremental updates,
+    including the raw-file fingerprints in ``raw_manifest`` (see process_raw_files).
+    """
+    print("\nRebuilding combined files...")
+    manifest = {'raw': raw_manifest} if raw_manifest else {}
 
-            final_cols = id_cols + cat_col + tag_cols
-            final_cols = [col for col in final_cols if col in combined_categories_df.columns] # Ensure they exist
+    for kind in COMBINED_FILE_SPECS:
+        files = find_processed_files(output_dir, kind)
+        print(f"\nFound {len(files)} processed {kind} files.")
+
+        dfs = {}
+        for qid, file_path in files.items():
+            df = read_processed_file(file_path, qid, kind)
+            if df is not None:
+                dfs[qid] = df
+
+        if not dfs:
+            print(f"No processed {kind} files found to combine.")
+            continue
+
+        combined_df = combine_processed_frames(list(dfs.values()), kind)
+        if _write_combined(output_dir, kind, combined_df):
+            manifest[kind] = _manifest_entry(output_dir, kind, files, dfs, combined_df)
+
+    save_manifest(output_dir, manifest)
+    write_long_tag_tables(output_dir)
+
+
+def update_combined_files(output_dir, raw_manifest=None):
+    """
+    Incrementally updates the combined files using the manifest written by the
+    previous build. Only new or changed per-question files are read:
+
+    - If files were only added and fit the existing columns, their rows are appended in place.
+    - If files changed, were removed, or add new tag columns, the existing combined file is
+      read once, the stale questions' rows are dropped and the changed files' rows are merged in.
+
+    The long-format tag tables are then updated for the affected questions only
+    (update_long_tag_tables). ``raw_manifest`` replaces the stored raw-file fingerprints
+    when given.
+
+    Falls back to a full rebuild when there is no manifest or a combined file was modified
+    outside this script.
+    """
+    print("\nUpdating combined files incrementally...")
+    manifest = load_manifest(output_dir)
+    if manifest is None:
+        print("No usable manifest found; falling back to a full rebuild.")
+        rebuild_combined_files(output_dir, raw_manifest)
+        return
+    if raw_manifest is not None:
+        manifest['raw'] = raw_manifest
+
+    touched = set() # Questions whose rows were added, replaced or removed
+    for kind, spec in COMBINED_FILE_SPECS.items():
+        combined_path = os.path.join(output_dir, spec['combined'])
+        entry = manifest.get(kind)
+        files = find_processed_files(output_dir, kind)
+
+        if entry is None or not os.path.exists(combined_path) or \
+                file_fingerprint(combined_path, entry['combined'])['sha256'] != entry['combined']['sha256']:
+            print(f"Combined {kind} file is missing or was modified; falling back to a full rebuild.")
+            rebuild_combined_files(output_dir, manifest.get('raw'))
+            return
+
+        previous_files = entry['files']
+        fingerprints = {qid: file_fingerprint(path, previous_files.get(qid)) for qid, path in files.items()}
+        added = [qid for qid in files if qid not in previous_files]
+        changed = [qid for qid in files if qid in previous_files and
+                   fingerprints[qid]['sha256'] != previous_files[qid]['sha256']]
+        removed = [qid for qid in previous_files if qid not in files]
+
+        print(f"\n{kind.capitalize()}: {len(added)} new, {len(changed)} changed, {len(removed)} removed, "
+              f"{len(files) - len(added) - len(changed)} unchanged.")
+        if not (added or changed or removed):
+            # Still refresh stored mtimes so later runs can skip hashing
+            for qid, fingerprint in fingerprints.items():
+                previous_files[qid].update(fingerprint)
+            continue
+
+        new_dfs = {}
+        for qid in added + changed:
+            df = read_processed_file(files[qid], qid, kind)
+            if df is not None:
+                new_dfs[qid] = df
+
+        existing_cols = entry['columns']
+        fits_existing = all(set(df.columns) <= set(existing_cols) for df in new_dfs.values())
+
+        if not (changed or removed) and fits_existing:
+            # Append new questions' rows in place, aligned to the existing header
+            if new_dfs:
+                appended_df = pd.concat([df.reindex(columns=existing_cols) for df in new_dfs.values()], ignore_index=True)
+                appended_df.to_csv(combined_path, mode='a', header=False, index=False, encoding='utf-8')
+                print(f"Appended {len(appended_df)} rows to {combined_path}")
+            combined_columns = existing_cols
+        else:
+            # Read the combined file once (as text, so unchanged rows are written back verbatim)
+            existing_df = pd.read_csv(combined_path, encoding='utf-8-sig', dtype=str, keep_default_na=False)
+            stale = set(changed) | set(removed)
+            kept_df = existing_df[~existing_df["Question ID"].isin(stale)]
+
+            # Drop padding columns that only existed for the stale questions
+            kept_width = max((info['tags'] for qid, info in previous_files.items() if qid not in stale), default=0)
+            kept_df = kept_df.drop(columns=[col for col in kept_df.columns
+                                            if col.startswith('Tag ') and _tag_number(col) > kept_width])
+
+            combined_df = combine_processed_frames([kept_df] + list(new_dfs.values()), kind)
+            if not _write_combined(output_dir, kind, combined_df):
+                continue
+            combined_columns = list(combined_df.columns)
+
+        # Unchanged files keep their entries; skipped files (failed validation) are left out so they are retried
+        new_entries = {
+            qid: dict(fingerprints[qid], rows=len(df), tags=_max_tag_number(df.columns))
+            for qid, df in new_dfs.items()
+        }
+        entry['files'] = {
+            qid: new_entries[qid] if qid in new_entries else dict(previous_files[qid], **fingerprints[qid])
+            for qid in files if qid in new_entries or (qid in previous_files and qid not in changed)
+        }
+        entry['columns'] = combined_columns
+        entry['combined'] = file_fingerprint(combined_path)
+        touched.update(added + changed + removed)
+
+    save_manifest(output_dir, manifest)
+    if not all(os.path.exists(os.path.join(output_dir, name))
+               for name in (THOUGHT_TAGS_FILENAME, TAG_DICTIONARY_FILENAME)):
+        write_long_tag_tables(output_dir)
+    elif touched:
+        update_long_tag_tables(output_dir, touched)
+
+
+def write_long_tag_tables(output_dir):
+    """
+    Writes the long-format tag tables next to the combined files:
+
+    - all_thought_tags.csv: one row per applied tag (Question ID, Participant ID, tag_id)
+    - tag_dictionary.csv: one row per question-scoped tag (tag_id, Question ID, Tag, Category)
+
+    Downstream scripts read these directly instead of melting the padded 'Tag N' columns.
+    """
+    labels_path = os.path.join(output_dir, COMBINED_FILE_SPECS['labels']['combined'])
+    categories_path = os.path.join(output_dir, COMBINED_FILE_SPECS['categories']['combined'])
+    if not (os.path.exists(labels_path) and os.path.exists(categories_path)):
+        print("Skipping long-format tag tables: combined labels or categories file is missing.")
+        return
+
+    try:
+        labels_df = pd.read_csv(labels_path, encoding='utf-8-sig', dtype=str)
+        categories_df = pd.read_csv(categories_path, encoding='utf-8-sig', dtype=str)
+        thought_tags_df, tag_dictionary_df = build_long_tag_tables(labels_df, categories_df)
+
+        thought_tags_path = os.path.join(output_dir, THOUGHT_TAGS_FILENAME)
+        dictionary_path = os.path.join(output_dir, TAG_DICTIONARY_FILENAME)
+        thought_tags_df.to_csv(thought_tags_path, index=False, encoding='utf-8-sig')
+        tag_dictionary_df.to_csv(dictionary_path, index=False, encoding='utf-8-sig')
+        print(f"Saved long-format tags: {thought_tags_path} ({len(thought_tags_df)} rows)")
+        print(f"Saved tag dictionary: {dictionary_path} ({len(tag_dictionary_df)} tags)")
+    except Exception as e:
+        print(f"Error writing long-format tag tables: {e}")
+        traceback.print_exc()
 
-            combined_categories_df = combined_categories_df[final_cols] # Reorder
-            output_path = os.path.join(output_dir, 'all_tag_categories.csv')
-            try:
-                combined_categories_df.to_csv(output_path, index=False, encoding='utf-8-sig')
-                print(f"Saved combined categories file: {output_path}")
-            except Exception as e: print(f"  Error saving combined categories file: {e}")
-        else: print("Processed categories list was empty after standardization or initial read.")
-    else: print("No processed category files found to combine.")
+
+def update_long_tag_tables(output_dir, questions):
+    """
+    Updates the long-format tag tables for the given questions only, building their
+    rows from the per-question files instead of re-reading the combined files.
+
+    Other questions keep their rows and tag_ids; the updated questions' tags get new
+    ids after the largest existing one. all_thought_tags.csv is appended to in place
+    when the questions are all new, and otherwise read once with the stale questions'
+    rows replaced. Falls back to write_long_tag_tables if the tables can't be read.
+    """
+    thought_tags_path = os.path.join(output_dir, THOUGHT_TAGS_FILENAME)
+    dictionary_path = os.path.join(output_dir, TAG_DICTIONARY_FILENAME)
+    id_dtypes = {'Question ID': str, 'Participant ID': str, 'Tag': str, 'Category': str}
+    try:
+        dictionary_df = pd.read_csv(dictionary_path, encoding='utf-8-sig', dtype=id_dtypes, keep_default_na=False)
+    except Exception as e:
+        print(f"  Could not read {dictionary_path} ({e}); rewriting the long-format tag tables.")
+        write_long_tag_tables(output_dir)
+        return
+
+    try:
+        # Current wide rows of the updated questions (removed questions have none)
+        frames = {}
+        for kind, spec in COMBINED_FILE_SPECS.items():
+            files = find_processed_files(output_dir, kind)
+            dfs = [read_processed_file(files[qid], qid, kind) for qid in sorted(questions) if qid in files]
+            dfs = [df.astype(str).where(df.notna()) for df in dfs if df is not None]
+            frames[kind] = combine_processed_frames(dfs, kind) if dfs else pd.DataFrame(columns=spec['lead_cols'])
+        new_tags_df, new_dictionary_df = build_long_tag_tables(frames['labels'], frames['categories'])
+
+        next_id = int(dictionary_df['tag_id'].max()) + 1 if len(dictionary_df) else 0
+        new_dictionary_df['tag_id'] += next_id
+        new_tags_df['tag_id'] += next_id
+
+        stale = dictionary_df['Question ID'].isin(questions)
+        if stale.any():
+            thought_tags_df = pd.read_csv(thought_tags_path, encoding='utf-8-sig', dtype=id_dtypes)
+            thought_tags_df = thought_tags_df[~thought_tags_df['Question ID'].isin(questions)]
+            thought_tags_df = pd.concat([thought_tags_df, new_tags_df], ignore_index=True)
+            thought_tags_df.to_csv(thought_tags_path, index=False, encoding='utf-8-sig')
+        else:
+            new_tags_df.to_csv(thought_tags_path, mode='a', header=False, index=False, encoding='utf-8')
+        dictionary_df = pd.concat([dictionary_df[~stale], new_dictionary_df], ignore_index=True)
+        dictionary_df.to_csv(dictionary_path, index=False, encoding='utf-8-sig')
+        print(f"Updated long-format tags for {len(questions)} questions: {len(new_tags_df)} tag rows, "
+              f"{len(new_dictionary_df)} dictionary entries")
+    except Exception as e:
+        print(f"Error updating long-format tag tables: {e}")
+        traceback.print_exc()
+
+
+def process_raw_files(raw_files, output_dir, workers=None, raw_manifest=None):
+    """
+    Processes raw tag export files concurrently in a process pool.
+
+    Files that don't match the expected naming are skipped. Each worker parses and
+    writes one file; results are collected in input order.
+
+    Args:
+        raw_files (list): Paths of raw CSV files.
+        output_dir (str): Directory to save cleaned individual files.
+        workers (int): Number of worker processes (None = CPU count, 1 = serial).
+        raw_manifest (dict): Raw file name -> fingerprint and cleaned output, from the
+            previous run's manifest. Files whose content is unchanged and whose cleaned
+            file still exists are skipped. Updated in place for the current raw files.
+
+    Returns:
+        int: Number of files processed successfully.
+    """
+    tag_files = []
+    for file_path in sorted(raw_files):
+        basename = os.path.basename(file_path)
+        if "_Tag_Categories" in basename or "_Thought_Labels" in basename:
+            tag_files.append(file_path)
+        else:
+            print(f"Skipping file with unexpected name format: {basename}")
+
+    if raw_manifest is not None:
+        previous = dict(raw_manifest)
+        raw_manifest.clear()
+        fingerprints = {path: file_fingerprint(path, previous.get(os.path.basename(path))) for path in tag_files}
+        unchanged = []
+        for file_path in tag_files:
+            entry = previous.get(os.path.basename(file_path))
+            if entry and entry['sha256'] == fingerprints[file_path]['sha256'] and \
+                    os.path.exists(os.path.join(output_dir, entry['output'])):
+                raw_manifest[os.path.basename(file_path)] = dict(entry, **fingerprints[file_path])
+                unchanged.append(file_path)
+        if unchanged:
+            print(f"Skipping {len(unchanged)} unchanged raw files.")
+            tag_files = [file_path for file_path in tag_files if file_path not in unchanged]
+    if not tag_files:
+        return 0
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(tag_files)))
+
+    if workers == 1:
+        results = [process_raw_file(file_path, output_dir) for file_path in tag_files]
+    else:
+        print(f"Processing {len(tag_files)} tag files with {workers} worker processes...")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(process_raw_file, tag_files, [output_dir] * len(tag_files)))
+
+    if raw_manifest is not None:
+        for file_path, (qid, file_type) in zip(tag_files, results):
+            if qid and file_type:
+                output = qid + COMBINED_FILE_SPECS[file_type]['suffix']
+                raw_manifest[os.path.basename(file_path)] = dict(fingerprints[file_path], output=output)
+
+    return sum(1 for qid, file_type in results if qid and file_type)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Preprocess Remesh tag export files.")
     parser.add_argument("--raw_dir", required=True, help="Directory containing raw Remesh *_Tag_Categories.csv and *_Thought_Labels.csv files.")
     parser.add_argument("--output_dir", required=True, help="Directory to save cleaned individual and combined tag files.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes for raw files (default: CPU count; 1 = serial).")
+    parser.add_argument("--incremental", action="store_true", help="Skip unchanged raw files and update combined and long-format files using the manifest, re-reading only new or changed per-question files.")
     args = parser.parse_args()
     if not os.path.isdir(args.raw_dir): print(f"Error: Raw directory not found: {args.raw_dir}"); exit(1)
     if not os.path.isdir(args.output_dir): print(f"Output directory not found, creating: {args.output_dir}"); os.makedirs(args.output_dir)
@@ -405,19 +669,17 @@ if __name__ == "__main__":
     # --- Process Raw Files --- 
     raw_files = glob.glob(os.path.join(args.raw_dir, '*.csv'))
     print(f"Found {len(raw_files)} CSV files in raw directory.")
-    processed_count = 0
-    for file_path in raw_files:
-        basename = os.path.basename(file_path)
-        if "_Tag_Categories" in basename or "_Thought_Labels" in basename:
-            qid, file_type = process_raw_file(file_path, args.output_dir)
-            if qid and file_type:
-                processed_count += 1
-        else:
-            print(f"Skipping file with unexpected name format: {basename}")
+    # With --incremental, raw files unchanged since the last run are not re-parsed
+    previous_manifest = load_manifest(args.output_dir) if args.incremental else None
+    raw_manifest = dict(previous_manifest.get('raw', {})) if previous_manifest else {}
+    processed_count = process_raw_files(raw_files, args.output_dir, workers=args.workers, raw_manifest=raw_manifest)
     print(f"\nProcessed {processed_count} raw files.")
 
     # --- Rebuild Combined Files ---
-    rebuild_combined_files(args.output_dir)
+    if args.incremental:
+        update_combined_files(args.output_dir, raw_manifest)
+    else:
+        rebuild_combined_files(args.output_dir, raw_manifest)
 
     print("\nPreprocessing complete.")
     print(f"Cleaned files saved in: {args.output_dir}")
@@ -1,29 +1,37 @@
 import json
-import numpy as np
-import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
+import functools
 import os
-import openai
-from dotenv import load_dotenv
 import datetime
 import warnings
 import uuid
 import argparse
 import sys
+from lib.dataset import GDDataset
+from lib.analysis_utils import lazy_import
 
-# --- Load Environment Variables --- Must be called early!
-load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Imported on first use, so --help starts fast and a missing optional package only fails the step that needs it
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+sklearn_pairwise = lazy_import('sklearn.metrics.pairwise')
+openai = lazy_import('openai')
 
-# --- Initialize OpenAI Client --- (v1.0.0+ style)
-client = None
-if OPENAI_API_KEY:
+@functools.lru_cache(maxsize=None)
+def get_openai_client():
+    """
+    Creates the OpenAI client (v1.0.0+ style) on first use, with the API key from
+    the environment or .env. Returns None if there is no key or the client fails.
+    """
+    from dotenv import load_dotenv
+    load_dotenv()
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        print("Warning: OPENAI_API_KEY not found in environment. OpenAI calls will fail.")
+        return None
     try:
-        client = openai.OpenAI(api_key=OPENAI_API_KEY)
+        return openai.OpenAI(api_key=api_key)
     except Exception as e:
         print(f"Failed to initialize OpenAI client: {e}")
-else:
-    print("Warning: OPENAI_API_KEY not found in environment. OpenAI calls will fail.")
+        return None
 
 # --- Configuration ---
 EXPECTED_EMBEDDING_DIM = 1024  # Defined based on known source model
@@ -74,6 +82,7 @@ def get_data_paths(gd_number):
 
 def get_embedding(text, model="text-embedding-3-small", dimensions=EXPECTED_EMBEDDING_DIM):
     """Generates an embedding using the specified OpenAI model and dimensions."""
+    client = get_openai_client()
     if client is None:
         print("OpenAI client not initialized. Cannot get embedding.")
         return None
@@ -108,35 +117,16 @@ def get_embedding(text, model="text-embedding-3-small", dimensions=EXPECTED_EMBE
 
 # --- Helper Functions ---
 
-def load_data_with_embeddings(file_path):
-    """Loads JSON containing a list of datasets, concatenates them, and returns a single pandas DataFrame."""
+def load_data_with_embeddings(dataset):
+    """Returns the GD's responses with their embeddings (GDDataset.embeddings, the concatenated JSON list of datasets), or None."""
+    file_path = dataset.path('embeddings')
     if not os.path.exists(file_path):
         print(f"Error: Data file not found at {file_path}")
         print("Please ensure you have downloaded the file and placed it correctly.")
         print("See README.md for instructions.")
         return None
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            list_of_data = json.load(f)
-
-        if not isinstance(list_of_data, list) or not list_of_data:
-            print(f"Error: Expected a non-empty list in JSON file {file_path}")
-            return None
-
-        list_of_dfs = []
-        for i, data_item in enumerate(list_of_data):
-            try:
-                df_part = pd.DataFrame(data_item)
-                list_of_dfs.append(df_part)
-            except ValueError as e:
-                print(f"Warning: Could not convert item {i} from JSON list into DataFrame: {e}")
-                continue
-
-        if not list_of_dfs:
-            print("Error: No valid DataFrames could be created from the JSON list.")
-            return None
-
-        combined_df = pd.concat(list_of_dfs, ignore_index=True)
+        combined_df = dataset.embeddings
 
         if combined_df.empty:
             print(f"Error: Concatenated DataFrame is empty.")
@@ -236,7 +226,7 @@ def rank_responses_by_similarity(response_df, query_text):
     with warnings.catch_warnings():
         warnings.filterwarnings('ignore', category=RuntimeWarning)
         # Calculate cosine similarity
-        similarities = cosine_similarity(normalized_query, normalized_embeddings)[0]
+        similarities = sklearn_pairwise.cosine_similarity(normalized_query, normalized_embeddings)[0]
 
     # Map similarities back to original indices
     similarity_dict = {df_copy.index[idx]: sim for idx, sim in zip(valid_indices, similarities)}
@@ -329,10 +319,10 @@ if __name__ == "__main__":
     args = parser.parse_args()
 
     # Get appropriate file paths
-    DATA_FILE_PATH, OUTPUT_DIR = get_data_paths(args.gd)
+    _, OUTPUT_DIR = get_data_paths(args.gd)
 
     print(f"Loading data for GD{args.gd}...")
-    survey_df = load_data_with_embeddings(DATA_FILE_PATH)
+    survey_df = load_data_with_embeddings(GDDataset(args.gd))
 
     if survey_df is not None:
         # Load thematic queries